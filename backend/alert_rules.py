@@ -0,0 +1,194 @@
+"""
+Declarative alert rules evaluated incrementally as metrics are ingested.
+
+A rule is compiled once into a comparison against either the sample value
+("threshold") or its per-second change since the previous sample ("rate").
+Each rule keeps O(1) state per series - when the condition started holding,
+the previous sample for rates, and the alert it raised - so evaluating a
+sample never looks at history.
+"""
+import operator
+from typing import Callable, Dict, List, Optional
+import uuid
+
+OPERATORS = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+RULE_TYPES = ("threshold", "rate")
+SEVERITIES = ("critical", "warning", "info")
+
+DEFAULT_MESSAGE = "{metric} is {value:g}{unit} ({op} {threshold:g}) for {for_seconds:g}s"
+
+
+class _SeriesState:
+    __slots__ = ("since", "last_ts", "last_value", "alert_id")
+
+    def __init__(self):
+        self.since: Optional[int] = None
+        self.last_ts: Optional[int] = None
+        self.last_value: Optional[float] = None
+        self.alert_id: Optional[str] = None
+
+
+class CompiledRule:
+    """A validated rule plus its per-series evaluation state."""
+
+    def __init__(self, definition: Dict):
+        self.definition = definition
+        self.id = definition["id"]
+        self.metric = definition["metric"]
+        self.kind = definition["type"]
+        self.compare = OPERATORS[definition["op"]]
+        self.threshold = float(definition["threshold"])
+        self.for_us = int(definition["for_seconds"] * 1_000_000)
+        self.state: Dict[int, _SeriesState] = {}
+
+    def observe(self, sid: int, ts: int, value: float) -> Optional[bool]:
+        """
+        Feed one sample; returns True when the rule starts firing, False when
+        it stops, and None when nothing changed.
+        """
+        state = self.state.get(sid)
+        if state is None:
+            state = self.state[sid] = _SeriesState()
+
+        if self.kind == "rate":
+            previous_ts, previous_value = state.last_ts, state.last_value
+            state.last_ts, state.last_value = ts, value
+            if previous_ts is None or ts == previous_ts:
+                return None
+            observed = (value - previous_value) / ((ts - previous_ts) / 1_000_000)
+        else:
+            observed = value
+
+        if not self.compare(observed, self.threshold):
+            state.since = None
+            return False if state.alert_id is not None else None
+
+        if state.since is None:
+            state.since = ts
+        if state.alert_id is None and ts - state.since >= self.for_us:
+            return True
+        return None
+
+    def render(self, value: float, unit: str, labels: Optional[Dict[str, str]] = None) -> Dict:
+        fields = {
+            "metric": self.metric,
+            "value": value,
+            "unit": unit,
+            "op": self.definition["op"],
+            "threshold": self.threshold,
+            "for_seconds": self.definition["for_seconds"],
+        }
+        source = f"rule:{self.id}"
+        if labels:
+            # Keeps alerts from different series of the metric apart
+            source += "{" + ",".join(f"{key}={label}" for key, label in sorted(labels.items())) + "}"
+        return {
+            "title": self.definition["name"],
+            "message": self.definition["message"].format(**fields),
+            "severity": self.definition["severity"],
+            "source": source,
+        }
+
+
+def compile_rule(definition: Dict) -> CompiledRule:
+    """Validate a rule definition. Raises ValueError describing the problem."""
+    if not isinstance(definition, dict):
+        raise ValueError("Rule must be an object")
+    rule = {
+        "id": definition.get("id") or str(uuid.uuid4()),
+        "name": definition.get("name"),
+        "metric": definition.get("metric"),
+        "type": definition.get("type", "threshold"),
+        "op": definition.get("op", ">"),
+        "threshold": definition.get("threshold"),
+        "for_seconds": definition.get("for_seconds", 0),
+        "severity": definition.get("severity", "warning"),
+        "message": definition.get("message", DEFAULT_MESSAGE),
+    }
+    for field in ("name", "metric"):
+        if not isinstance(rule[field], str) or not rule[field]:
+            raise ValueError(f"'{field}' must be a non-empty string")
+    if rule["type"] not in RULE_TYPES:
+        raise ValueError(f"'type' must be one of: {', '.join(RULE_TYPES)}")
+    if rule["op"] not in OPERATORS:
+        raise ValueError(f"'op' must be one of: {', '.join(OPERATORS)}")
+    if rule["severity"] not in SEVERITIES:
+        raise ValueError(f"'severity' must be one of: {', '.join(SEVERITIES)}")
+    for field in ("threshold", "for_seconds"):
+        if isinstance(rule[field], bool) or not isinstance(rule[field], (int, float)):
+            raise ValueError(f"'{field}' must be a number")
+    if rule["for_seconds"] < 0:
+        raise ValueError("'for_seconds' must not be negative")
+
+    compiled = CompiledRule(rule)
+    try:
+        compiled.render(0.0, "")
+    except (KeyError, IndexError, ValueError) as e:
+        raise ValueError(f"Invalid message template: {str(e)}")
+    return compiled
+
+
+class RuleEngine:
+    """
+    Rules indexed by metric name; fire/resolve callbacks create and close alerts.
+    """
+
+    def __init__(self, fire: Callable[[Dict], Dict], resolve: Callable[[str], Optional[Dict]]):
+        self._fire = fire
+        self._resolve = resolve
+        self._rules: Dict[str, CompiledRule] = {}
+        self._by_metric: Dict[str, List[CompiledRule]] = {}
+
+    def add(self, definition: Dict) -> Dict:
+        rule = compile_rule(definition)
+        if rule.id in self._rules:
+            self.remove(rule.id)
+        self._rules[rule.id] = rule
+        self._by_metric.setdefault(rule.metric, []).append(rule)
+        return rule.definition
+
+    def remove(self, rule_id: str) -> bool:
+        """Unregister a rule and resolve the alerts it has open."""
+        rule = self._rules.pop(rule_id, None)
+        if rule is None:
+            return False
+        # Nothing would ever resolve them once the rule is gone
+        for state in rule.state.values():
+            if state.alert_id is not None:
+                self._resolve(state.alert_id)
+                state.alert_id = None
+        self._by_metric[rule.metric].remove(rule)
+        if not self._by_metric[rule.metric]:
+            del self._by_metric[rule.metric]
+        return True
+
+    def list(self) -> List[Dict]:
+        return [rule.definition for rule in self._rules.values()]
+
+    def get(self, rule_id: str) -> Optional[Dict]:
+        rule = self._rules.get(rule_id)
+        return rule.definition if rule else None
+
+    def evaluate(self, sid: int, name: str, ts: int, value: float, unit: str,
+                 labels: Optional[Dict[str, str]] = None):
+        rules = self._by_metric.get(name)
+        if not rules:
+            return
+        for rule in rules:
+            transition = rule.observe(sid, ts, value)
+            if transition is None:
+                continue
+            state = rule.state[sid]
+            if transition:
+                state.alert_id = self._fire(rule.render(value, unit, labels))["id"]
+            else:
+                self._resolve(state.alert_id)
+                state.alert_id = None
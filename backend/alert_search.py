@@ -0,0 +1,126 @@
+"""
+Inverted index over alert titles and messages.
+
+Every alert gets a document number in creation order, and each token maps to
+an ascending array of document numbers. Walking the shortest posting list
+backwards therefore yields the newest matches first, and other query terms
+are checked by binary search, so a search only touches as many documents as
+it returns (plus whatever the filters reject).
+
+Postings are append-only: when an alert's text changes only its new tokens
+are inserted, and removed alerts leave stale entries behind. Results are
+re-verified against the alert's current text, and the index is rebuilt once
+stale documents outnumber live ones.
+"""
+from array import array
+from bisect import bisect_left, insort
+import re
+from typing import Dict, Iterable, List, Optional, Set
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> Set[str]:
+    return set(_TOKEN.findall(text.lower()))
+
+
+def _alert_tokens(alert: Dict) -> Set[str]:
+    return tokenize(f"{alert['title']} {alert['message']}")
+
+
+def _contains(postings: array, doc: int) -> bool:
+    index = bisect_left(postings, doc)
+    return index < len(postings) and postings[index] == doc
+
+
+class AlertIndex:
+    def __init__(self):
+        self._reset()
+
+    def _reset(self):
+        self._postings: Dict[str, array] = {}
+        # Document number -> alert dict (None once removed)
+        self._docs: List[Optional[Dict]] = []
+        self._doc_of: Dict[str, int] = {}
+        self._removed = 0
+
+    def __len__(self) -> int:
+        return len(self._doc_of)
+
+    def add(self, alert: Dict):
+        doc = len(self._docs)
+        self._docs.append(alert)
+        self._doc_of[alert["id"]] = doc
+        for token in _alert_tokens(alert):
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = array("q")
+            postings.append(doc)
+
+    def update(self, alert: Dict):
+        """Index tokens the alert's title/message gained since it was added."""
+        doc = self._doc_of.get(alert["id"])
+        if doc is None:
+            return
+        for token in _alert_tokens(alert):
+            postings = self._postings.get(token)
+            if postings is None:
+                self._postings[token] = array("q", [doc])
+            elif not _contains(postings, doc):
+                insort(postings, doc)
+
+    def remove(self, alert_id: str):
+        doc = self._doc_of.pop(alert_id, None)
+        if doc is None:
+            return
+        self._docs[doc] = None
+        self._removed += 1
+        if self._removed > len(self._doc_of):
+            self.rebuild(alert for alert in self._docs if alert is not None)
+
+    def rebuild(self, alerts: Iterable[Dict]):
+        alerts = list(alerts)
+        self._reset()
+        for alert in alerts:
+            self.add(alert)
+
+    def search(
+        self,
+        query: str,
+        severity: Optional[str] = None,
+        active_only: bool = False,
+        skip: int = 0,
+        limit: int = 100
+    ) -> List[Dict]:
+        """Alerts matching every token of the query, newest first."""
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        postings = []
+        for token in tokens:
+            token_postings = self._postings.get(token)
+            if token_postings is None:
+                return []
+            postings.append(token_postings)
+        postings.sort(key=len)
+        driver, others = postings[0], postings[1:]
+
+        results = []
+        wanted = skip + limit
+        for doc in reversed(driver):
+            alert = self._docs[doc]
+            if alert is None:
+                continue
+            if severity is not None and alert["severity"] != severity:
+                continue
+            if active_only and not alert["is_active"]:
+                continue
+            if not all(_contains(other, doc) for other in others):
+                continue
+            # Drop matches that only hit stale tokens of edited alerts
+            if not tokens <= _alert_tokens(alert):
+                continue
+            results.append(alert)
+            if len(results) >= wanted:
+                break
+        return results[skip:]
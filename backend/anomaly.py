@@ -0,0 +1,115 @@
+"""
+Streaming anomaly detection for metric series.
+
+Each series has two O(1) detectors:
+
+- an EWMA of mean and variance, scoring how far a sample sits from the
+  recent level (a z-score);
+- a seasonal baseline with one EWMA per slot of the season (by default
+  each hour of the day), scoring a sample against what is normal for that
+  time of day once the slot has warmed up.
+
+A sample's anomaly score is the larger of the two, capped at MAX_SCORE.
+Scores are kept as the per-bucket maximum in the metric rollups, which is
+what the heatmap endpoint reads.
+"""
+from array import array
+import math
+import os
+from typing import List, Optional
+
+import numpy as np
+
+ALPHA = float(os.getenv("ANOMALY_EWMA_ALPHA", 0.1))
+SEASON_SECONDS = int(os.getenv("ANOMALY_SEASON_SECONDS", 24 * 3600))
+SEASON_SLOTS = int(os.getenv("ANOMALY_SEASON_SLOTS", 24))
+# Samples a detector (or seasonal slot) needs before it scores anything
+WARMUP = 10
+MAX_SCORE = 10.0
+
+
+def _z(value: float, mean: float, var: float) -> float:
+    # Relative floor so a perfectly flat series does not score infinity
+    std = max(math.sqrt(var), 1e-3 * abs(mean), 1e-9)
+    return min(abs(value - mean) / std, MAX_SCORE)
+
+
+def _slot(ts: int) -> int:
+    return (ts // 1_000_000) % SEASON_SECONDS * SEASON_SLOTS // SEASON_SECONDS
+
+
+class SeriesDetector:
+    __slots__ = ("count", "mean", "var", "slot_counts", "slot_means", "slot_vars")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.var = 0.0
+        self.slot_counts = array("q", bytes(8 * SEASON_SLOTS))
+        self.slot_means = array("d", bytes(8 * SEASON_SLOTS))
+        self.slot_vars = array("d", bytes(8 * SEASON_SLOTS))
+
+    def score(self, ts: int, value: float) -> float:
+        """Score a sample against the current baselines, without learning from it."""
+        score = _z(value, self.mean, self.var) if self.count >= WARMUP else 0.0
+        slot = _slot(ts)
+        if self.slot_counts[slot] >= WARMUP:
+            score = max(score, _z(value, self.slot_means[slot], self.slot_vars[slot]))
+        return score
+
+    def learn(self, ts: int, value: float):
+        """Fold a sample into the baselines."""
+        self.count += 1
+        if self.count == 1:
+            self.mean = value
+        else:
+            diff = value - self.mean
+            increment = ALPHA * diff
+            self.mean += increment
+            self.var = (1 - ALPHA) * (self.var + diff * increment)
+
+        slot = _slot(ts)
+        slot_count = self.slot_counts[slot]
+        self.slot_counts[slot] = slot_count + 1
+        if slot_count == 0:
+            self.slot_means[slot] = value
+        else:
+            diff = value - self.slot_means[slot]
+            increment = ALPHA * diff
+            self.slot_means[slot] += increment
+            self.slot_vars[slot] = (1 - ALPHA) * (self.slot_vars[slot] + diff * increment)
+
+
+class AnomalyDetectors:
+    """One detector per series id."""
+
+    def __init__(self):
+        self._detectors: List[SeriesDetector] = []
+
+    def score(self, sid: int, ts: int, value: float) -> float:
+        """Score a sample of series sid; nothing changes until learn()."""
+        if sid >= len(self._detectors):
+            return 0.0
+        return self._detectors[sid].score(ts, value)
+
+    def learn(self, sid: int, ts: int, value: float):
+        while sid >= len(self._detectors):
+            self._detectors.append(SeriesDetector())
+        self._detectors[sid].learn(ts, value)
+
+
+def score_matrix(rows: List[Optional[tuple]], start: int, step: int, columns: int) -> np.ndarray:
+    """
+    Scatter per-series (bucket starts, scores) columns into a
+    series x bucket matrix; cells without data are NaN.
+    """
+    matrix = np.full((len(rows), columns), np.nan)
+    for row, columns_data in enumerate(rows):
+        if columns_data is None:
+            continue
+        starts, scores = columns_data
+        if not len(starts):
+            continue
+        index = (np.frombuffer(starts, dtype=np.int64) - start) // step
+        matrix[row, index] = np.frombuffer(scores, dtype=np.float64)
+    return matrix
@@ -0,0 +1,72 @@
+"""
+Storage and payload saved by alert deduplication under a flapping workload.
+
+A handful of checks fire over and over without resolving. The old store
+appended one dict per firing; now repeats bump the open alert's count.
+Run from the backend folder:
+
+    python benchmarks/bench_alert_dedup.py --firings 100000 --checks 20
+"""
+import argparse
+import json
+import os
+import sys
+import tracemalloc
+import uuid
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def firing(i: int, checks: int):
+    check = i % checks
+    return {
+        "title": f"Check {check} failing",
+        "message": f"Check {check} failed at attempt {i}",
+        "severity": "warning" if check % 2 else "critical",
+        "source": f"monitor-{check}",
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--firings", type=int, default=100_000)
+    parser.add_argument("--checks", type=int, default=20)
+    args = parser.parse_args()
+
+    tracemalloc.start()
+    naive = []
+    for i in range(args.firings):
+        alert_data = firing(i, args.checks)
+        naive.append({
+            "id": str(uuid.uuid4()),
+            "title": alert_data["title"],
+            "message": alert_data["message"],
+            "severity": alert_data["severity"],
+            "is_active": True,
+            "created_at": datetime.now().isoformat(),
+            "resolved_at": None
+        })
+    naive_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    import data
+    baseline = len(data.alerts)
+    tracemalloc.start()
+    for i in range(args.firings):
+        data.create_alert(firing(i, args.checks))
+    dedup_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    deduped = data.alerts[baseline:]
+
+    naive_payload = len(json.dumps({"alerts": naive}))
+    dedup_payload = len(json.dumps({"alerts": deduped}))
+    print(f"firings          : {args.firings:,} across {args.checks} flapping checks")
+    print(f"stored alerts    : {len(naive):,} -> {len(deduped):,}")
+    print(f"memory           : {naive_bytes / 1e6:,.1f} MB -> {dedup_bytes / 1e6:,.2f} MB")
+    print(f"full list payload: {naive_payload / 1e6:,.1f} MB -> {dedup_payload / 1e3:,.1f} kB")
+    print(f"groups payload   : {len(json.dumps({'groups': data.get_alert_groups(limit=1000)})) / 1e3:,.1f} kB")
+
+
+if __name__ == "__main__":
+    main()
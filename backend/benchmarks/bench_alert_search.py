@@ -0,0 +1,67 @@
+"""
+Keyword search latency over the alert inverted index.
+
+Indexes synthetic alerts and times typical operator queries. Run from the
+backend folder:
+
+    python benchmarks/bench_alert_search.py --alerts 1000000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from alert_search import AlertIndex
+
+TEMPLATES = [
+    ("High CPU Usage on {host}", "CPU usage has exceeded {n}% for the last 5 minutes"),
+    ("Memory Leak Detected on {host}", "Possible memory leak in application server {host}"),
+    ("Pipeline {pipeline} failed", "dbt run for {pipeline} failed with exit code {n}"),
+    ("Stale data in {pipeline}", "{pipeline} has not refreshed in {n} hours"),
+    ("Disk almost full on {host}", "Disk usage at {n}% on volume /data"),
+]
+SEVERITIES = ["critical", "warning", "info"]
+QUERIES = [
+    ("common word", "usage", {}),
+    ("two words", "memory leak", {}),
+    ("rare host", "host-4242", {}),
+    ("word + severity", "failed", {"severity": "critical"}),
+    ("word + active", "disk full", {"active_only": True}),
+    ("no match", "kubernetes", {}),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--alerts", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    random.seed(1)
+    index = AlertIndex()
+    start = time.perf_counter()
+    for i in range(args.alerts):
+        title, message = random.choice(TEMPLATES)
+        fields = {"host": f"host-{random.randrange(10_000)}", "pipeline": f"pipeline_{random.randrange(500)}",
+                  "n": random.randrange(100)}
+        index.add({
+            "id": str(i),
+            "title": title.format(**fields),
+            "message": message.format(**fields),
+            "severity": random.choice(SEVERITIES),
+            "is_active": random.random() < 0.1,
+        })
+    print(f"indexed {args.alerts:,} alerts in {time.perf_counter() - start:.1f}s")
+
+    for label, query, filters in QUERIES:
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            results = index.search(query, limit=100, **filters)
+        elapsed = (time.perf_counter() - start) / args.repeat * 1000
+        print(f"{label:<16} {query!r:<14} {len(results):>4} hits  {elapsed:7.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
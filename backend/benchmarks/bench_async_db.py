@@ -0,0 +1,117 @@
+"""
+Load-test the async SQL path against the sync one.
+
+Serves the dashboard summary (four queries) to concurrent clients on one
+event loop, as the async /api/dashboard route does, and reports throughput
+and the worst event-loop stall seen by a 1ms ticker:
+
+- sync: blocking SQLStorage calls made directly in the coroutine
+- sync in threadpool: the same calls via run_in_executor
+- async engine: SQLStorage.dashboard_summary on an AsyncSession
+- sync with echo: the threadpool path with statement logging on
+
+Run from the backend folder:
+
+    python benchmarks/bench_async_db.py --clients 32 --requests 2000
+"""
+import argparse
+import asyncio
+from contextlib import redirect_stdout
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from storage import SQLStorage
+
+
+def sync_summary(storage: SQLStorage) -> dict:
+    """What the route did before: four blocking backend calls."""
+    counts = storage.alert_counts()
+    return {
+        "metrics_count": storage.metric_count(),
+        "alerts_count": counts["total"],
+        "recent_metrics": storage.get_metrics(limit=5),
+        "active_alerts": storage.get_alerts(limit=5, active_only=True),
+    }
+
+
+async def load(call, clients: int, requests: int):
+    """Run requests calls with clients in flight; return (req/s, max loop lag ms)."""
+    remaining = requests
+    lag = 0.0
+    done = False
+
+    async def ticker():
+        nonlocal lag
+        while not done:
+            start = time.perf_counter()
+            await asyncio.sleep(0.001)
+            lag = max(lag, time.perf_counter() - start - 0.001)
+
+    async def client():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            await call()
+
+    tick = asyncio.ensure_future(ticker())
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    elapsed = time.perf_counter() - start
+    done = True
+    await tick
+    return requests / elapsed, lag * 1000
+
+
+async def run(args, url: str):
+    sync_storage = SQLStorage(create_engine(url), create_async_engine(url.replace("sqlite", "sqlite+aiosqlite", 1)))
+    sync_storage.create_metrics_batch(
+        {"name": f"m{i % 20}", "value": float(i), "unit": "%"} for i in range(args.metrics))
+    for i in range(args.alerts):
+        sync_storage.create_alert({"title": f"a{i}", "message": "m", "severity": "info"})
+    sync_storage.close()
+    loop = asyncio.get_running_loop()
+
+    async def blocking():
+        return sync_summary(sync_storage)
+
+    async def threadpool():
+        return await loop.run_in_executor(None, sync_summary, sync_storage)
+
+    results = {
+        "sync": await load(blocking, args.clients, args.requests),
+        "sync in threadpool": await load(threadpool, args.clients, args.requests),
+        "async engine": await load(sync_storage.dashboard_summary, args.clients, args.requests),
+    }
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        echo_storage = SQLStorage(create_engine(url, echo=True))
+
+        async def echo_threadpool():
+            return await loop.run_in_executor(None, sync_summary, echo_storage)
+
+        results["sync with echo"] = await load(echo_threadpool, args.clients, args.requests)
+    await sync_storage.async_engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--metrics", type=int, default=10_000)
+    parser.add_argument("--alerts", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = asyncio.run(run(args, f"sqlite:///{os.path.join(tmp, 'bench.db')}"))
+    for label, (rate, lag) in results.items():
+        print(f"{label:>20}: {rate:8,.0f} req/s, max event loop stall {lag:7.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Compare per-sample POST /api/metrics/ with the batch endpoint.
+
+Runs the app in-process through FastAPI's TestClient, so the numbers
+include request parsing and routing but not the network. Run from the
+backend folder:
+
+    python benchmarks/bench_batch_ingest.py --samples 20000
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fastapi.testclient import TestClient
+from main import app
+
+
+def samples(count: int, name: str):
+    return [{"name": name, "value": float(i), "unit": "ms"} for i in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--samples", type=int, default=20_000)
+    parser.add_argument("--batch-size", type=int, default=5_000)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    client = TestClient(app)
+
+    per_sample = samples(min(args.samples, 5_000), "bench_single")
+    start = time.perf_counter()
+    for sample in per_sample:
+        client.post("/api/metrics/", json=sample)
+    single_rate = len(per_sample) / (time.perf_counter() - start)
+
+    batch = samples(args.samples, "bench_array")
+    start = time.perf_counter()
+    for i in range(0, len(batch), args.batch_size):
+        client.post("/api/metrics/batch", json=batch[i:i + args.batch_size])
+    array_rate = len(batch) / (time.perf_counter() - start)
+
+    body = "\n".join(json.dumps(sample) for sample in samples(args.samples, "bench_ndjson"))
+    start = time.perf_counter()
+    client.post("/api/metrics/batch", content=body, headers={"content-type": "application/x-ndjson"})
+    ndjson_rate = args.samples / (time.perf_counter() - start)
+
+    print(f"per-sample POST : {single_rate:>12,.0f} samples/s")
+    print(f"JSON array batch: {array_rate:>12,.0f} samples/s ({array_rate / single_rate:.0f}x)")
+    print(f"NDJSON stream   : {ndjson_rate:>12,.0f} samples/s ({ndjson_rate / single_rate:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
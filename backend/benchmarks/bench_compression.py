@@ -0,0 +1,88 @@
+"""
+Benchmark Gorilla chunk encoding of metric series.
+
+Reports encoded size and encode/decode throughput for a few series shapes
+against the 16 bytes/sample of the raw columns. Run from the backend folder:
+
+    python benchmarks/bench_compression.py --samples 1000000
+"""
+import argparse
+from array import array
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import gorilla
+from timeseries import CHUNK_SIZE, now_us
+
+INTERVAL_US = 10_000_000
+
+
+def steady_gauge(samples: int, rng: random.Random):
+    """cpu_usage style: one-decimal readings that hold for a while, then step."""
+    value = 45.2
+    for _ in range(samples):
+        if rng.random() < 0.1:
+            value = round(min(max(value + rng.uniform(-2, 2), 0.0), 100.0), 1)
+        yield value
+
+
+def constant_gauge(samples: int, rng: random.Random):
+    """memory_usage style: a level that almost never moves."""
+    value = 3.7
+    for _ in range(samples):
+        if rng.random() < 0.001:
+            value = round(value + 0.1, 1)
+        yield value
+
+
+def noisy_gauge(samples: int, rng: random.Random):
+    """Full-precision values that change on every sample (worst case)."""
+    for _ in range(samples):
+        yield rng.gauss(50, 5)
+
+
+SHAPES = {"steady": steady_gauge, "constant": constant_gauge, "noisy": noisy_gauge}
+
+
+def timestamps(samples: int, jitter_us: int, rng: random.Random) -> array:
+    start = now_us()
+    return array("q", (start + i * INTERVAL_US + (rng.randint(0, jitter_us) if jitter_us else 0)
+                       for i in range(samples)))
+
+
+def bench(ts: array, values: array):
+    chunks = range(0, len(ts), CHUNK_SIZE)
+    start = time.perf_counter()
+    encoded = [gorilla.encode(ts[i:i + CHUNK_SIZE], values[i:i + CHUNK_SIZE]) for i in chunks]
+    encode = len(ts) / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for i, data in zip(chunks, encoded):
+        gorilla.decode(data, min(CHUNK_SIZE, len(ts) - i))
+    decode = len(ts) / (time.perf_counter() - start)
+
+    size = sum(len(data) for data in encoded)
+    return size / len(ts), encode, decode
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--samples", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    for jitter_us, label in ((0, "aligned"), (2_000, "2ms jitter")):
+        ts = timestamps(args.samples, jitter_us, rng)
+        for shape, generate in SHAPES.items():
+            values = array("d", generate(args.samples, rng))
+            per_sample, encode, decode = bench(ts, values)
+            print(f"{shape:>8} / {label:<10}: {per_sample:5.2f} B/sample ({16 / per_sample:4.1f}x), "
+                  f"encode {encode:,.0f}/s, decode {decode:,.0f}/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Benchmark the chunked CSV preview (csv_stream.read_preview) on a large CSV.
+
+Writes a CSV of the requested size and times reading the whole upload,
+decoding it and parsing every row against the chunked preview, each
+in a fresh process so peak memory can be compared. Run from the backend
+folder:
+
+    python benchmarks/bench_csv_upload.py --mb 500
+"""
+import argparse
+import io
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def write_csv(path: str, mb: int, seed: int = 0):
+    rng = random.Random(seed)
+    with open(path, "w") as f:
+        f.write("timestamp,host,metric,value,note\n")
+        i = 0
+        while f.tell() < mb << 20:
+            lines = [f'2024-01-01T00:{i % 60:02d}:00,host{rng.randint(0, 99)},cpu_usage,'
+                     f'{rng.random() * 100:.3f},"ok, {i}"\n' for i in range(i, i + 10000)]
+            i += len(lines)
+            f.writelines(lines)
+
+
+def full_parse(path: str):
+    import pandas as pd
+
+    with open(path, "rb") as f:
+        contents = f.read()
+    records = pd.read_csv(io.StringIO(contents.decode("utf-8"))).to_dict("records")
+    return len(records)
+
+
+def chunked_preview(path: str):
+    from csv_stream import iter_chunks, read_preview
+
+    with open(path, "rb") as f:
+        return read_preview(iter_chunks(f))[1]
+
+
+def measure(name: str, path: str, results):
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    rows = {"full parse": full_parse, "chunked preview": chunked_preview}[name](path)
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline
+    results.put((name, rows, elapsed, peak / 1024))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--mb", type=int, default=200)
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "upload.csv")
+        write_csv(path, args.mb)
+        for name in ("full parse", "chunked preview"):
+            results = ctx.Queue()
+            process = ctx.Process(target=measure, args=(name, path, results))
+            process.start()
+            name, rows, elapsed, peak_mb = results.get()
+            process.join()
+            print(f"{name:>16}: {rows:,} rows in {elapsed:6.2f}s, peak memory +{peak_mb:,.0f} MB "
+                  f"({args.mb} MB file)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Benchmark concurrent CSV ingestion in the threadpool and in the worker pool.
+
+Parses and profiles the same file into the dataset cache for several
+concurrent clients on one event loop, as /api/upload-csv does on a cache
+miss, while a 1ms ticker stands in for other requests such as /api/health.
+Reports total time and the worst event-loop stall:
+
+- threadpool: ingest_csv via run_in_threadpool (pandas holds the GIL)
+- process pool: CSVWorkerPool.upload (spool to a temp file) then run
+
+Worker start-up is paid before timing. Run from the backend folder:
+
+    python benchmarks/bench_csv_workers.py --mb 50 --clients 4
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fastapi.concurrency import run_in_threadpool
+
+from bench_csv_upload import write_csv
+from csv_workers import CSVWorkerPool
+from dataset_cache import ingest_csv
+
+
+async def load(call, clients: int):
+    """Run call once per client concurrently; return (seconds, max loop lag ms)."""
+    lag = 0.0
+    done = False
+
+    async def ticker():
+        nonlocal lag
+        while not done:
+            start = time.perf_counter()
+            await asyncio.sleep(0.001)
+            lag = max(lag, time.perf_counter() - start - 0.001)
+
+    tick = asyncio.ensure_future(ticker())
+    start = time.perf_counter()
+    await asyncio.gather(*(call() for _ in range(clients)))
+    elapsed = time.perf_counter() - start
+    done = True
+    await tick
+    return elapsed, lag * 1000
+
+
+async def run(args, path: str, root: str):
+    pool = CSVWorkerPool(workers=args.workers, queue_depth=args.clients)
+
+    # A fresh dataset ID per call, so every client parses
+    async def threadpool():
+        return await run_in_threadpool(ingest_csv, path, root, uuid.uuid4().hex)
+
+    async def submit(source: str):
+        with open(source, "rb") as f:
+            async with pool.upload(f) as upload:
+                return await pool.run(ingest_csv, upload.path, root, uuid.uuid4().hex)
+
+    async def process_pool():
+        return await submit(path)
+
+    # Start the workers (and their imports) before timing
+    with tempfile.NamedTemporaryFile(suffix=".csv") as warm:
+        warm.write(b"a\n1\n")
+        warm.flush()
+        await asyncio.gather(*(submit(warm.name) for _ in range(pool.workers)))
+
+    try:
+        return {
+            "threadpool": await load(threadpool, args.clients),
+            f"process pool ({pool.workers})": await load(process_pool, args.clients),
+        }
+    finally:
+        pool.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--mb", type=int, default=50)
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "upload.csv")
+        write_csv(path, args.mb)
+        results = asyncio.run(run(args, path, os.path.join(tmp, "cache")))
+    print(f"{args.clients} concurrent {args.mb} MB uploads, {os.cpu_count()} CPUs")
+    for label, (elapsed, lag) in results.items():
+        print(f"{label:>18}: {elapsed:6.2f}s, max event loop stall {lag:7.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
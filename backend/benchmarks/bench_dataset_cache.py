@@ -0,0 +1,75 @@
+"""
+Benchmark paged reads and profiles from the dataset cache against re-parsing.
+
+Ingests a generated CSV once (parse, profile and write the row groups), then
+times what a repeat request costs:
+
+- profile: profiling the file again vs reading the cached profile
+- page of 100 rows at the start, middle and end of the file: parsing up to
+  it with read_csv(skiprows, nrows) vs Dataset.records, all columns and one
+
+Run from the backend folder:
+
+    python benchmarks/bench_dataset_cache.py --mb 200
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pandas as pd
+
+from bench_csv_upload import write_csv
+from csv_profile import profile_csv
+from dataset_cache import DatasetCache, ingest_csv
+
+
+def timed(fn, *args, repeat: int = 1):
+    """Best of repeat runs, in ms."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--mb", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "upload.csv")
+        write_csv(path, args.mb)
+        cache = DatasetCache(os.path.join(tmp, "cache"))
+
+        start = time.perf_counter()
+        manifest = ingest_csv(path, cache.root, "0" * 32)
+        ingest = time.perf_counter() - start
+        dataset = cache.get(manifest["id"])
+        print(f"ingest: {dataset.rows:,} rows in {ingest:.2f}s, "
+              f"{manifest['bytes'] / 2**20:,.0f} MB cached ({args.mb} MB file)")
+
+        def reprofile():
+            with open(path, "rb") as f:
+                profile_csv(f).column_stats()
+
+        def cached_profile():
+            cache.get(manifest["id"]).manifest["profile"]
+
+        print(f"{'profile':>22}: re-parse {timed(reprofile):9.1f}ms, cache {timed(cached_profile, repeat=5):7.2f}ms")
+
+        one = dataset.columns[:1]
+        for label, skip in (("start", 0), ("middle", dataset.rows // 2), ("end", dataset.rows - 100)):
+            reparse = timed(lambda: pd.read_csv(path, skiprows=range(1, skip + 1), nrows=100), repeat=1)
+            cached = timed(lambda: cache.get(manifest["id"]).records(skip, 100), repeat=5)
+            projected = timed(lambda: cache.get(manifest["id"]).records(skip, 100, one), repeat=5)
+            print(f"{'page at ' + label:>22}: re-parse {reparse:9.1f}ms, cache {cached:7.2f}ms, "
+                  f"one column {projected:6.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmark SQL metric inserts from concurrent writers.
+
+Compares a commit per row (crud.create_metric: add, commit, refresh) with
+the group-commit writer, waiting for each row's key and fire-and-forget.
+Run from the backend folder:
+
+    python benchmarks/bench_group_commit.py --threads 16 --rows 500
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import crud
+import database
+import models
+import schemas
+from write_buffer import GroupCommitWriter
+
+
+def concurrent_rate(threads: int, rows: int, write) -> float:
+    def worker(thread: int):
+        for i in range(rows):
+            write(thread, i)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(worker, range(threads)))
+    return threads * rows / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--database-url", default=None, help="Defaults to a temporary SQLite file")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--rows", type=int, default=500, help="Rows per thread")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = args.database_url or f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        engine = create_engine(url, connect_args={"check_same_thread": False} if url.startswith("sqlite") else {})
+        database.Base.metadata.create_all(bind=engine)
+        session = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+        table = models.Metric.__table__
+
+        def per_row(thread, i):
+            with session() as db:
+                crud.create_metric(db, schemas.MetricCreate(name=f"w{thread}", value=i, unit="%"))
+
+        def row(thread, i):
+            return {"name": f"w{thread}", "value": float(i), "unit": "%", "timestamp": datetime.now()}
+
+        results = {"commit per row": concurrent_rate(args.threads, args.rows, per_row)}
+        writer = GroupCommitWriter(engine)
+        results["group commit, wait"] = concurrent_rate(
+            args.threads, args.rows, lambda thread, i: writer.submit(table, row(thread, i)))
+        stats = writer.stats()
+        start = time.perf_counter()
+        concurrent_rate(args.threads, args.rows, lambda thread, i: writer.submit(table, row(thread, i), wait=False))
+        writer.close()
+        results["group commit, no wait"] = args.threads * args.rows / (time.perf_counter() - start)
+        engine.dispose()
+
+    for label, rate in results.items():
+        print(f"{label:>22}: {rate:10,.0f} rows/s")
+    print(f"waiting writes: {stats['rows'] / stats['transactions']:.1f} rows per transaction, "
+          f"largest {stats['largest_batch']}")
+
+
+if __name__ == "__main__":
+    main()
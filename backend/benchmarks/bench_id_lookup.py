@@ -0,0 +1,57 @@
+"""
+Regression benchmark for lookups by ID.
+
+Grows the in-memory store from 1k to 1M records and checks that
+get_metric_by_id, get_alert_by_id and update_alert latency stays flat.
+Metric lookups are timed twice: the first pass decodes each sealed chunk it
+touches ("cold"), later ones hit the decode cache while the sampled chunks
+fit in METRICS_DECODE_CACHE_CHUNKS.
+Run from the backend folder:
+
+    python benchmarks/bench_id_lookup.py
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import data
+
+SIZES = [1_000, 10_000, 100_000, 1_000_000]
+
+
+def time_per_call(fn, ids, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for record_id in ids:
+            fn(record_id)
+    return (time.perf_counter() - start) / (repeat * len(ids)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--lookups", type=int, default=10_000)
+    parser.add_argument("--max-size", type=int, default=SIZES[-1])
+    args = parser.parse_args()
+
+    metric_ids, alert_ids = [], []
+    print(f"{'records':>10} {'metric (cold)':>14} {'metric by id':>14} {'alert by id':>14} {'update alert':>14}")
+    for size in (s for s in SIZES if s <= args.max_size):
+        while len(metric_ids) < size:
+            i = len(metric_ids)
+            metric_ids.append(data.create_metric({"name": f"m{i % 50}", "value": i, "unit": "ms"})["id"])
+            alert_ids.append(data.create_alert({"title": f"a{i}", "message": "m", "severity": "info"})["id"])
+
+        sample_metrics = random.sample(metric_ids, min(args.lookups, size))
+        sample_alerts = random.sample(alert_ids, min(args.lookups, size))
+        cold_us = time_per_call(data.get_metric_by_id, sample_metrics, 1)
+        metric_us = time_per_call(data.get_metric_by_id, sample_metrics, 3)
+        alert_us = time_per_call(data.get_alert_by_id, sample_alerts, 3)
+        update_us = time_per_call(lambda a: data.update_alert(a, {"is_active": True}), sample_alerts, 1)
+        print(f"{size:>10,} {cold_us:>12.2f}us {metric_us:>12.2f}us {alert_us:>12.2f}us {update_us:>12.2f}us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark the columnar metric store against the old list-of-dicts layout.
+
+Reports memory per sample and read throughput. Run from the backend folder:
+
+    python benchmarks/bench_metric_store.py --samples 10000000
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+import uuid
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from timeseries import MetricStore, now_us
+
+NAMES = ["cpu_usage", "memory_usage", "disk_space", "network_in", "network_out"]
+UNITS = ["%", "GB", "GB", "MB/s", "MB/s"]
+
+
+def bench_legacy(samples: int):
+    tracemalloc.start()
+    rows = []
+    for i in range(samples):
+        k = i % len(NAMES)
+        rows.append({
+            "id": str(uuid.uuid4()),
+            "name": NAMES[k],
+            "value": float(i),
+            "unit": UNITS[k],
+            "timestamp": datetime.now().isoformat()
+        })
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    matched = [row for row in rows if row["name"] == "cpu_usage"]
+    total = sum(row["value"] for row in matched)
+    elapsed = time.perf_counter() - start
+    return current / samples, samples / elapsed, total
+
+
+def bench_columnar(samples: int):
+    store = MetricStore()
+    ts = now_us()
+    start = time.perf_counter()
+    for i in range(samples):
+        k = i % len(NAMES)
+        store.append(NAMES[k], float(i), UNITS[k], ts + i)
+    ingest = samples / (time.perf_counter() - start)
+
+    series = store.series("cpu_usage")
+    start = time.perf_counter()
+    total = sum(value for _, _, value, _ in series.scan(series.window()))
+    scan = len(series) / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    page = store.records(series, series.window()[:100_000])
+    materialize = len(page) / (time.perf_counter() - start)
+
+    return store.nbytes() / samples, ingest, scan, materialize, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--samples", type=int, default=10_000_000)
+    parser.add_argument("--legacy-samples", type=int, default=200_000,
+                        help="The dict layout is measured on a smaller set and extrapolated")
+    args = parser.parse_args()
+
+    per_sample, legacy_scan, _ = bench_legacy(args.legacy_samples)
+    print(f"legacy  : {per_sample:8.1f} B/sample, "
+          f"name scan {legacy_scan:,.0f} samples/s ({args.legacy_samples:,} samples)")
+
+    per_sample, ingest, scan, materialize, _ = bench_columnar(args.samples)
+    print(f"columnar: {per_sample:8.1f} B/sample, "
+          f"ingest {ingest:,.0f}/s, scan {scan:,.0f} samples/s, "
+          f"record materialize {materialize:,.0f}/s ({args.samples:,} samples)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Benchmark SQL metric layouts for name + time range reads and retention.
+
+Loads the same samples into a metrics table without the (name, timestamp)
+index, with it, and into daily partitions, then times pages of one metric
+over an hour and over a week, and removing the oldest days (DELETE vs
+DROP TABLE). Run from the backend folder:
+
+    python benchmarks/bench_sql_partitions.py --days 14 --per-day 100000
+"""
+import argparse
+from datetime import datetime, timedelta
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Expire explicitly below rather than on ingest
+os.environ["METRICS_MAX_AGE_SECONDS"] = "0"
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+import crud
+from storage import SQLStorage
+
+NAMES = [f"metric_{i}" for i in range(50)]
+
+
+def samples(days: int, per_day: int, rng: random.Random):
+    start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=days - 1)
+    step = 86400 / per_day
+    for i in range(days * per_day):
+        yield {
+            "name": rng.choice(NAMES),
+            "value": rng.random(),
+            "unit": "%",
+            "timestamp": (start + timedelta(seconds=i * step)).isoformat(),
+        }
+
+
+def timed(fn, repeat: int = 1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--days", type=int, default=14)
+    parser.add_argument("--per-day", type=int, default=100_000)
+    parser.add_argument("--expire-days", type=int, default=7)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    layouts = {
+        "no name index": ("none", True),
+        "(name, timestamp) index": ("none", False),
+        "daily partitions": ("daily", False),
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, (partitioning, drop_index) in layouts.items():
+            engine = create_engine(f"sqlite:///{os.path.join(tmp, partitioning + str(drop_index))}.db")
+            storage = SQLStorage(engine, partitioning=partitioning)
+            if drop_index:
+                with engine.begin() as conn:
+                    conn.execute(text("DROP INDEX ix_metrics_name_timestamp_id"))
+            load_ms, _ = timed(lambda: storage.create_metrics_batch(samples(args.days, args.per_day, random.Random(0))))
+
+            midnight = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+            hour_start = midnight - timedelta(hours=12)
+            hour_ms, (hour_page, _) = timed(lambda: storage.get_metrics_page(
+                name="metric_7", start=hour_start, end=hour_start + timedelta(hours=1), limit=1000
+            ), args.repeat)
+            week_ms, (week_page, _) = timed(lambda: storage.get_metrics_page(
+                name="metric_7", start=midnight - timedelta(days=7), limit=1000
+            ), args.repeat)
+
+            cutoff = midnight - timedelta(days=args.days - args.expire_days - 1)
+
+            def expire():
+                with Session(engine) as db:
+                    if storage.partitioned:
+                        removed = crud.drop_metric_partitions_before(db, cutoff.date())
+                    else:
+                        removed = crud.delete_metrics_before(db, cutoff)
+                    db.commit()
+                return removed
+            expire_ms, removed = timed(expire)
+            storage.close()
+            print(f"{label:>24}: load {args.days * args.per_day / load_ms * 1000:9,.0f} rows/s, "
+                  f"1h page ({len(hour_page)} rows) {hour_ms:6.2f}ms, "
+                  f"week page ({len(week_page)} rows) {week_ms:6.2f}ms, "
+                  f"expire {removed:,} rows {expire_ms:7.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Run the same workload against every storage backend.
+
+Times single and batch metric ingest, lookups by ID, a full cursor scan and
+alert create/resolve through the Storage interface, so the in-memory and SQL
+backends are compared like for like. Run from the backend folder:
+
+    python benchmarks/bench_storage.py --database-url sqlite:///./bench.db
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sqlalchemy import create_engine
+
+from storage import MemoryStorage, SQLStorage
+
+NAMES = ["cpu_usage", "memory_usage", "disk_space", "network_in", "network_out"]
+
+
+def rate(count: int, fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return count / (time.perf_counter() - start)
+
+
+def run(storage, args) -> dict:
+    results = {}
+    ids = []
+
+    def single():
+        for i in range(args.single):
+            ids.append(storage.create_metric({"name": NAMES[i % len(NAMES)], "value": float(i), "unit": "%"})["id"])
+    results["single insert/s"] = rate(args.single, single)
+
+    samples = [{"name": NAMES[i % len(NAMES)], "value": float(i), "unit": "%"} for i in range(args.batch)]
+    results["batch insert/s"] = rate(args.batch, lambda: storage.create_metrics_batch(samples))
+
+    lookups = random.sample(ids, min(args.lookups, len(ids)))
+    results["get by id/s"] = rate(len(lookups), lambda: [storage.get_metric_by_id(i) for i in lookups])
+
+    def scan():
+        cursor, seen = None, 0
+        while True:
+            page, cursor = storage.get_metrics_page(cursor=cursor, limit=1000, name="cpu_usage")
+            seen += len(page)
+            if cursor is None:
+                return seen
+    scanned = scan()
+    results["cursor scan rows/s"] = rate(scanned, scan)
+
+    def alerts():
+        for i in range(args.alerts):
+            alert = storage.create_alert({"title": f"bench {i}", "message": "m", "severity": "info"})
+            storage.update_alert(alert["id"], {"is_active": False})
+    results["alert create+resolve/s"] = rate(args.alerts, alerts)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--database-url", default=None, help="Defaults to a temporary SQLite file")
+    parser.add_argument("--single", type=int, default=2_000)
+    parser.add_argument("--batch", type=int, default=100_000)
+    parser.add_argument("--lookups", type=int, default=1_000)
+    parser.add_argument("--alerts", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = args.database_url or f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        backends = {"memory": MemoryStorage(), "sql": SQLStorage(create_engine(url))}
+        results = {name: run(storage, args) for name, storage in backends.items()}
+
+    print(f"{'':>24}" + "".join(f"{name:>14}" for name in results))
+    for metric in results["memory"]:
+        print(f"{metric:>24}" + "".join(f"{result[metric]:>14,.0f}" for result in results.values()))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,188 @@
+import re
+from sqlalchemy import Table, func, inspect, tuple_
 from sqlalchemy.orm import Session
-from datetime import datetime
-from typing import List, Optional
+from datetime import date, datetime, time
+from typing import Dict, List, Optional, Tuple
 
 import models
 import schemas
+from pagination import decode_cursor, encode_cursor
+
+def _decode_sql_cursor(cursor: str) -> Tuple[datetime, int]:
+    timestamp, record_id = decode_cursor(cursor)
+    if not isinstance(timestamp, str) or not isinstance(record_id, int):
+        raise ValueError("Invalid cursor")
+    return datetime.fromisoformat(timestamp), record_id
 
 # Metrics CRUD operations
 def get_metrics(db: Session, skip: int = 0, limit: int = 100) -> List[models.Metric]:
     return db.query(models.Metric).offset(skip).limit(limit).all()
 
+def get_recent_metrics(db: Session, limit: int = 5) -> List[models.Metric]:
+    """The last rows inserted, newest first (a backward primary key scan)."""
+    return db.query(models.Metric).order_by(models.Metric.id.desc()).limit(limit).all()
+
+def _filter_metrics(query, columns, start, end, name, after):
+    if name is not None:
+        query = query.filter(columns.name == name)
+    if start is not None:
+        query = query.filter(columns.timestamp >= start)
+    if end is not None:
+        query = query.filter(columns.timestamp < end)
+    if after is not None:
+        query = query.filter(tuple_(columns.timestamp, columns.id) > after)
+    return query.order_by(columns.timestamp, columns.id)
+
+def _next_metrics_cursor(rows, limit: int) -> Optional[str]:
+    if len(rows) == limit:
+        return encode_cursor(rows[-1].timestamp.isoformat(), rows[-1].id)
+    return None
+
+def get_metrics_page(
+    db: Session,
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    skip: int = 0,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    name: Optional[str] = None
+) -> Tuple[List[models.Metric], Optional[str]]:
+    """
+    Keyset page ordered by (timestamp, id); a range seek on
+    ix_metrics_timestamp_id, or ix_metrics_name_timestamp_id for one name.
+    """
+    after = _decode_sql_cursor(cursor) if cursor is not None else None
+    query = _filter_metrics(db.query(models.Metric), models.Metric, start, end, name, after)
+    rows = query.offset(skip).limit(limit).all()
+    return rows, _next_metrics_cursor(rows, limit)
+
 def get_metric_by_id(db: Session, metric_id: int) -> Optional[models.Metric]:
     return db.query(models.Metric).filter(models.Metric.id == metric_id).first()
 
 def get_metrics_by_name(db: Session, name: str) -> List[models.Metric]:
     return db.query(models.Metric).filter(models.Metric.name == name).all()
 
+def count_metrics(db: Session) -> int:
+    return db.query(func.count(models.Metric.id)).scalar()
+
+def insert_metrics(db: Session, rows: List[Dict]) -> int:
+    """Insert many metric rows as a single executemany. Caller commits."""
+    if rows:
+        db.execute(models.Metric.__table__.insert(), rows)
+    return len(rows)
+
+def delete_metrics_before(db: Session, cutoff: datetime) -> int:
+    """Delete metrics older than cutoff in one statement. Caller commits."""
+    return db.query(models.Metric).filter(models.Metric.timestamp < cutoff).delete(synchronize_session=False)
+
+# Daily-partitioned metrics (metrics_YYYYMMDD tables). Rows live in the
+# partition of their timestamp's day, so the day and the row id identify a
+# metric and (timestamp, id) cursors stay valid across partitions.
+_PARTITION_TABLE = re.compile(rf"^{models.Metric.__tablename__}_(\d{{8}})$")
+
+def metric_partition_days(db: Session) -> List[date]:
+    """Days that have a partition table, oldest first."""
+    days = []
+    for table_name in inspect(db.connection()).get_table_names():
+        match = _PARTITION_TABLE.match(table_name)
+        if match:
+            days.append(datetime.strptime(match.group(1), "%Y%m%d").date())
+    return sorted(days)
+
+def create_metric_partition(db: Session, day: date) -> Table:
+    table = models.metric_partition(day)
+    table.create(bind=db.connection(), checkfirst=True)
+    return table
+
+def drop_metric_partitions_before(db: Session, day: date) -> int:
+    """Drop every partition older than day; returns the number of rows dropped."""
+    dropped = 0
+    for old_day in metric_partition_days(db):
+        if old_day >= day:
+            break
+        table = models.metric_partition(old_day)
+        dropped += db.query(func.count(table.c.id)).scalar()
+        table.drop(bind=db.connection())
+        models.forget_metric_partition(old_day)
+    return dropped
+
+def _pruned_partitions(days: List[date], start: Optional[datetime], end: Optional[datetime]):
+    """Partition tables that can hold timestamps in [start, end)."""
+    for day in days:
+        if start is not None and day < start.date():
+            continue
+        if end is not None and datetime.combine(day, time.min) >= end:
+            break
+        yield models.metric_partition(day)
+
+def get_partitioned_metrics_page(
+    db: Session,
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    skip: int = 0,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    name: Optional[str] = None
+) -> Tuple[List, Optional[str]]:
+    """
+    get_metrics_page over the partitions. Only days inside [start, end) and
+    not before the cursor are queried, in order, until the page is full.
+    """
+    after = _decode_sql_cursor(cursor) if cursor is not None else None
+    lower = start
+    if after is not None and (lower is None or after[0] > lower):
+        lower = after[0]
+    rows = []
+    for table in _pruned_partitions(metric_partition_days(db), lower, end):
+        query = _filter_metrics(db.query(table), table.c, start, end, name, after)
+        if skip:
+            matched = query.order_by(None).count()
+            if matched <= skip:
+                skip -= matched
+                continue
+        rows.extend(query.offset(skip).limit(limit - len(rows)).all())
+        skip = 0
+        if len(rows) == limit:
+            break
+    return rows, _next_metrics_cursor(rows, limit)
+
+def get_partitioned_recent_metrics(db: Session, limit: int = 5) -> List:
+    """get_recent_metrics over the partitions, newest day first."""
+    rows = []
+    for day in reversed(metric_partition_days(db)):
+        table = models.metric_partition(day)
+        rows.extend(db.query(table).order_by(table.c.id.desc()).limit(limit - len(rows)).all())
+        if len(rows) == limit:
+            break
+    return rows
+
+def get_partitioned_metric(db: Session, day: date, metric_id: int):
+    if day not in metric_partition_days(db):
+        return None
+    table = models.metric_partition(day)
+    return db.query(table).filter(table.c.id == metric_id).first()
+
+def get_partitioned_metrics_by_name(db: Session, name: str) -> List:
+    rows = []
+    for table in _pruned_partitions(metric_partition_days(db), None, None):
+        rows.extend(db.query(table).filter(table.c.name == name).all())
+    return rows
+
+def count_partitioned_metrics(db: Session) -> int:
+    return sum(
+        db.query(func.count(table.c.id)).scalar()
+        for table in _pruned_partitions(metric_partition_days(db), None, None)
+    )
+
+def insert_partitioned_metrics(db: Session, rows: List[Dict]) -> int:
+    """Insert rows into their day's partition, creating it if needed. Caller commits."""
+    by_day: Dict[date, List[Dict]] = {}
+    for row in rows:
+        by_day.setdefault(row["timestamp"].date(), []).append(row)
+    for day, day_rows in by_day.items():
+        db.execute(create_metric_partition(db, day).insert(), day_rows)
+    return len(rows)
+
 def create_metric(db: Session, metric: schemas.MetricCreate) -> models.Metric:
     db_metric = models.Metric(**metric.dict())
     db.add(db_metric)
@@ -31,9 +199,40 @@ def get_alerts(db: Session, skip: int = 0, limit: int = 100, active_only: bool =
     
     return query.offset(skip).limit(limit).all()
 
+def get_alerts_page(
+    db: Session,
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    active_only: bool = False,
+    skip: int = 0
+) -> Tuple[List[models.Alert], Optional[str]]:
+    """
+    Keyset page ordered by (created_at, id); a range seek on the alert indexes.
+    """
+    query = db.query(models.Alert)
+    
+    if active_only:
+        query = query.filter(models.Alert.is_active == True)
+    
+    if cursor is not None:
+        created_at, alert_id = _decode_sql_cursor(cursor)
+        query = query.filter(tuple_(models.Alert.created_at, models.Alert.id) > (created_at, alert_id))
+    
+    rows = query.order_by(models.Alert.created_at, models.Alert.id).offset(skip).limit(limit).all()
+    next_cursor = None
+    if len(rows) == limit:
+        next_cursor = encode_cursor(rows[-1].created_at.isoformat(), rows[-1].id)
+    return rows, next_cursor
+
 def get_alert_by_id(db: Session, alert_id: int) -> Optional[models.Alert]:
     return db.query(models.Alert).filter(models.Alert.id == alert_id).first()
 
+def count_alerts(db: Session, active_only: bool = False) -> int:
+    query = db.query(func.count(models.Alert.id))
+    if active_only:
+        query = query.filter(models.Alert.is_active == True)
+    return query.scalar()
+
 def create_alert(db: Session, alert: schemas.AlertCreate) -> models.Alert:
     db_alert = models.Alert(**alert.dict(), is_active=True)
     db.add(db_alert)
@@ -57,4 +256,26 @@ def update_alert(db: Session, alert_id: int, alert_update: schemas.AlertUpdate)
     
     db.commit()
     db.refresh(db_alert)
-    return db_alert 
\ No newline at end of file
+    return db_alert 
+
+def update_alert_fields(db: Session, alert_id: int, update_data: Dict) -> Optional[models.Alert]:
+    """
+    Apply a partial update of title/message/severity/source/is_active;
+    resolving an alert stamps resolved_at. Caller commits.
+    """
+    db_alert = get_alert_by_id(db, alert_id)
+    
+    if not db_alert:
+        return None
+    
+    for key in ("title", "message", "severity", "source", "is_active"):
+        if key in update_data:
+            setattr(db_alert, key, update_data[key])
+    
+    if db_alert.is_active:
+        db_alert.resolved_at = None
+    elif not db_alert.resolved_at:
+        db_alert.resolved_at = datetime.now()
+    
+    db.flush()
+    return db_alert
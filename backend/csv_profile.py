@@ -0,0 +1,269 @@
+"""
+Single-pass column profiles for CSV files.
+
+The file is parsed PROFILE_CHUNK_ROWS rows at a time and every column keeps
+mergeable accumulators, so memory depends on the number of columns rather
+than the file size, and each value is looked at once:
+
+- non-null and null counts;
+- mean and variance (per-chunk moments combined with Chan's parallel form
+  of Welford's update);
+- min and max;
+- a HyperLogLog for the number of distinct values (about 1% error);
+- a quantile sketch for the median (1% relative error; an even count
+  averages the two middle values, as pandas does).
+
+Profiles of separate parts of a file merge into the profile of the whole.
+
+sample_column_stats estimates the same statistics from a uniform sample of
+rows, with confidence intervals for the mean and null percentage and bounds
+for the distinct count.
+"""
+import math
+from statistics import NormalDist
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from sketches import HyperLogLog, QuantileSketch
+
+PROFILE_CHUNK_ROWS = 100_000
+SAMPLE_CONFIDENCE = 0.95
+
+
+def _merge_dtype(a: str, b: str) -> str:
+    """The dtype pandas would give a column whose chunks inferred a and b."""
+    if a == b:
+        return a
+    numeric = ("int", "uint", "float")
+    if a.startswith(numeric) and b.startswith(numeric):
+        return str(np.result_type(a, b))
+    return "object"
+
+
+class ColumnProfile:
+    """Mergeable statistics of one column."""
+
+    __slots__ = ("dtype", "numeric", "count", "nulls", "mean", "m2", "min", "max", "distinct", "sketch")
+
+    def __init__(self):
+        self.dtype: Optional[str] = None
+        # Every chunk so far parsed as a numeric dtype
+        self.numeric = False
+        self.count = 0
+        self.nulls = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.distinct = HyperLogLog()
+        self.sketch = QuantileSketch()
+
+    def _add_moments(self, count: int, mean: float, m2: float):
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * self.count * count / total
+
+    def update(self, column: pd.Series):
+        """Fold one chunk of the column in."""
+        dtype = str(column.dtype)
+        numeric = pd.api.types.is_numeric_dtype(column.dtype)
+        if self.dtype is None:
+            self.dtype, self.numeric = dtype, numeric
+        else:
+            self.dtype = _merge_dtype(self.dtype, dtype)
+            self.numeric = self.numeric and numeric
+        if numeric:
+            values = column.to_numpy(dtype=np.float64, na_value=np.nan)
+            values = values[~np.isnan(values)]
+            if len(values):
+                mean = values.mean()
+                self._add_moments(len(values), float(mean), float(np.square(values - mean).sum()))
+                self.min = min(self.min, float(values.min()))
+                self.max = max(self.max, float(values.max()))
+                self.sketch.add_array(values)
+            hashes = pd.util.hash_array(values)
+            present = len(values)
+        else:
+            # One hash-table pass gives the nulls (code -1) and the values
+            # worth hashing for the distinct count
+            codes, uniques = pd.factorize(column)
+            present = len(codes) - int(np.count_nonzero(codes < 0))
+            hashes = pd.util.hash_array(np.asarray(uniques, dtype=object))
+        self.nulls += len(column) - present
+        self.count += present
+        self.distinct.add_hashes(hashes)
+
+    def merge(self, other: "ColumnProfile"):
+        if other.dtype is None:
+            return
+        if self.dtype is None:
+            self.dtype, self.numeric = other.dtype, other.numeric
+        else:
+            self.dtype = _merge_dtype(self.dtype, other.dtype)
+            self.numeric = self.numeric and other.numeric
+        if other.count:
+            self._add_moments(other.count, other.mean, other.m2)
+        self.count += other.count
+        self.nulls += other.nulls
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.distinct.merge(other.distinct)
+        self.sketch.merge(other.sketch)
+
+    def stats(self) -> Dict:
+        rows = self.count + self.nulls
+        stats = {
+            "dtype": self.dtype,
+            "count": self.count,
+            "null_count": self.nulls,
+            "null_percentage": self.nulls / rows * 100 if rows else 0.0,
+            "unique_values": min(int(round(self.distinct.estimate())), self.count),
+        }
+        if self.numeric:
+            has_values = self.count > 0
+            stats.update({
+                "min": self.min if has_values else None,
+                "max": self.max if has_values else None,
+                "mean": self.mean if has_values else None,
+                "median": self.sketch.quantile(0.5),
+                "std": math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else None
+            })
+        return stats
+
+
+class CSVProfile:
+    """Column profiles plus row and memory totals for a whole file."""
+
+    def __init__(self):
+        self.columns: Dict[str, ColumnProfile] = {}
+        self.rows = 0
+        # Size of a parsed chunk, the most the profiler holds at once; chunks
+        # have the same number of rows, so only the first is measured (deep
+        # measurement walks every string)
+        self.chunk_bytes = 0
+
+    def update(self, chunk: pd.DataFrame):
+        if not self.rows:
+            self.chunk_bytes = int(chunk.memory_usage(deep=True).sum())
+        self.rows += len(chunk)
+        for name in chunk.columns:
+            profile = self.columns.get(name)
+            if profile is None:
+                profile = self.columns[name] = ColumnProfile()
+            profile.update(chunk[name])
+
+    def merge(self, other: "CSVProfile"):
+        self.rows += other.rows
+        self.chunk_bytes = max(self.chunk_bytes, other.chunk_bytes)
+        for name, profile in other.columns.items():
+            if name in self.columns:
+                self.columns[name].merge(profile)
+            else:
+                self.columns[name] = profile
+
+    def column_stats(self) -> Dict[str, Dict]:
+        return {name: profile.stats() for name, profile in self.columns.items()}
+
+
+def profile_chunks(chunks: Iterable[pd.DataFrame]) -> CSVProfile:
+    profile = CSVProfile()
+    for chunk in chunks:
+        profile.update(chunk)
+    return profile
+
+
+def profile_csv(fileobj, delimiter: str = ",", chunk_rows: int = PROFILE_CHUNK_ROWS) -> CSVProfile:
+    """Profile a binary CSV file object, parsing chunk_rows rows at a time."""
+    return profile_chunks(pd.read_csv(fileobj, delimiter=delimiter, chunksize=chunk_rows))
+
+
+def _fpc(population: float, sample: int) -> float:
+    """Finite population correction for the standard error."""
+    if population <= 1 or sample >= population:
+        return 0.0
+    return math.sqrt((population - sample) / (population - 1))
+
+
+def _proportion_interval(hits: int, n: int, z: float) -> List[float]:
+    """Wilson score interval for a proportion, which stays sensible near 0 and 1."""
+    p = hits / n
+    z2 = z * z
+    centre = (p + z2 / (2 * n)) / (1 + z2 / n)
+    half = z / (1 + z2 / n) * math.sqrt(p * (1 - p) / n + z2 / (4 * n * n))
+    return [max(centre - half, 0.0), min(centre + half, 1.0)]
+
+
+def _distinct_estimate(values: pd.Series, population: float):
+    """
+    Guaranteed-error estimator (Charikar et al.) of the distinct count of a
+    population from a sample of it. Values seen once in the sample may stand
+    for up to population/sample distinct values each; the estimate is the
+    geometric mean of that upper bound and the distinct count of the sample.
+    """
+    frequencies = values.value_counts(sort=False)
+    seen = len(frequencies)
+    singletons = int((frequencies == 1).sum())
+    ratio = max(population / len(values), 1.0) if len(values) else 1.0
+    high = min(seen - singletons + singletons * ratio, max(population, seen))
+    return seen - singletons + singletons * math.sqrt(ratio), [float(seen), high]
+
+
+def sample_column_stats(
+    sample: pd.DataFrame,
+    total_rows: int,
+    confidence: float = SAMPLE_CONFIDENCE
+) -> Dict[str, Dict]:
+    """
+    Column statistics of a file of total_rows rows estimated from a uniform
+    sample of them. Adds intervals at the given confidence for null_percentage
+    and mean, and estimator bounds for unique_values; min, max, median and std
+    are those of the sample. A sample of every row gives exact values.
+    """
+    n = len(sample)
+    population = max(total_rows, n)
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    stats = {}
+    for name in sample.columns:
+        column = sample[name]
+        values = column.dropna()
+        if n:
+            nulls = n - len(values)
+            interval = _proportion_interval(nulls, n, z * _fpc(population, n))
+            null_fraction = nulls / n
+        else:
+            interval, null_fraction = [0.0, 0.0], 0.0
+        count = int(round(population * (1 - null_fraction)))
+        if len(values):
+            unique, unique_interval = _distinct_estimate(values, count)
+        else:
+            unique, unique_interval = 0.0, [0.0, 0.0]
+        column_stats = {
+            "dtype": str(column.dtype),
+            "count": count,
+            "null_count": population - count,
+            "null_percentage": null_fraction * 100,
+            "null_percentage_ci": [bound * 100 for bound in interval],
+            "unique_values": min(int(round(unique)), count),
+            "unique_values_ci": [int(round(bound)) for bound in unique_interval],
+        }
+        if pd.api.types.is_numeric_dtype(column.dtype):
+            has_values = len(values) > 0
+            mean = float(values.mean()) if has_values else None
+            std = float(values.std()) if len(values) > 1 else None
+            mean_interval = None
+            if std is not None:
+                half = z * std / math.sqrt(len(values)) * _fpc(count, len(values))
+                mean_interval = [mean - half, mean + half]
+            column_stats.update({
+                "min": float(values.min()) if has_values else None,
+                "max": float(values.max()) if has_values else None,
+                "mean": mean,
+                "mean_ci": mean_interval,
+                "median": float(values.median()) if has_values else None,
+                "std": std
+            })
+        stats[name] = column_stats
+    return stats
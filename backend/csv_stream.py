@@ -0,0 +1,180 @@
+"""
+Bounded-memory passes over uploaded CSV files.
+
+Uploads are read in CSV_CHUNK_SIZE pieces. RecordCounter finds record ends
+in each chunk with numpy (a newline outside quoted fields ends a record;
+blank lines are skipped, as pandas does), so a file of any size is counted
+without holding more than one chunk, and read_preview keeps only the bytes
+of the leading records it parses.
+
+read_sample keeps a uniform random sample of records instead (reservoir
+sampling over the record ends), so only the sampled bytes are parsed.
+"""
+import io
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+CSV_CHUNK_SIZE = 1 << 20
+PREVIEW_ROWS = 100
+SAMPLE_ROWS = 10_000
+
+_QUOTE, _LF, _CR = ord('"'), ord("\n"), ord("\r")
+
+
+class RecordCounter:
+    """Counts non-blank CSV records in a byte stream fed chunk by chunk."""
+
+    def __init__(self):
+        self.records = 0
+        self.bytes = 0
+        # Parser state carried across chunk boundaries
+        self._in_quotes = False
+        self._pending = 0
+        self._last_byte = _LF
+
+    def feed(self, chunk: bytes) -> np.ndarray:
+        """Count the records that end in chunk; returns their end offsets."""
+        if not chunk:
+            return np.empty(0, dtype=np.intp)
+        self.bytes += len(chunk)
+        buf = np.frombuffer(chunk, dtype=np.uint8)
+        ends = np.flatnonzero(buf == _LF)
+        if self._in_quotes or chunk.find(b'"') >= 0:
+            # Quotes before each newline; doubled "" escapes toggle twice,
+            # so parity alone says whether it sits inside a quoted field
+            quotes = np.flatnonzero(buf == _QUOTE)
+            ends = ends[(np.searchsorted(quotes, ends) + self._in_quotes) & 1 == 0]
+            self._in_quotes = bool((len(quotes) + self._in_quotes) & 1)
+
+        if len(ends):
+            # A record is blank when nothing but \r precedes its newline
+            starts = np.empty(len(ends), dtype=np.intp)
+            starts[0] = -self._pending
+            starts[1:] = ends[:-1] + 1
+            lengths = ends - starts
+            before = buf[ends - 1]
+            if ends[0] == 0:
+                before[0] = self._last_byte
+            filled = (lengths > 1) | ((lengths == 1) & (before != _CR))
+            self._pending = len(buf) - ends[-1] - 1
+            ends = ends[filled]
+        else:
+            self._pending += len(buf)
+        self._last_byte = chunk[-1]
+        self.records += len(ends)
+        return ends
+
+    def finish(self) -> int:
+        """Count a last record without a trailing newline; returns the total."""
+        if self._pending > 1 or (self._pending == 1 and self._last_byte != _CR):
+            self.records += 1
+        self._pending = 0
+        return self.records
+
+
+def read_preview(
+    chunks: Iterable[bytes],
+    rows: int = PREVIEW_ROWS,
+    skip_rows: int = 0,
+    delimiter: str = ","
+) -> Tuple[pd.DataFrame, int]:
+    """
+    Parse the header and first rows of a CSV streamed as chunks, and count
+    its data rows. Returns (preview DataFrame, total data rows).
+    """
+    counter = RecordCounter()
+    # skip_rows lines, the header, then the preview rows
+    wanted = skip_rows + 1 + rows
+    head: List[bytes] = []
+    for chunk in chunks:
+        before = counter.records
+        ends = counter.feed(chunk)
+        if before < wanted:
+            needed = wanted - before
+            head.append(chunk[:ends[needed - 1] + 1] if len(ends) >= needed else chunk)
+    counter.finish()
+    preview = pd.read_csv(io.BytesIO(b"".join(head)), skiprows=skip_rows, delimiter=delimiter, nrows=rows)
+    return preview, max(counter.records - skip_rows - 1, 0)
+
+
+def read_sample(
+    chunks: Iterable[bytes],
+    rows: int = SAMPLE_ROWS,
+    delimiter: str = ",",
+    seed: Optional[int] = None
+) -> Tuple[pd.DataFrame, int]:
+    """
+    Parse the header and a uniform random sample of up to rows data rows of
+    a CSV streamed as chunks, and count its data rows. Returns (sample
+    DataFrame, total data rows).
+    """
+    rng = np.random.default_rng(seed)
+    counter = RecordCounter()
+    header: Optional[bytes] = None
+    reservoir: List[bytes] = []
+    # Bytes of the record still open at the end of the last chunk
+    tail: List[bytes] = []
+    seen = 0
+
+    def slots(count: int) -> np.ndarray:
+        """Algorithm R: reservoir slot for each of the next count records, or -1."""
+        taken = np.full(count, -1, dtype=np.int64)
+        free = min(max(rows - seen, 0), count)
+        taken[:free] = np.arange(seen, seen + free)
+        if free < count:
+            draws = rng.integers(0, np.arange(seen + free, seen + count) + 1)
+            taken[free:] = np.where(draws < rows, draws, -1)
+        return taken
+
+    def keep(slot: int, record: bytes):
+        if slot == len(reservoir):
+            reservoir.append(record)
+        else:
+            reservoir[slot] = record
+
+    for chunk in chunks:
+        ends = counter.feed(chunk)
+        if not len(ends):
+            tail.append(chunk)
+            continue
+        last, start = ends[-1], -1
+        if header is None:
+            header = b"".join(tail) + chunk[:ends[0] + 1]
+            start, ends = ends[0] + 1, ends[1:]
+        if len(ends):
+            starts = np.empty(len(ends), dtype=np.intp)
+            starts[0] = start
+            starts[1:] = ends[:-1] + 1
+            taken = slots(len(ends))
+            for i in np.flatnonzero(taken >= 0):
+                # A record starting before the chunk began in the tail
+                prefix = b"".join(tail) if starts[i] < 0 else b""
+                keep(int(taken[i]), prefix + chunk[max(starts[i], 0):ends[i] + 1])
+            seen += len(ends)
+        tail = [chunk[last + 1:]]
+
+    before = counter.records
+    if counter.finish() > before:
+        # Last record without a trailing newline
+        record = b"".join(tail) + b"\n"
+        if header is None:
+            header = record
+        else:
+            slot = int(slots(1)[0])
+            if slot >= 0:
+                keep(slot, record)
+            seen += 1
+
+    sample = pd.read_csv(io.BytesIO((header or b"") + b"".join(reservoir)), delimiter=delimiter)
+    return sample, seen
+
+
+def iter_chunks(fileobj, chunk_size: int = CSV_CHUNK_SIZE) -> Iterable[bytes]:
+    """Read a binary file object chunk by chunk."""
+    while True:
+        chunk = fileobj.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
@@ -0,0 +1,197 @@
+"""
+Process pool for CSV parsing and profiling.
+
+pandas holds the GIL for most of a parse, so running it on the event loop's
+threadpool still stalls every other request on the worker. Uploads are
+instead handed to CSV_WORKERS processes:
+
+- upload() spools the upload to a named temporary file (in CSV_TMP_DIR),
+  hashing it on the way, and jobs open it by path, so the file contents are
+  never pickled;
+- only the small results (column statistics, a dataset manifest) come back;
+- at most CSV_WORKERS uploads are processed and CSV_QUEUE_DEPTH more wait;
+  beyond that upload() raises WorkerPoolFull, which the API answers with 503;
+- run_detached() keeps its own link to the spooled file, so a job (such as
+  filling the dataset cache) can go on after the request has answered.
+"""
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
+import hashlib
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+from typing import Any, AsyncIterator, Callable, Dict, NamedTuple, Optional, Tuple
+
+from dotenv import load_dotenv
+from fastapi.concurrency import run_in_threadpool
+
+from csv_profile import SAMPLE_CONFIDENCE, sample_column_stats
+from csv_stream import PREVIEW_ROWS, SAMPLE_ROWS, iter_chunks, read_preview, read_sample
+
+load_dotenv()
+
+# One core is left to the event loop by default
+CSV_WORKERS = int(os.getenv("CSV_WORKERS", max((os.cpu_count() or 2) - 1, 1)))
+# Jobs allowed to wait for a worker before uploads are refused
+CSV_QUEUE_DEPTH = int(os.getenv("CSV_QUEUE_DEPTH", CSV_WORKERS * 2))
+CSV_TMP_DIR = os.getenv("CSV_TMP_DIR") or None
+# Seconds clients are told to wait when the pool is full
+CSV_RETRY_AFTER = int(os.getenv("CSV_RETRY_AFTER", 1))
+
+
+class WorkerPoolFull(Exception):
+    """Raised when every worker is busy and the wait queue is full."""
+
+
+class SpooledUpload(NamedTuple):
+    path: str
+    size: int
+    sha256: str
+
+
+# Jobs, run in the worker processes on a file path (see also
+# dataset_cache.ingest_csv)
+
+def preview_file(path: str, rows: int = PREVIEW_ROWS, skip_rows: int = 0, delimiter: str = ","):
+    """Returns (preview DataFrame, total data rows)."""
+    with open(path, "rb") as f:
+        return read_preview(iter_chunks(f), rows, skip_rows, delimiter)
+
+
+def sample_file(
+    path: str,
+    rows: int = SAMPLE_ROWS,
+    delimiter: str = ",",
+    confidence: float = SAMPLE_CONFIDENCE
+) -> Tuple[Dict, int, int, int]:
+    """Returns (column stats, total rows, total columns, sample bytes)."""
+    with open(path, "rb") as f:
+        sample, total = read_sample(iter_chunks(f), rows, delimiter)
+    stats = sample_column_stats(sample, total, confidence)
+    return stats, total, len(sample.columns), int(sample.memory_usage(deep=True).sum())
+
+
+def _spool(fileobj) -> SpooledUpload:
+    """Copy an upload to a named temporary file, hashing its contents."""
+    fileobj.seek(0)
+    digest = hashlib.sha256()
+    with tempfile.NamedTemporaryFile(dir=CSV_TMP_DIR, suffix=".csv", delete=False) as tmp:
+        try:
+            for chunk in iter_chunks(fileobj):
+                digest.update(chunk)
+                tmp.write(chunk)
+        except BaseException:
+            os.unlink(tmp.name)
+            raise
+        return SpooledUpload(tmp.name, tmp.tell(), digest.hexdigest())
+
+
+class CSVWorkerPool:
+    """A bounded ProcessPoolExecutor for jobs that take an uploaded file."""
+
+    def __init__(self, workers: int = CSV_WORKERS, queue_depth: int = CSV_QUEUE_DEPTH):
+        self.workers = max(workers, 1)
+        self.max_pending = self.workers + max(queue_depth, 0)
+        self.pending = 0
+        self.rejected = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # Spawned, not forked: the API process runs threads (group commit,
+        # the threadpool) whose locks a fork could copy mid-use
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    def _claim(self):
+        """Take a place in the queue, or raise WorkerPoolFull."""
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise WorkerPoolFull(
+                f"All {self.workers} CSV workers are busy and {self.max_pending - self.workers} uploads are queued"
+            )
+        self.pending += 1
+
+    @asynccontextmanager
+    async def upload(self, fileobj) -> AsyncIterator[SpooledUpload]:
+        """
+        Take a place in the queue and spool fileobj to a temporary file for
+        run(); raises WorkerPoolFull when the queue is full. The file is
+        removed on exit.
+        """
+        self._claim()
+        try:
+            spooled = await run_in_threadpool(_spool, fileobj)
+            try:
+                yield spooled
+            finally:
+                os.unlink(spooled.path)
+        finally:
+            self.pending -= 1
+
+    async def run(self, job: Callable, *args) -> Any:
+        """Run job(*args) in a worker process."""
+        executor = self._get_executor()
+        try:
+            return await asyncio.wrap_future(executor.submit(job, *args))
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); start a new pool for
+            # the next job
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+            executor.shutdown(wait=False)
+            raise
+
+    def run_detached(self, upload: SpooledUpload, job: Callable, *args) -> "asyncio.Future":
+        """
+        Run job(path, *args) in a worker on a second link to a spooled
+        upload, so it may outlive upload(). The job takes its own place in
+        the queue (raising WorkerPoolFull when there is none) until it ends,
+        and the link is removed then.
+        """
+        self._claim()
+        path = upload.path + ".job"
+        try:
+            os.link(upload.path, path)
+        except OSError:
+            try:
+                # No hard links on this filesystem
+                shutil.copyfile(upload.path, path)
+            except BaseException:
+                self.pending -= 1
+                raise
+
+        async def detached():
+            try:
+                return await self.run(job, path, *args)
+            finally:
+                os.unlink(path)
+                self.pending -= 1
+
+        return asyncio.ensure_future(detached())
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
+
+    def stats(self) -> Dict:
+        return {
+            "workers": self.workers,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "rejected": self.rejected,
+        }
+
+
+pool = CSVWorkerPool()
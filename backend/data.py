@@ -1,77 +1,729 @@
+from bisect import bisect_left, bisect_right, insort
+from collections import deque
 from datetime import datetime
-from typing import Dict, List, Optional
+import hashlib
+import heapq
+from itertools import islice
+import json
+import os
+import resource
+import threading
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
 import uuid
 
+from dotenv import load_dotenv
+import numpy as np
+
+from alert_rules import RuleEngine
+from alert_search import AlertIndex
+from anomaly import AnomalyDetectors, score_matrix
+from events import broker
+from pagination import decode_cursor, encode_cursor
+from rollups import RESOLUTIONS, RollupStore
+from sketches import QuantileSketch, bin_key
+from timeseries import MetricStore, RetentionPolicy, Series, now_us, parse_sample, to_epoch_us, to_iso
+
+load_dotenv()
+
+# Retention settings (0 disables a limit)
+METRICS_MAX_AGE_SECONDS = float(os.getenv("METRICS_MAX_AGE_SECONDS", 7 * 24 * 3600))
+METRICS_MAX_SAMPLES_PER_SERIES = int(os.getenv("METRICS_MAX_SAMPLES_PER_SERIES", 1_000_000))
+# Distinct (name, labels) series the store accepts before rejecting new ones
+METRICS_MAX_SERIES = int(os.getenv("METRICS_MAX_SERIES", 10_000))
+# Per-name overrides, e.g. {"cpu_usage": {"max_age_seconds": 3600, "max_samples": 10000}}
+METRICS_RETENTION_OVERRIDES = json.loads(os.getenv("METRICS_RETENTION_OVERRIDES", "{}"))
+ALERTS_RESOLVED_TTL_SECONDS = float(os.getenv("ALERTS_RESOLVED_TTL_SECONDS", 7 * 24 * 3600))
+ALERTS_COMPACT_INTERVAL_SECONDS = float(os.getenv("ALERTS_COMPACT_INTERVAL_SECONDS", 60))
+# Newest samples kept for the dashboard, across every series
+RECENT_METRICS_KEPT = 100
+
 # In-memory data storage
-metrics = []
+metrics = MetricStore(
+    RetentionPolicy(METRICS_MAX_AGE_SECONDS, METRICS_MAX_SAMPLES_PER_SERIES),
+    max_series=METRICS_MAX_SERIES
+)
+metric_rollups = RollupStore()
+anomaly_detectors = AnomalyDetectors()
 alerts = []
 
+# (series, position) of the last RECENT_METRICS_KEPT samples ingested
+recent_metrics: Deque[Tuple[Series, int]] = deque(maxlen=RECENT_METRICS_KEPT)
+
+# ID -> alert dict, kept in sync by create_alert/update_alert
+alerts_by_id: Dict[str, Dict] = {}
+
+# Active alerts only, by ID, and their (created_at, id) keys in sorted order,
+# so active pages and their cursors seek without scanning every alert
+active_alerts: Dict[str, Dict] = {}
+active_keys: List[Tuple[str, str]] = []
+
+# Full-text index over alert titles and messages
+alert_index = AlertIndex()
+
+# Fingerprint -> ID of the open alert it deduplicates into
+open_fingerprints: Dict[str, str] = {}
+
+# Fingerprint -> running summary of every alert that shared it
+alert_groups: Dict[str, Dict] = {}
+
+# Guards every alert structure above. Rules fire alerts while the metric
+# store's lock is held, so take metrics.lock first when both are needed.
+alerts_lock = threading.RLock()
+
+# Resolved alerts in resolution order, for TTL compaction
+_resolved_queue: Deque[Tuple[int, str]] = deque()
+_resolved_since: Dict[str, int] = {}
+_last_compaction_us = 0
+alerts_compacted = 0
+
 # Helper function to generate IDs
 def generate_id():
     return str(uuid.uuid4())
 
 # Metrics operations
 def get_metrics(skip: int = 0, limit: int = 100) -> List[Dict]:
-    return metrics[skip:skip + limit]
+    return metrics.page(skip, limit)
+
+def get_recent_metrics(limit: int = 5) -> List[Dict]:
+    """
+    The last samples ingested (at most RECENT_METRICS_KEPT), newest first,
+    without merging every series.
+    """
+    with metrics.lock:
+        recent = []
+        for series, pos in reversed(recent_metrics):
+            if len(recent) == limit:
+                break
+            # Skip samples retention has evicted since
+            if series.position(pos) is not None:
+                recent.append(metrics.record(series, pos))
+        return recent
+
+def _epoch_window(start: Optional[datetime], end: Optional[datetime]) -> Tuple[Optional[int], Optional[int]]:
+    return (
+        to_epoch_us(start) if start is not None else None,
+        to_epoch_us(end) if end is not None else None
+    )
+
+def _selected_series(name: Optional[str], labels: Optional[Dict[str, str]] = None) -> List[Series]:
+    return metrics.select(name, labels)
+
+def get_series(name: Optional[str] = None, labels: Optional[Dict[str, str]] = None) -> List[Dict]:
+    """Series matching a name and/or labels, with their live sample counts."""
+    with metrics.lock:
+        return [
+            {"id": series.sid, "name": series.name, "labels": series.labels.copy(), "samples": len(series)}
+            for series in _selected_series(name, labels)
+        ]
+
+def get_metrics_in_range(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    name: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 100
+) -> List[Dict]:
+    """Metrics with start <= timestamp < end, optionally for a single name."""
+    start_us, end_us = _epoch_window(start, end)
+    return metrics.page(skip, limit, start=start_us, end=end_us, name=name)
+
+def get_metrics_page(
+    cursor: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 100,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    name: Optional[str] = None,
+    labels: Optional[Dict[str, str]] = None
+) -> Tuple[List[Dict], Optional[str]]:
+    """
+    Keyset-paginated metrics ordered by (timestamp, id).
+
+    Returns the page and the cursor for the next one (None on the last page).
+    Raises ValueError for a malformed cursor.
+    """
+    after = None
+    if cursor is not None:
+        ts, metric_id = decode_cursor(cursor)
+        parsed = metrics.parse_id(metric_id) if isinstance(metric_id, str) else None
+        if not isinstance(ts, int) or parsed is None:
+            raise ValueError("Invalid cursor")
+        after = (ts, parsed[0], parsed[1])
+
+    start_us, end_us = _epoch_window(start, end)
+    selected = _selected_series(name, labels) if name is not None or labels else None
+    next_cursor = None
+    with metrics.lock:
+        positions = metrics.page_positions(skip, limit, start=start_us, end=end_us, series=selected, after=after)
+        page = [metrics.record(series, pos) for series, pos in positions]
+        if len(page) == limit:
+            series, pos = positions[-1]
+            next_cursor = encode_cursor(series.timestamp(pos), page[-1]["id"])
+    return page, next_cursor
+
+def choose_resolution(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    name: Optional[str] = None,
+    max_points: int = 300,
+    labels: Optional[Dict[str, str]] = None
+) -> str:
+    """
+    Pick the finest resolution that keeps every series at or under max_points.
+    """
+    start_us, end_us = _epoch_window(start, end)
+    with metrics.lock:
+        selected = _selected_series(name, labels)
+        if all(len(series.window(start_us, end_us)) <= max_points for series in selected):
+            return "raw"
+        for resolution in RESOLUTIONS:
+            if all(
+                len(metric_rollups.get(series.sid, resolution).window(start_us, end_us)) <= max_points
+                for series in selected
+            ):
+                return resolution
+    return list(RESOLUTIONS)[-1]
+
+def get_metric_rollups(
+    resolution: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    name: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 100,
+    labels: Optional[Dict[str, str]] = None
+) -> List[Dict]:
+    """
+    Pre-aggregated buckets (count, min, max, sum, avg, last) for a time range.
+    """
+    start_us, end_us = _epoch_window(start, end)
+
+    def walk(series: Series):
+        rollup = metric_rollups.get(series.sid, resolution)
+        for pos in rollup.window(start_us, end_us):
+            yield rollup.starts[pos], series.sid, pos
+
+    buckets = []
+    with metrics.lock:
+        selected = _selected_series(name, labels)
+        for bucket_start, sid, pos in islice(heapq.merge(*(walk(s) for s in selected)), skip, skip + limit):
+            series = metrics.all_series()[sid]
+            bucket = {
+                "name": series.name,
+                "unit": metrics.unit(series, series.stop - 1),
+                "labels": series.labels.copy(),
+                "resolution": resolution,
+                "timestamp": to_iso(bucket_start),
+            }
+            bucket.update(metric_rollups.get(sid, resolution).bucket(pos))
+            buckets.append(bucket)
+    return buckets
 
 def get_metric_by_id(metric_id: str) -> Optional[Dict]:
-    for metric in metrics:
-        if metric["id"] == metric_id:
-            return metric
-    return None
+    with metrics.lock:
+        located = metrics.locate(metric_id)
+        if located is None:
+            return None
+        return metrics.record(*located)
 
-def get_metrics_by_name(name: str) -> List[Dict]:
-    return [metric for metric in metrics if metric["name"] == name]
+def get_metrics_by_name(name: str, labels: Optional[Dict[str, str]] = None) -> List[Dict]:
+    with metrics.lock:
+        selected = _selected_series(name, labels)
+        if len(selected) == 1:
+            return metrics.records(selected[0], selected[0].window())
+        by_sid = metrics.all_series()
+        return [metrics.record(by_sid[sid], pos) for _, sid, pos in metrics.iter_positions(series=selected)]
 
-def create_metric(metric_data: Dict) -> Dict:
-    metric = {
-        "id": generate_id(),
-        "name": metric_data["name"],
-        "value": metric_data["value"],
-        "unit": metric_data["unit"],
-        "timestamp": datetime.now().isoformat()
+def set_retention(name: str, max_age_seconds: Optional[float] = None, max_samples: Optional[int] = None):
+    """Override the retention policy for one metric name."""
+    with metrics.lock:
+        metrics.retention[name] = RetentionPolicy(max_age_seconds, max_samples)
+
+def get_metric_percentiles(
+    name: str,
+    quantiles: List[float],
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    resolution: Optional[str] = None,
+    labels: Optional[Dict[str, str]] = None
+) -> Optional[Dict]:
+    """
+    Quantiles for one metric from its sketches, without touching raw samples.
+
+    Without a time range the answer covers everything the metric has ever
+    ingested (including evicted samples). With a range, rollup bucket sketches
+    overlapping it are merged; small windows are sketched from raw samples.
+    Sketches of every series matching the labels are merged.
+    """
+    with metrics.lock:
+        selected = _selected_series(name, labels)
+        if not selected:
+            return None
+
+        sketch = QuantileSketch()
+        if start is None and end is None and resolution is None:
+            for series in selected:
+                total = metric_rollups.total_sketch(series.sid)
+                if total is not None:
+                    sketch.merge(total)
+            resolution = "all"
+        else:
+            if resolution is None or resolution == "auto":
+                resolution = choose_resolution(start=start, end=end, name=name, labels=labels)
+            start_us, end_us = _epoch_window(start, end)
+            for series in selected:
+                if resolution == "raw":
+                    for _, _, value, _ in series.scan(series.window(start_us, end_us)):
+                        sketch.add(value)
+                else:
+                    rollup = metric_rollups.get(series.sid, resolution)
+                    for pos in rollup.window(start_us, end_us):
+                        sketch.merge(rollup.sketches[pos])
+        unit = metrics.unit(selected[-1], selected[-1].stop - 1)
+
+    return {
+        "name": name,
+        "series": len(selected),
+        "unit": unit,
+        "resolution": resolution,
+        "count": sketch.count,
+        "percentiles": {f"p{q * 100:g}": sketch.quantile(q) for q in quantiles},
+    }
+
+def get_anomaly_heatmap(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    resolution: str = "1h",
+    names: Optional[List[str]] = None,
+    max_buckets: Optional[int] = None,
+    labels: Optional[Dict[str, str]] = None
+) -> Dict:
+    """
+    Series x time-bucket matrix of the highest anomaly score per bucket.
+
+    Defaults to the last 24 hours; cells without samples are None. Raises
+    ValueError for an empty range or one wider than max_buckets.
+    """
+    step = RESOLUTIONS[resolution]
+    end_us = to_epoch_us(end) if end is not None else now_us()
+    start_us = to_epoch_us(start) if start is not None else end_us - 24 * 3600 * 1_000_000
+    start_us -= start_us % step
+    columns = -(-(end_us - start_us) // step)
+    if columns <= 0:
+        raise ValueError("end must be after start")
+    if max_buckets is not None and columns > max_buckets:
+        raise ValueError(f"Range spans more than {max_buckets} buckets; use a coarser resolution")
+
+    with metrics.lock:
+        if names is None:
+            # A copy, as the store's own list keeps growing
+            selected = list(_selected_series(None, labels))
+        else:
+            # Rows follow the requested name order
+            selected = [series for name in dict.fromkeys(names) for series in _selected_series(name, labels)]
+        rows = []
+        for series in selected:
+            rollup = metric_rollups.get(series.sid, resolution)
+            window = rollup.window(start_us, end_us) if rollup is not None else range(0)
+            # Array slices are copies, so NumPy never holds a view on a live column
+            rows.append((rollup.starts[window.start:window.stop], rollup.scores[window.start:window.stop])
+                        if len(window) else None)
+    matrix = score_matrix(rows, start_us, step, columns)
+
+    return {
+        "metrics": [series.name for series in selected],
+        "labels": [series.labels.copy() for series in selected],
+        "buckets": [to_iso(start_us + i * step) for i in range(columns)],
+        "resolution": resolution,
+        "scores": np.where(np.isnan(matrix), None, matrix.round(3)).tolist(),
     }
-    metrics.append(metric)
+
+def _on_metric(series: Series, pos: int, key: Optional[int], score: float):
+    """Update everything derived from the raw samples after an append."""
+    ts, value, _ = series.sample(pos)
+    anomaly_detectors.learn(series.sid, ts, value)
+    metric_rollups.add(series.sid, ts, value, score, key)
+    rule_engine.evaluate(series.sid, series.name, ts, value, metrics.unit(series, pos), series.labels)
+    recent_metrics.append((series, pos))
+
+def _append(sample: Dict) -> Tuple[Series, int]:
+    """
+    Validate and append a sample, then update everything derived from it.
+    The steps that can reject a sample (binning it for the sketches and
+    scoring it) run before any derived state changes; if one fails the
+    sample is removed again and ValueError raised, leaving the rollups,
+    sketches, anomaly baselines and rules as they were. Caller holds
+    metrics.lock.
+    """
+    series, pos = metrics.append(*parse_sample(sample))
+    ts, value, _ = series.sample(pos)
+    try:
+        key = bin_key(value)
+        score = anomaly_detectors.score(series.sid, ts, value)
+    except (ArithmeticError, ValueError) as e:
+        metrics.discard(series, pos)
+        raise ValueError(f"Sample rejected: {e}") from e
+    _on_metric(series, pos, key, score)
+    return series, pos
+
+def create_metric(metric_data: Dict) -> Dict:
+    """Append one sample. Raises ValueError for an invalid sample or a new series over the limit."""
+    with metrics.lock:
+        series, pos = _append(metric_data)
+        metric = metrics.record(series, pos)
+    broker.publish("metrics", "metric.created", metric)
     return metric
 
+def create_metrics_batch(samples: Iterable[Dict], first_index: int = 0, max_errors: int = 10) -> Dict:
+    """
+    Validate and append many samples in one pass.
+
+    Returns counts plus the first few errors instead of echoing every record.
+    """
+    accepted = rejected = 0
+    errors = []
+    for index, sample in enumerate(samples, first_index):
+        with metrics.lock:
+            try:
+                series, pos = _append(sample)
+            except (TypeError, ValueError) as e:
+                rejected += 1
+                if len(errors) < max_errors:
+                    errors.append({"index": index, "error": str(e)})
+                continue
+            metric = metrics.record(series, pos) if broker.has_subscribers else None
+        if metric is not None:
+            broker.publish("metrics", "metric.created", metric)
+        accepted += 1
+    return {"accepted": accepted, "rejected": rejected, "errors": errors}
+
 # Alerts operations
 def get_alerts(skip: int = 0, limit: int = 100, active_only: bool = False) -> List[Dict]:
-    if active_only:
-        filtered_alerts = [alert for alert in alerts if alert["is_active"]]
-        return filtered_alerts[skip:skip + limit]
-    return alerts[skip:skip + limit]
+    with alerts_lock:
+        if active_only:
+            return [active_alerts[key[1]] for key in active_keys[skip:skip + limit]]
+        return alerts[skip:skip + limit]
+
+def _alerts_after(created_at: str, alert_id: str) -> int:
+    """Index in `alerts` of the first alert sorting after (created_at, id)."""
+    lo, hi = 0, len(alerts)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if alerts[mid]["created_at"] < created_at:
+            lo = mid + 1
+        else:
+            hi = mid
+    # Alerts created in the same instant keep their list order
+    index = lo
+    while index < len(alerts) and alerts[index]["created_at"] == created_at:
+        index += 1
+        if alerts[index - 1]["id"] == alert_id:
+            return index
+    return index
+
+def get_alerts_page(
+    cursor: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 100,
+    active_only: bool = False
+) -> Tuple[List[Dict], Optional[str]]:
+    """
+    Keyset-paginated alerts ordered by (created_at, id).
+
+    Returns the page and the cursor for the next one (None on the last page).
+    Raises ValueError for a malformed cursor.
+    """
+    with alerts_lock:
+        if cursor is None:
+            page = get_alerts(skip=skip, limit=limit, active_only=active_only)
+        else:
+            created_at, alert_id = decode_cursor(cursor)
+            if not isinstance(created_at, str) or not isinstance(alert_id, str):
+                raise ValueError("Invalid cursor")
+            if active_only:
+                first = bisect_right(active_keys, (created_at, alert_id)) + skip
+                page = [active_alerts[key[1]] for key in active_keys[first:first + limit]]
+            else:
+                first = _alerts_after(created_at, alert_id) + skip
+                page = alerts[first:first + limit]
+    next_cursor = None
+    if len(page) == limit:
+        next_cursor = encode_cursor(page[-1]["created_at"], page[-1]["id"])
+    return page, next_cursor
+
+def _set_active(alert: Dict):
+    """Add the alert to, or remove it from, the active alerts."""
+    key = (alert["created_at"], alert["id"])
+    if alert["is_active"]:
+        if alert["id"] not in active_alerts:
+            active_alerts[alert["id"]] = alert
+            insort(active_keys, key)
+    elif active_alerts.pop(alert["id"], None) is not None:
+        del active_keys[bisect_left(active_keys, key)]
+
+def alert_counts() -> Dict[str, int]:
+    return {"total": len(alerts), "active": len(active_alerts)}
 
 def get_alert_by_id(alert_id: str) -> Optional[Dict]:
-    for alert in alerts:
-        if alert["id"] == alert_id:
-            return alert
-    return None
+    return alerts_by_id.get(alert_id)
+
+def alert_fingerprint(title: str, severity: str, source: Optional[str]) -> str:
+    key = "\x1f".join((title, severity, source or ""))
+    return hashlib.blake2b(key.encode(), digest_size=8).hexdigest()
+
+def _track_open(alert: Dict):
+    """Keep open_fingerprints pointing at the alert while it is active."""
+    fingerprint = alert["fingerprint"]
+    if alert["is_active"]:
+        open_fingerprints.setdefault(fingerprint, alert["id"])
+    elif open_fingerprints.get(fingerprint) == alert["id"]:
+        del open_fingerprints[fingerprint]
+    group = alert_groups.get(fingerprint)
+    if group is not None:
+        group["active_alert_id"] = open_fingerprints.get(fingerprint)
+
+def _group(alert: Dict) -> Dict:
+    """The group of the alert's fingerprint, created empty if needed."""
+    fingerprint = alert["fingerprint"]
+    group = alert_groups.get(fingerprint)
+    if group is None:
+        group = alert_groups[fingerprint] = {
+            "fingerprint": fingerprint,
+            "title": alert["title"],
+            "severity": alert["severity"],
+            "source": alert["source"],
+            "alerts": 0,
+            "firings": 0,
+            "first_seen_at": alert["created_at"],
+            "last_seen_at": alert["last_seen_at"],
+            "active_alert_id": None,
+        }
+    return group
+
+def _regroup(alert: Dict, old_fingerprint: str):
+    """Move an alert whose title, severity or source changed to its new group."""
+    old = alert_groups.get(old_fingerprint)
+    if old is not None:
+        old["alerts"] -= 1
+        old["firings"] -= alert["count"]
+        old["active_alert_id"] = open_fingerprints.get(old_fingerprint)
+        if old["alerts"] <= 0:
+            del alert_groups[old_fingerprint]
+    _join_group(alert)
+
+def _join_group(alert: Dict) -> Dict:
+    """Count an existing alert and its firings into its fingerprint's group."""
+    group = _group(alert)
+    group["alerts"] += 1
+    group["firings"] += alert["count"]
+    group["first_seen_at"] = min(group["first_seen_at"], alert["created_at"])
+    group["last_seen_at"] = max(group["last_seen_at"], alert["last_seen_at"])
+    return group
 
 def create_alert(alert_data: Dict) -> Dict:
-    alert = {
-        "id": generate_id(),
-        "title": alert_data["title"],
-        "message": alert_data["message"],
-        "severity": alert_data["severity"],
-        "is_active": True,
-        "created_at": datetime.now().isoformat(),
-        "resolved_at": None
-    }
-    alerts.append(alert)
-    return alert
+    """
+    Create an alert, or bump count/last_seen_at on the open alert with the
+    same fingerprint (title, severity, source).
+    """
+    with alerts_lock:
+        now = datetime.now().isoformat()
+        fingerprint = alert_fingerprint(alert_data["title"], alert_data["severity"], alert_data.get("source"))
+
+        open_id = open_fingerprints.get(fingerprint)
+        if open_id is not None:
+            alert = alerts_by_id[open_id]
+            alert["count"] += 1
+            alert["last_seen_at"] = now
+            if alert["message"] != alert_data["message"]:
+                alert["message"] = alert_data["message"]
+                alert_index.update(alert)
+            group = _group(alert)
+            group["firings"] += 1
+            group["last_seen_at"] = now
+            broker.publish("alerts", "alert.updated", dict(alert))
+            return alert
+
+        alert = {
+            "id": generate_id(),
+            "title": alert_data["title"],
+            "message": alert_data["message"],
+            "severity": alert_data["severity"],
+            "source": alert_data.get("source"),
+            "fingerprint": fingerprint,
+            "count": 1,
+            "is_active": True,
+            "created_at": now,
+            "last_seen_at": now,
+            "resolved_at": None
+        }
+        alerts.append(alert)
+        alerts_by_id[alert["id"]] = alert
+        _set_active(alert)
+        alert_index.add(alert)
+
+        group = _group(alert)
+        group["alerts"] += 1
+        group["firings"] += 1
+        group["last_seen_at"] = now
+        _track_open(alert)
+
+        broker.publish("alerts", "alert.created", dict(alert))
+        _maybe_compact_alerts()
+        return alert
+
+def search_alerts(
+    q: str,
+    severity: Optional[str] = None,
+    active_only: bool = False,
+    skip: int = 0,
+    limit: int = 100
+) -> List[Dict]:
+    """Alerts whose title or message contain every word of q, newest first."""
+    with alerts_lock:
+        return alert_index.search(q, severity=severity, active_only=active_only, skip=skip, limit=limit)
+
+def get_alert_groups(skip: int = 0, limit: int = 100, active_only: bool = False) -> List[Dict]:
+    """Alerts grouped by fingerprint, most recently seen first."""
+    with alerts_lock:
+        groups = alert_groups.values()
+        if active_only:
+            groups = [group for group in groups if group["active_alert_id"] is not None]
+        ordered = sorted(groups, key=lambda group: group["last_seen_at"], reverse=True)
+        return ordered[skip:skip + limit]
 
 def update_alert(alert_id: str, update_data: Dict) -> Optional[Dict]:
-    alert = get_alert_by_id(alert_id)
-    if not alert:
-        return None
-    
-    for key, value in update_data.items():
-        alert[key] = value
-    
-    if update_data.get("is_active") is False and not alert.get("resolved_at"):
-        alert["resolved_at"] = datetime.now().isoformat()
-    
-    return alert
+    """
+    Apply a partial update. Raises ValueError if it would change the alert's
+    ID or created_at, which the alert indexes are keyed and ordered by.
+    """
+    with alerts_lock:
+        alert = get_alert_by_id(alert_id)
+        if not alert:
+            return None
+        for key in ("id", "created_at"):
+            if key in update_data and update_data[key] != alert[key]:
+                raise ValueError(f"Alert '{key}' cannot be changed")
+
+        old_fingerprint = alert["fingerprint"]
+        if open_fingerprints.get(old_fingerprint) == alert_id:
+            del open_fingerprints[old_fingerprint]
+
+        for key, value in update_data.items():
+            alert[key] = value
+
+        if {"title", "severity", "source"} & update_data.keys():
+            alert["fingerprint"] = alert_fingerprint(alert["title"], alert["severity"], alert.get("source"))
+            if alert["fingerprint"] != old_fingerprint:
+                _regroup(alert, old_fingerprint)
+
+        if {"title", "message"} & update_data.keys():
+            alert_index.update(alert)
+
+        _set_active(alert)
+
+        # As in crud.update_alert_fields: reopening clears resolved_at
+        if alert["is_active"]:
+            alert["resolved_at"] = None
+        elif not alert.get("resolved_at"):
+            alert["resolved_at"] = datetime.now().isoformat()
+
+        if alert["is_active"]:
+            _resolved_since.pop(alert["id"], None)
+        elif alert["id"] not in _resolved_since:
+            resolved_us = now_us()
+            _resolved_since[alert["id"]] = resolved_us
+            _resolved_queue.append((resolved_us, alert["id"]))
+
+        _track_open(alert)
+        broker.publish("alerts", "alert.updated", dict(alert))
+        _maybe_compact_alerts()
+        return alert
+
+# Alert rules, evaluated on every ingested sample
+rule_engine = RuleEngine(
+    fire=create_alert,
+    resolve=lambda alert_id: update_alert(alert_id, {"is_active": False})
+)
+
+def get_alert_rules() -> List[Dict]:
+    with metrics.lock:
+        return rule_engine.list()
+
+def get_alert_rule(rule_id: str) -> Optional[Dict]:
+    return rule_engine.get(rule_id)
+
+def create_alert_rule(rule_data: Dict) -> Dict:
+    """Compile and register a rule. Raises ValueError for an invalid definition."""
+    with metrics.lock:
+        return rule_engine.add(rule_data)
+
+def delete_alert_rule(rule_id: str) -> bool:
+    with metrics.lock:
+        return rule_engine.remove(rule_id)
+
+def compact_alerts() -> int:
+    """
+    Drop alerts that have stayed resolved for longer than the TTL.
+    """
+    global alerts_compacted, _last_compaction_us
+    with alerts_lock:
+        _last_compaction_us = now_us()
+        cutoff = _last_compaction_us - int(ALERTS_RESOLVED_TTL_SECONDS * 1_000_000)
+        dropped = 0
+        fingerprints = set()
+        while _resolved_queue and _resolved_queue[0][0] < cutoff:
+            resolved_us, alert_id = _resolved_queue.popleft()
+            # Skip entries for alerts that were reopened (and maybe resolved again)
+            if _resolved_since.get(alert_id) != resolved_us:
+                continue
+            del _resolved_since[alert_id]
+            fingerprints.add(alerts_by_id.pop(alert_id)["fingerprint"])
+            alert_index.remove(alert_id)
+            dropped += 1
+        if dropped:
+            alerts[:] = [alert for alert in alerts if alert["id"] in alerts_by_id]
+            alerts_compacted += dropped
+            # Rebuild the groups that lost alerts from the ones left
+            for fingerprint in fingerprints:
+                alert_groups.pop(fingerprint, None)
+            for alert in alerts:
+                if alert["fingerprint"] in fingerprints:
+                    _join_group(alert)["active_alert_id"] = open_fingerprints.get(alert["fingerprint"])
+        return dropped
+
+def _maybe_compact_alerts():
+    if ALERTS_RESOLVED_TTL_SECONDS and now_us() - _last_compaction_us >= ALERTS_COMPACT_INTERVAL_SECONDS * 1_000_000:
+        compact_alerts()
+
+def storage_stats() -> Dict:
+    """Memory and eviction counters for sizing the backend container."""
+    series_bytes = metrics.nbytes()
+    rollup_bytes = metric_rollups.nbytes()
+    return {
+        "metrics": {
+            "series": len(metrics.all_series()),
+            "samples": len(metrics),
+            "sample_bytes": series_bytes,
+            "compression": metrics.chunk_stats(),
+            "rollup_bytes": rollup_bytes,
+            "evicted_by_age": metrics.evicted_by_age,
+            "evicted_by_count": metrics.evicted_by_count,
+            "series_limit": metrics.max_series,
+            "rejected_series": metrics.rejected_series,
+        },
+        "alerts": {
+            "count": len(alerts),
+            "resolved_pending_compaction": len(_resolved_since),
+            "compacted": alerts_compacted,
+        },
+        "process": {
+            # ru_maxrss is reported in kilobytes on Linux
+            "peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        },
+    }
+
+for _name, _policy in METRICS_RETENTION_OVERRIDES.items():
+    set_retention(_name, _policy.get("max_age_seconds"), _policy.get("max_samples"))
 
 # Add some sample data
 def add_sample_data():
@@ -82,6 +734,17 @@ def add_sample_data():
     create_metric({"name": "network_in", "value": 1.2, "unit": "MB/s"})
     create_metric({"name": "network_out", "value": 0.8, "unit": "MB/s"})
     
+    # Sample rules
+    create_alert_rule({
+        "name": "High CPU Usage",
+        "metric": "cpu_usage",
+        "op": ">",
+        "threshold": 80,
+        "for_seconds": 300,
+        "severity": "warning",
+        "message": "CPU usage has exceeded {threshold:g}% for the last 5 minutes"
+    })
+    
     # Sample alerts
     create_alert({
         "title": "High CPU Usage", 
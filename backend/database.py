@@ -1,5 +1,6 @@
 import os
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from dotenv import load_dotenv
@@ -9,12 +10,41 @@ load_dotenv()
 # Get database URL from environment or use sqlite as default
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./app.db")
 
+# "production" turns statement logging off unless SQL_ECHO says otherwise
+ENVIRONMENT = os.getenv("ENVIRONMENT", "development")
+SQL_ECHO = os.getenv("SQL_ECHO", str(ENVIRONMENT != "production")).lower() in ("1", "true", "yes")
+
+# Connection pool (ignored for SQLite, which keeps a connection per thread)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+# Async drivers used when ASYNC_DATABASE_URL is not set
+ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}
+
+
+def _engine_options(url: str) -> dict:
+    options = {"echo": SQL_ECHO, "pool_pre_ping": DB_POOL_PRE_PING}
+    if make_url(url).get_backend_name() == "sqlite":
+        options["connect_args"] = {"check_same_thread": False}
+    else:
+        options["pool_size"] = DB_POOL_SIZE
+        options["max_overflow"] = DB_MAX_OVERFLOW
+    return options
+
+
+def _async_url(url: str):
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver known for '{backend}'; set ASYNC_DATABASE_URL")
+    return parsed.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL")
+
 # Create SQLAlchemy engine
-engine = create_engine(
-    DATABASE_URL, 
-    echo=True, 
-    connect_args={} if "sqlite" not in DATABASE_URL else {"check_same_thread": False}
-)
+engine = create_engine(DATABASE_URL, **_engine_options(DATABASE_URL))
 
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -28,4 +58,37 @@ def get_db():
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+
+# The async engine is created on first use, so the async driver is only
+# needed by deployments that use it
+_async_engine = None
+_AsyncSessionLocal = None
+
+def get_async_engine():
+    global _async_engine
+    if _async_engine is None:
+        from sqlalchemy.ext.asyncio import create_async_engine
+
+        url = ASYNC_DATABASE_URL or _async_url(DATABASE_URL)
+        options = _engine_options(url)
+        # aiosqlite runs each connection in its own thread already
+        options.pop("connect_args", None)
+        _async_engine = create_async_engine(url, **options)
+    return _async_engine
+
+def async_session():
+    """Return a new AsyncSession on the async engine."""
+    global _AsyncSessionLocal
+    if _AsyncSessionLocal is None:
+        from sqlalchemy.ext.asyncio import AsyncSession
+
+        _AsyncSessionLocal = sessionmaker(
+            bind=get_async_engine(), class_=AsyncSession, autoflush=False, expire_on_commit=False
+        )
+    return _AsyncSessionLocal()
+
+# Dependency to get an async DB session for async routes
+async def get_async_db():
+    async with async_session() as db:
+        yield db
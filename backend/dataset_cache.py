@@ -0,0 +1,353 @@
+"""
+Content-addressed cache of parsed CSV uploads.
+
+A dataset is identified by the SHA-256 of the uploaded bytes and the parse
+options, so uploading the same file again finds the parsed copy instead of
+parsing it. ingest_csv (run in a CSV worker) parses the file once in row
+groups of PROFILE_CHUNK_ROWS rows, profiles it in the same pass, and writes
+every column of every row group as plain .npy arrays (nothing is pickled):
+
+- numeric and bool columns: the values;
+- string columns: UTF-8 bytes, int64 offsets into them and a validity mask.
+
+The dataset has one schema, as if pandas had parsed the whole file: a column
+is numeric only if it parsed as numeric in every row group (widened to the
+common dtype on read); otherwise it is a string column holding the text as
+written, so '007' stays '007'. Row groups that parsed such a column as
+numbers before a later group showed otherwise are re-read as text for just
+that column.
+
+Reads memory-map only the row groups and columns a page needs, so repeat
+reads are served from the page cache. manifest.json holds the schema, row
+counts and the profile; datasets in an older format are dropped on read and
+parsed again.
+
+The cache stays under DATASET_CACHE_MAX_MB by evicting the least recently
+used datasets (by manifest mtime, which reads touch) after each ingest; the
+newest dataset is always kept.
+"""
+from datetime import datetime
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+from typing import Dict, List, Optional, Sequence
+
+from dotenv import load_dotenv
+import numpy as np
+import pandas as pd
+
+from csv_profile import PROFILE_CHUNK_ROWS, ColumnProfile, CSVProfile
+
+load_dotenv()
+
+DATASET_CACHE_DIR = os.getenv("DATASET_CACHE_DIR", "./dataset_cache")
+DATASET_CACHE_MAX_MB = int(os.getenv("DATASET_CACHE_MAX_MB", 1024))
+# Most rows one page read returns
+DATASET_PAGE_MAX_ROWS = 1000
+
+MANIFEST = "manifest.json"
+# Bumped when the on-disk layout changes
+CACHE_FORMAT = 2
+# Schema dtype of columns stored as text
+STRING = "string"
+_DATASET_ID = re.compile(r"^[0-9a-f]{32}$")
+
+
+def dataset_id(sha256: str, skip_rows: int = 0, delimiter: str = ",") -> str:
+    """ID of an upload with the given content hash parsed with these options."""
+    options = json.dumps([sha256, skip_rows, delimiter])
+    return hashlib.sha256(options.encode()).hexdigest()[:32]
+
+
+def _json_safe(value):
+    if isinstance(value, float) and not np.isfinite(value):
+        return None
+    return value
+
+
+# Writing, in the worker process
+
+def _column_file(group: int, column: int, part: str = "") -> str:
+    return f"rg{group:05d}.c{column}{part}.npy"
+
+
+def _write_column(directory: str, group: int, column: int, series: pd.Series) -> str:
+    """Write one column of a row group; returns its encoding."""
+    def save(part: str, array: np.ndarray):
+        path = os.path.join(directory, _column_file(group, column, part))
+        np.save(path, array, allow_pickle=False)
+
+    if not pd.api.types.is_extension_array_dtype(series.dtype) and series.dtype.kind in "biuf":
+        save("", series.to_numpy())
+        return "fixed"
+    values = series.to_numpy(dtype=object)
+    valid = ~pd.isna(values)
+    encoded = [value.encode() for value in values[valid]]
+    lengths = np.zeros(len(values), dtype=np.int64)
+    lengths[valid] = [len(value) for value in encoded]
+    offsets = np.zeros(len(values) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    data = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    save("", data)
+    save(".offsets", offsets)
+    save(".valid", valid)
+    return STRING
+
+
+def _schema_dtype(profile: ColumnProfile) -> str:
+    """A column's dataset dtype: its dtype across all row groups, if fixed-width."""
+    try:
+        kind = np.dtype(profile.dtype).kind
+    except TypeError:
+        return STRING
+    return profile.dtype if kind in "biuf" else STRING
+
+
+def _rewrite_as_text(
+    directory: str,
+    path: str,
+    skip_rows: int,
+    delimiter: str,
+    chunk_rows: int,
+    groups: List[Dict],
+    columns: List[int]
+):
+    """
+    Re-read the given columns as text and rewrite the row groups that
+    stored them as numbers.
+    """
+    reader = pd.read_csv(
+        path, skiprows=skip_rows, delimiter=delimiter, chunksize=chunk_rows,
+        usecols=columns, dtype=str, low_memory=False
+    )
+    # usecols keeps file order, so columns must be ascending
+    for index, (group, chunk) in enumerate(zip(groups, reader)):
+        for position, j in enumerate(columns):
+            if group["encodings"][j] == "fixed":
+                encoding = _write_column(directory, index, j, chunk.iloc[:, position])
+                group["encodings"][j] = encoding
+
+
+def ingest_csv(
+    path: str,
+    root: str,
+    dataset: str,
+    skip_rows: int = 0,
+    delimiter: str = ",",
+    chunk_rows: int = PROFILE_CHUNK_ROWS
+) -> Dict:
+    """
+    Parse and profile the CSV at path into root/dataset, chunk_rows rows
+    per row group; returns the manifest. If another ingest of the same
+    dataset finished first, its copy is kept.
+    """
+    os.makedirs(root, exist_ok=True)
+    directory = tempfile.mkdtemp(dir=root, prefix=".ingest-")
+    try:
+        profile = CSVProfile()
+        names = []
+        groups = []
+        # low_memory=False infers each column once per row group, so a
+        # non-numeric column is all strings rather than mixed objects
+        reader = pd.read_csv(
+            path, skiprows=skip_rows, delimiter=delimiter, chunksize=chunk_rows, low_memory=False
+        )
+        for group, chunk in enumerate(reader):
+            if not names:
+                names = list(chunk.columns)
+            profile.update(chunk)
+            encodings = [
+                _write_column(directory, group, j, chunk[name])
+                for j, name in enumerate(chunk.columns)
+            ]
+            groups.append({"rows": len(chunk), "encodings": encodings})
+
+        dtypes = [_schema_dtype(profile.columns[name]) for name in names]
+        mixed = [
+            j for j, dtype in enumerate(dtypes)
+            if dtype == STRING and any(group["encodings"][j] == "fixed" for group in groups)
+        ]
+        if mixed:
+            _rewrite_as_text(directory, path, skip_rows, delimiter, chunk_rows, groups, mixed)
+
+        manifest = {
+            "id": dataset,
+            "format": CACHE_FORMAT,
+            "created_at": datetime.now().isoformat(),
+            "file_size": os.path.getsize(path),
+            "skip_rows": skip_rows,
+            "delimiter": delimiter,
+            "rows": profile.rows,
+            "columns": [str(name) for name in names],
+            "dtypes": dtypes,
+            "row_groups": groups,
+            "profile": {
+                "memory_usage": profile.chunk_bytes,
+                "column_stats": {
+                    str(name): {key: _json_safe(value) for key, value in stats.items()}
+                    for name, stats in profile.column_stats().items()
+                },
+            },
+        }
+        manifest["bytes"] = sum(entry.stat().st_size for entry in os.scandir(directory))
+        with open(os.path.join(directory, MANIFEST), "w") as f:
+            json.dump(manifest, f)
+        try:
+            os.rename(directory, os.path.join(root, dataset))
+        except OSError:
+            if not os.path.exists(os.path.join(root, dataset, MANIFEST)):
+                raise
+            shutil.rmtree(directory, ignore_errors=True)
+        return manifest
+    except BaseException:
+        shutil.rmtree(directory, ignore_errors=True)
+        raise
+
+
+# Reading, in the API process
+
+class Dataset:
+    """A cached dataset; row reads memory-map the column files they need."""
+
+    def __init__(self, directory: str, manifest: Dict):
+        self.directory = directory
+        self.manifest = manifest
+        self.id: str = manifest["id"]
+        self.rows: int = manifest["rows"]
+        self.columns: List[str] = manifest["columns"]
+        self.dtypes: List[str] = manifest["dtypes"]
+        rows = [group["rows"] for group in manifest["row_groups"]]
+        self._group_starts = np.cumsum([0] + rows)
+
+    def _load(self, group: int, column: int, part: str = "") -> np.ndarray:
+        path = os.path.join(self.directory, _column_file(group, column, part))
+        return np.load(path, mmap_mode="r")
+
+    def _read_column(self, group: int, column: int, start: int, stop: int) -> np.ndarray:
+        encoding = self.manifest["row_groups"][group]["encodings"][column]
+        if encoding == "fixed":
+            # Row groups may have parsed a narrower dtype (int64 in a float64 column)
+            return np.array(self._load(group, column)[start:stop], dtype=self.dtypes[column])
+        offsets = np.array(self._load(group, column, ".offsets")[start:stop + 1])
+        valid = np.array(self._load(group, column, ".valid")[start:stop])
+        raw = self._load(group, column)[offsets[0]:offsets[-1]].tobytes()
+        offsets -= offsets[0]
+        values = np.empty(stop - start, dtype=object)
+        for i, (begin, end) in enumerate(zip(offsets[:-1], offsets[1:])):
+            values[i] = raw[begin:end].decode() if valid[i] else None
+        return values
+
+    def read(
+        self, skip: int = 0, limit: int = 100, columns: Optional[Sequence[str]] = None
+    ) -> pd.DataFrame:
+        """
+        Rows skip to skip + limit of the given columns (all by default).
+        Raises ValueError for unknown columns.
+        """
+        names = list(columns) if columns else self.columns
+        unknown = [name for name in names if name not in self.columns]
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+        indexes = [self.columns.index(name) for name in names]
+        stop = min(skip + limit, self.rows)
+        parts = []
+        first = int(np.searchsorted(self._group_starts, skip, side="right")) - 1
+        for group in range(max(first, 0), len(self._group_starts) - 1):
+            group_start = int(self._group_starts[group])
+            if group_start >= stop:
+                break
+            start = max(skip - group_start, 0)
+            end = min(stop, int(self._group_starts[group + 1])) - group_start
+            parts.append(pd.DataFrame(
+                {name: self._read_column(group, j, start, end) for name, j in zip(names, indexes)}
+            ))
+        if not parts:
+            return pd.DataFrame(columns=names)
+        return pd.concat(parts, ignore_index=True)
+
+    def records(
+        self, skip: int = 0, limit: int = 100, columns: Optional[Sequence[str]] = None
+    ) -> List[Dict]:
+        """read() as JSON-ready records, with missing values as None."""
+        page = self.read(skip, limit, columns).astype(object)
+        return page.where(page.notna(), None).to_dict("records")
+
+    def summary(self) -> Dict:
+        keys = ("id", "created_at", "file_size", "rows", "columns", "bytes")
+        return {key: self.manifest[key] for key in keys}
+
+
+class DatasetCache:
+    """Datasets under root, kept within max_bytes by LRU eviction."""
+
+    def __init__(
+        self, root: str = DATASET_CACHE_DIR, max_bytes: int = DATASET_CACHE_MAX_MB * 1024 * 1024
+    ):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.evicted = 0
+        self._lock = threading.Lock()
+
+    def get(self, dataset: str) -> Optional[Dataset]:
+        """The cached dataset, marked as recently used, or None."""
+        if not _DATASET_ID.match(dataset):
+            return None
+        directory = os.path.join(self.root, dataset)
+        path = os.path.join(directory, MANIFEST)
+        try:
+            with open(path) as f:
+                manifest = json.load(f)
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        if manifest.get("format") != CACHE_FORMAT:
+            shutil.rmtree(directory, ignore_errors=True)
+            return None
+        return Dataset(directory, manifest)
+
+    def _entries(self) -> List[Dict]:
+        entries = []
+        if not os.path.isdir(self.root):
+            return entries
+        for entry in os.scandir(self.root):
+            if entry.name.startswith(".") or not _DATASET_ID.match(entry.name):
+                continue
+            path = os.path.join(entry.path, MANIFEST)
+            try:
+                used = os.stat(path).st_mtime
+                with open(path) as f:
+                    manifest = json.load(f)
+            except (FileNotFoundError, ValueError):
+                continue
+            entries.append({"id": entry.name, "bytes": manifest["bytes"], "used": used})
+        return entries
+
+    def evict(self, keep: Optional[str] = None):
+        """Remove least recently used datasets (except keep) until the cache fits."""
+        with self._lock:
+            entries = sorted(self._entries(), key=lambda entry: entry["used"])
+            total = sum(entry["bytes"] for entry in entries)
+            for entry in entries:
+                if total <= self.max_bytes:
+                    break
+                if entry["id"] == keep:
+                    continue
+                shutil.rmtree(os.path.join(self.root, entry["id"]), ignore_errors=True)
+                total -= entry["bytes"]
+                self.evicted += 1
+
+    def stats(self) -> Dict:
+        entries = self._entries()
+        return {
+            "datasets": len(entries),
+            "bytes": sum(entry["bytes"] for entry in entries),
+            "max_bytes": self.max_bytes,
+            "evicted": self.evicted,
+        }
+
+
+cache = DatasetCache()
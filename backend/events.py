@@ -0,0 +1,98 @@
+"""
+In-process fan-out of store changes to live subscribers.
+
+data.py publishes every created metric and created/updated alert here. Each
+subscriber owns a bounded deque: when a slow client falls behind, its oldest
+events are dropped (and counted) instead of blocking ingest or other
+subscribers. Publishing never awaits and is safe from worker threads.
+"""
+import asyncio
+from collections import deque
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Events buffered per subscriber before the oldest are dropped
+DEFAULT_BUFFER_SIZE = 1000
+
+
+class Subscriber:
+    """One consumer's buffer, drained from its own event loop."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, topics: Set[str], buffer_size: int):
+        self.topics = topics
+        self.queue: deque = deque(maxlen=buffer_size)
+        self.dropped = 0
+        self._loop = loop
+        self._wakeup = asyncio.Event()
+        self._waiting = False
+
+    def push(self, event: str, payload: Dict):
+        if len(self.queue) == self.queue.maxlen:
+            self.dropped += 1
+        self.queue.append((event, payload))
+        # Only cross into the event loop when the consumer is asleep
+        if self._waiting:
+            self._waiting = False
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def next_batch(self, timeout: Optional[float] = None) -> List[Tuple[str, Dict]]:
+        """Wait for events and return everything buffered (empty on timeout)."""
+        if not self.queue:
+            self._wakeup.clear()
+            self._waiting = True
+            # Re-check after flagging so a concurrent push is not missed
+            if not self.queue:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+            self._waiting = False
+        batch = []
+        while self.queue:
+            batch.append(self.queue.popleft())
+        return batch
+
+    def take_dropped(self) -> int:
+        dropped, self.dropped = self.dropped, 0
+        return dropped
+
+
+class EventBroker:
+    """Registry of subscribers; publish() copies a reference into each buffer."""
+
+    def __init__(self):
+        self._subscribers: List[Subscriber] = []
+        self._lock = threading.Lock()
+        self.published = 0
+
+    @property
+    def has_subscribers(self) -> bool:
+        return bool(self._subscribers)
+
+    def subscribe(self, topics: Iterable[str], buffer_size: int = DEFAULT_BUFFER_SIZE) -> Subscriber:
+        subscriber = Subscriber(asyncio.get_running_loop(), set(topics), buffer_size)
+        with self._lock:
+            self._subscribers = self._subscribers + [subscriber]
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        with self._lock:
+            self._subscribers = [s for s in self._subscribers if s is not subscriber]
+
+    def publish(self, topic: str, event: str, payload: Dict):
+        self.published += 1
+        # Copy-on-write list, so iterating needs no lock
+        for subscriber in self._subscribers:
+            if topic in subscriber.topics:
+                subscriber.push(event, payload)
+
+    def stats(self) -> Dict:
+        subscribers = self._subscribers
+        return {
+            "subscribers": len(subscribers),
+            "published": self.published,
+            "buffered": sum(len(s.queue) for s in subscribers),
+        }
+
+
+broker = EventBroker()
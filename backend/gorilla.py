@@ -0,0 +1,160 @@
+"""
+Gorilla block encoding for sealed metric chunks.
+
+Timestamps are stored as delta-of-deltas and values as the XOR with the
+previous value, after Facebook's Gorilla paper (VLDB 2015). A regular
+sampling interval costs one bit per timestamp and a repeated value one bit
+per value, so steady gauges shrink from 16 bytes to a few bits per sample;
+values that change on every sample still cost most of their 64 bits.
+
+Differences from the paper: timestamps are epoch microseconds, so
+delta-of-deltas are zigzag encoded into wider buckets, and the first
+timestamp and value are written in full rather than against a block header.
+Samples are interleaved (timestamp, value) in a single bit stream.
+"""
+from array import array
+from typing import Tuple
+
+# (prefix, prefix bits, payload bits) for a non-zero zigzagged delta-of-delta;
+# a zero delta-of-delta is a single 0 bit
+_DOD_CLASSES = (
+    (0b10, 2, 7),
+    (0b110, 3, 12),
+    (0b1110, 4, 20),
+    (0b11110, 5, 32),
+    (0b11111, 5, 64),
+)
+_MASK64 = (1 << 64) - 1
+
+
+class _BitWriter:
+    __slots__ = ("out", "acc", "bits")
+
+    def __init__(self):
+        self.out = bytearray()
+        self.acc = 0
+        self.bits = 0
+
+    def write(self, value: int, width: int):
+        self.acc = (self.acc << width) | value
+        self.bits += width
+        if self.bits >= 64:
+            # Flush whole bytes so the accumulator stays small
+            spare = self.bits & 7
+            self.out += (self.acc >> spare).to_bytes(self.bits >> 3, "big")
+            self.acc &= (1 << spare) - 1
+            self.bits = spare
+
+    def getvalue(self) -> bytes:
+        pad = -self.bits & 7
+        return bytes(self.out + (self.acc << pad).to_bytes((self.bits + pad) >> 3, "big"))
+
+
+def encode(timestamps: array, values: array) -> bytes:
+    """Encode parallel int64 timestamp and float64 value columns."""
+    if not len(timestamps):
+        return b""
+    bits = array("Q")
+    bits.frombytes(values.tobytes())
+    writer = _BitWriter()
+    write = writer.write
+
+    previous_ts, previous_delta = timestamps[0], 0
+    previous = bits[0]
+    write(previous_ts & _MASK64, 64)
+    write(previous, 64)
+    # Meaningful-bit window of the last XOR written with a header
+    leading = trailing = -1
+
+    for i in range(1, len(timestamps)):
+        ts = timestamps[i]
+        delta = ts - previous_ts
+        dod = delta - previous_delta
+        previous_ts, previous_delta = ts, delta
+        if dod == 0:
+            write(0, 1)
+        else:
+            zigzag = dod << 1 if dod > 0 else (-dod << 1) - 1
+            for prefix, prefix_bits, width in _DOD_CLASSES:
+                if not zigzag >> width:
+                    write(prefix, prefix_bits)
+                    write(zigzag, width)
+                    break
+            else:
+                raise ValueError("Timestamp delta-of-delta does not fit in 64 bits")
+
+        value = bits[i]
+        xor = value ^ previous
+        previous = value
+        if not xor:
+            write(0, 1)
+            continue
+        lead = min(64 - xor.bit_length(), 31)
+        trail = (xor & -xor).bit_length() - 1
+        if leading >= 0 and lead >= leading and trail >= trailing:
+            write(0b10, 2)
+            write(xor >> trailing, 64 - leading - trailing)
+        else:
+            leading, trailing = lead, trail
+            meaningful = 64 - lead - trail
+            write(0b11, 2)
+            write(lead, 5)
+            # 64 meaningful bits wraps to 0 in six bits
+            write(meaningful & 63, 6)
+            write(xor >> trail, meaningful)
+
+    return writer.getvalue()
+
+
+def decode(data: bytes, count: int) -> Tuple[array, array]:
+    """Decode count samples back into (timestamps, values) arrays."""
+    timestamps = array("q")
+    bits = array("Q")
+    if count:
+        # Reading a str of "0"/"1" by index and slice is much cheaper in
+        # Python than shifting bits out of an int
+        stream = format(int.from_bytes(data, "big"), f"0{len(data) * 8}b")
+        ts = int(stream[:64], 2)
+        if ts >> 63:
+            ts -= 1 << 64
+        value = int(stream[64:128], 2)
+        at = 128
+        timestamps.append(ts)
+        bits.append(value)
+        delta = 0
+        leading = trailing = 0
+
+        for _ in range(count - 1):
+            if stream[at] == "1":
+                prefix_bits = 1
+                while prefix_bits < 5 and stream[at + prefix_bits] == "1":
+                    prefix_bits += 1
+                width = _DOD_CLASSES[prefix_bits - 1][2]
+                # The terminating 0 is only written for the shorter prefixes
+                at += prefix_bits + (prefix_bits < 5)
+                zigzag = int(stream[at:at + width], 2)
+                at += width
+                delta += -(zigzag >> 1) - 1 if zigzag & 1 else zigzag >> 1
+            else:
+                at += 1
+            ts += delta
+            timestamps.append(ts)
+
+            if stream[at] == "1":
+                if stream[at + 1] == "1":
+                    leading = int(stream[at + 2:at + 7], 2)
+                    meaningful = int(stream[at + 7:at + 13], 2) or 64
+                    trailing = 64 - leading - meaningful
+                    at += 13
+                else:
+                    at += 2
+                end = at + 64 - leading - trailing
+                value ^= int(stream[at:end], 2) << trailing
+                at = end
+            else:
+                at += 1
+            bits.append(value)
+
+    values = array("d")
+    values.frombytes(bits.tobytes())
+    return timestamps, values
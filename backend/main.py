@@ -1,10 +1,12 @@
 import os
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from dotenv import load_dotenv
 
-from routes import metrics, alerts, sop_generator, csv_upload, connectors
+from csv_workers import CSV_RETRY_AFTER, WorkerPoolFull, pool as csv_pool
+from routes import metrics, alerts, alert_rules, events, sop_generator, csv_upload, datasets, connectors
+from storage import UnsupportedOperation, backend
 
 # Load environment variables
 load_dotenv()
@@ -34,40 +36,57 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.exception_handler(UnsupportedOperation)
+async def unsupported_operation_handler(request: Request, exc: UnsupportedOperation):
+    return JSONResponse(status_code=501, content={"detail": str(exc)})
+
+@app.exception_handler(WorkerPoolFull)
+async def worker_pool_full_handler(request: Request, exc: WorkerPoolFull):
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": str(CSV_RETRY_AFTER)})
+
 # Include routers
 app.include_router(metrics.router)
 app.include_router(alerts.router)
+app.include_router(alert_rules.router)
+app.include_router(events.router)
 app.include_router(sop_generator.router)
 app.include_router(csv_upload.router)
+app.include_router(datasets.router)
 app.include_router(connectors.router)
 
+@app.on_event("shutdown")
+def close_storage():
+    backend.close()
+
+@app.on_event("shutdown")
+def close_csv_workers():
+    csv_pool.close()
+
 @app.get("/")
 async def root():
     return {"message": "Welcome to the Operations Dashboard API"}
 
 @app.get("/api/health")
 async def health_check():
-    return {"status": "ok", "version": "0.1.0"}
+    return {"status": "ok", "version": "0.1.0", "storage": backend.name}
+
+@app.get("/api/storage")
+async def storage_stats():
+    """
+    Current memory use and eviction counters of the in-memory store.
+    """
+    import data
+    
+    backend.require_in_memory("Storage stats")
+    return data.storage_stats()
 
 @app.get("/api/dashboard")
 async def dashboard_summary():
     """
     Get a summary of dashboard data for the main view.
     """
-    import data
-    
-    # Get the latest 5 metrics and alerts
-    recent_metrics = data.get_metrics(limit=5)
-    active_alerts = data.get_alerts(limit=5, active_only=True)
-    
-    # Create a summary
-    summary = {
-        "metrics_count": len(data.metrics),
-        "alerts_count": len(data.alerts),
-        "active_alerts_count": len([a for a in data.alerts if a["is_active"]]),
-        "recent_metrics": recent_metrics,
-        "active_alerts": active_alerts
-    }
+    # Counts plus the latest 5 metrics and active alerts
+    summary = await backend.dashboard_summary(recent=5)
     
     return JSONResponse(content=summary)
 
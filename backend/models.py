@@ -1,20 +1,54 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, ForeignKey, Text, Index, JSON, MetaData, Table
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from datetime import date, datetime
+from typing import Dict
 from database import Base
 
 class Metric(Base):
     __tablename__ = "metrics"
 
-    id = Column(Integer, primary_key=True, index=True)
-    name = Column(String, index=True)
+    id = Column(Integer, primary_key=True)
+    name = Column(String)
     value = Column(Float)
     unit = Column(String)
-    timestamp = Column(DateTime, default=func.now())
+    labels = Column(JSON, nullable=True)
+    # Python-side default so SQLite stores the same format as cursor bounds
+    timestamp = Column(DateTime, default=datetime.now)
+    
+    # Keyset pagination seeks on (timestamp, id), optionally within one name
+    __table_args__ = (
+        Index("ix_metrics_timestamp_id", "timestamp", "id"),
+        Index("ix_metrics_name_timestamp_id", "name", "timestamp", "id"),
+    )
     
     def __repr__(self):
         return f"<Metric(name='{self.name}', value={self.value}, unit='{self.unit}')>"
 
+# Daily metric partitions (metrics_YYYYMMDD) live outside Base.metadata so
+# create_all does not touch them; they are created and dropped one by one
+partition_metadata = MetaData()
+_metric_partitions: Dict[date, Table] = {}
+
+def metric_partition_name(day: date) -> str:
+    return f"{Metric.__tablename__}_{day:%Y%m%d}"
+
+def metric_partition(day: date) -> Table:
+    """The daily partition table for day, with the columns and indexes of metrics."""
+    table = _metric_partitions.get(day)
+    if table is None:
+        name = metric_partition_name(day)
+        table = Metric.__table__.to_metadata(partition_metadata, name=name)
+        # Index names are global in SQLite and PostgreSQL schemas
+        for index in table.indexes:
+            index.name = index.name.replace(f"ix_{Metric.__tablename__}_", f"ix_{name}_", 1)
+        _metric_partitions[day] = table
+    return table
+
+def forget_metric_partition(day: date):
+    table = _metric_partitions.pop(day, None)
+    if table is not None:
+        partition_metadata.remove(table)
+
 class Alert(Base):
     __tablename__ = "alerts"
     
@@ -22,9 +56,16 @@ class Alert(Base):
     title = Column(String, index=True)
     message = Column(Text)
     severity = Column(String)  # "critical", "warning", "info"
+    source = Column(String, nullable=True)
     is_active = Column(Boolean, default=True)
-    created_at = Column(DateTime, default=func.now())
+    created_at = Column(DateTime, default=datetime.now)
     resolved_at = Column(DateTime, nullable=True)
     
+    # Keyset pagination seeks on (created_at, id), optionally within active alerts
+    __table_args__ = (
+        Index("ix_alerts_created_at_id", "created_at", "id"),
+        Index("ix_alerts_active_created_at_id", "is_active", "created_at", "id"),
+    )
+    
     def __repr__(self):
         return f"<Alert(title='{self.title}', severity='{self.severity}', active={self.is_active})>" 
\ No newline at end of file
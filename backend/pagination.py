@@ -0,0 +1,25 @@
+"""
+Opaque keyset cursors shared by the in-memory and SQL storage paths.
+
+A cursor wraps the (timestamp, id) sort key of the last row on a page;
+the next page starts strictly after it, so deep pages cost the same as
+the first one and stay consistent while new rows are written.
+"""
+import base64
+import json
+from typing import Any, Tuple
+
+
+def encode_cursor(timestamp: Any, record_id: Any) -> str:
+    raw = json.dumps([timestamp, record_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, Any]:
+    """Raises ValueError for anything that is not a cursor we issued."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        timestamp, record_id = json.loads(raw)
+    except (TypeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+    return timestamp, record_id
@@ -0,0 +1,145 @@
+"""
+Multi-resolution rollups for metric series.
+
+Each series keeps 1m, 5m and 1h buckets (count, min, max, sum, last, the
+highest anomaly score and a quantile sketch) in the same columnar layout
+as the raw samples. Samples arrive in time order, so a new sample either
+updates the tail bucket or opens a new one - O(1) per resolution.
+"""
+from array import array
+from bisect import bisect_left
+from typing import Dict, List, Optional
+
+from sketches import QuantileSketch, Sketch, bin_key
+from timeseries import Columns
+
+# Resolution label -> bucket width in microseconds, finest first
+RESOLUTIONS = {
+    "1m": 60 * 1_000_000,
+    "5m": 5 * 60 * 1_000_000,
+    "1h": 60 * 60 * 1_000_000,
+}
+
+# Buckets kept per series: 7 days of 1m, 30 days of 5m, 1 year of 1h
+MAX_BUCKETS = {
+    "1m": 7 * 24 * 60,
+    "5m": 30 * 24 * 12,
+    "1h": 365 * 24,
+}
+
+
+class Rollup(Columns):
+    """Fixed-width buckets for one series at one resolution."""
+
+    COLUMNS = ("starts", "counts", "mins", "maxs", "sums", "lasts", "scores", "sketches")
+    __slots__ = ("step", "max_buckets") + COLUMNS
+
+    def __init__(self, step: int, max_buckets: Optional[int] = None):
+        super().__init__()
+        self.step = step
+        self.max_buckets = max_buckets
+        self.starts = array("q")
+        self.counts = array("q")
+        self.mins = array("d")
+        self.maxs = array("d")
+        self.sums = array("d")
+        self.lasts = array("d")
+        self.scores = array("d")
+        # Only the tail bucket's sketch is mutable; closed buckets are sealed
+        self.sketches: List[Sketch] = []
+
+    def add(self, ts: int, value: float, key: Optional[int] = None, score: float = 0.0):
+        bucket = ts - ts % self.step
+        if len(self) and self.starts[-1] == bucket:
+            self.counts[-1] += 1
+            if value < self.mins[-1]:
+                self.mins[-1] = value
+            if value > self.maxs[-1]:
+                self.maxs[-1] = value
+            self.sums[-1] += value
+            self.lasts[-1] = value
+            if score > self.scores[-1]:
+                self.scores[-1] = score
+            self.sketches[-1].add(value, key)
+            return
+        if self.sketches:
+            self.sketches[-1] = self.sketches[-1].seal()
+        sketch = QuantileSketch()
+        sketch.add(value, key)
+        self.starts.append(bucket)
+        self.counts.append(1)
+        self.mins.append(value)
+        self.maxs.append(value)
+        self.sums.append(value)
+        self.lasts.append(value)
+        self.scores.append(score)
+        self.sketches.append(sketch)
+        if self.max_buckets is not None and len(self) > self.max_buckets:
+            self.advance(1)
+
+    def window(self, start: Optional[int] = None, end: Optional[int] = None) -> range:
+        """Buckets overlapping start <= t < end, found by binary search."""
+        lo, hi = self.head, len(self.starts)
+        if start is not None:
+            lo = bisect_left(self.starts, start - start % self.step, lo)
+        if end is not None:
+            hi = bisect_left(self.starts, end, self.head)
+        return range(lo, max(lo, hi))
+
+    def bucket(self, pos: int) -> Dict:
+        count = self.counts[pos]
+        return {
+            "count": count,
+            "min": self.mins[pos],
+            "max": self.maxs[pos],
+            "sum": self.sums[pos],
+            "avg": self.sums[pos] / count,
+            "last": self.lasts[pos],
+            "anomaly_score": self.scores[pos],
+        }
+
+    def nbytes(self) -> int:
+        live = range(self.head, len(self.sketches))
+        return super().nbytes() + sum(self.sketches[pos].nbytes() for pos in live)
+
+
+class RollupStore:
+    """
+    Rollups for every series, indexed by series id, plus one sketch per
+    series covering everything it has ingested.
+    """
+
+    def __init__(self):
+        self._rollups: List[Dict[str, Rollup]] = []
+        self._totals: List[QuantileSketch] = []
+
+    def add(
+        self, sid: int, ts: int, value: float, score: float = 0.0, key: Optional[int] = None
+    ):
+        """Add a sample; pass key when bin_key(value) is already known."""
+        while sid >= len(self._rollups):
+            self._rollups.append({
+                label: Rollup(step, MAX_BUCKETS[label]) for label, step in RESOLUTIONS.items()
+            })
+            self._totals.append(QuantileSketch())
+        if key is None:
+            key = bin_key(value)
+        self._totals[sid].add(value, key)
+        for rollup in self._rollups[sid].values():
+            rollup.add(ts, value, key, score)
+
+    def total_sketch(self, sid: int) -> Optional[QuantileSketch]:
+        if sid >= len(self._totals):
+            return None
+        return self._totals[sid]
+
+    def get(self, sid: int, resolution: str) -> Optional[Rollup]:
+        if sid >= len(self._rollups):
+            return None
+        return self._rollups[sid][resolution]
+
+    def nbytes(self) -> int:
+        return (
+            sum(rollup.nbytes() for rollups in self._rollups for rollup in rollups.values())
+            + sum(sketch.nbytes() for sketch in self._totals)
+        )
@@ -0,0 +1,55 @@
+from typing import Dict
+from fastapi import APIRouter, Depends, HTTPException
+
+import data
+from storage import backend
+
+def _require_in_memory():
+    # Rules run on the in-memory ingest path
+    backend.require_in_memory("Alert rules")
+
+router = APIRouter(
+    prefix="/api/alert-rules",
+    tags=["alert rules"],
+    responses={404: {"description": "Not found"}},
+    dependencies=[Depends(_require_in_memory)],
+)
+
+@router.get("/")
+def read_alert_rules():
+    """
+    List the alert rules evaluated on metric ingest.
+    """
+    return {"rules": data.get_alert_rules()}
+
+@router.get("/{rule_id}")
+def read_alert_rule(rule_id: str):
+    """
+    Retrieve a specific alert rule by ID.
+    """
+    rule = data.get_alert_rule(rule_id)
+    if rule is None:
+        raise HTTPException(status_code=404, detail="Alert rule not found")
+    return rule
+
+@router.post("/", status_code=201)
+def create_alert_rule(rule: Dict):
+    """
+    Create (or replace, when the ID exists) an alert rule. Replacing a rule
+    resolves the alerts the old one has open.
+
+    Fields: name, metric, type ("threshold" or "rate"), op, threshold,
+    for_seconds, severity and an optional message template.
+    """
+    try:
+        return data.create_alert_rule(rule)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.delete("/{rule_id}", status_code=204)
+def delete_alert_rule(rule_id: str):
+    """
+    Delete an alert rule and resolve the alerts it has open.
+    """
+    if not data.delete_alert_rule(rule_id):
+        raise HTTPException(status_code=404, detail="Alert rule not found")
@@ -2,6 +2,7 @@ from typing import Dict, List, Optional
 from fastapi import APIRouter, HTTPException, Query
 
 import data
+from storage import backend
 
 router = APIRouter(
     prefix="/api/alerts",
@@ -11,22 +12,48 @@ router = APIRouter(
 
 @router.get("/")
 def read_alerts(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    active_only: bool = False,
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    q: Optional[str] = Query(None, description="Words that must all appear in the title or message"),
+    severity: Optional[str] = Query(None, description="Only with q: 'critical', 'warning' or 'info'")
+):
+    """
+    Retrieve alerts with optional filtering for active alerts only, or
+    search them by keyword (newest first) with q.
+    """
+    if q is not None:
+        backend.require_in_memory("Alert search")
+        alerts = data.search_alerts(q, severity=severity, active_only=active_only, skip=skip, limit=limit)
+        return {"alerts": alerts, "next_cursor": None}
+    
+    try:
+        alerts, next_cursor = backend.get_alerts_page(
+            cursor=cursor, skip=skip, limit=limit, active_only=active_only
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"alerts": alerts, "next_cursor": next_cursor}
+
+@router.get("/groups")
+def read_alert_groups(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
     active_only: bool = False
 ):
     """
-    Retrieve alerts with optional filtering for active alerts only.
+    Retrieve alerts grouped by fingerprint (title, severity, source).
     """
-    alerts = data.get_alerts(skip=skip, limit=limit, active_only=active_only)
-    return {"alerts": alerts}
+    backend.require_in_memory("Alert groups")
+    return {"groups": data.get_alert_groups(skip=skip, limit=limit, active_only=active_only)}
 
 @router.get("/{alert_id}")
 def read_alert(alert_id: str):
     """
     Retrieve a specific alert by ID.
     """
-    alert = data.get_alert_by_id(alert_id=alert_id)
+    alert = backend.get_alert_by_id(alert_id=alert_id)
     if alert is None:
         raise HTTPException(status_code=404, detail="Alert not found")
     return alert
@@ -34,16 +61,20 @@ def read_alert(alert_id: str):
 @router.post("/", status_code=201)
 def create_alert(alert: Dict):
     """
-    Create a new alert.
+    Create a new alert, or bump the count of the open alert with the same
+    title, severity and source.
     """
-    return data.create_alert(alert)
+    return backend.create_alert(alert)
 
 @router.patch("/{alert_id}")
 def update_alert(alert_id: str, alert_update: Dict):
     """
     Update an alert (e.g., to mark it as resolved).
     """
-    updated_alert = data.update_alert(alert_id=alert_id, update_data=alert_update)
+    try:
+        updated_alert = backend.update_alert(alert_id=alert_id, update_data=alert_update)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     if updated_alert is None:
         raise HTTPException(status_code=404, detail="Alert not found")
     return updated_alert 
\ No newline at end of file
@@ -2,9 +2,7 @@ import os
 import io
 import csv
 from fastapi import APIRouter, File, UploadFile, HTTPException, Query
-from fastapi.responses import JSONResponse
-from typing import List, Dict, Any, Optional
-import pandas as pd
+from fastapi.concurrency import run_in_threadpool
 from datetime import datetime
 import sys
 import logging
@@ -16,6 +14,11 @@ logger = logging.getLogger(__name__)
 # Import AWS connector
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from connectors.aws_connector import AWSConnector
+from csv_profile import SAMPLE_CONFIDENCE
+from csv_stream import PREVIEW_ROWS, SAMPLE_ROWS
+from csv_workers import WorkerPoolFull, pool, preview_file, sample_file
+from dataset_cache import cache, dataset_id
+from routes.datasets import ingest_upload, load_dataset
 
 # Create APIRouter
 router = APIRouter(
@@ -32,40 +35,61 @@ async def upload_csv(
 ):
     """
     Upload and process a CSV file.
-    Returns the processed data as JSON.
+    Returns the first PREVIEW_ROWS rows as JSON, the total row count and a
+    dataset_id for reading further pages from /api/datasets.
+
+    On a cache miss only the preview rows are parsed (and the rest counted)
+    in the CSV worker pool, and the answer comes back at once; the whole
+    file is parsed and profiled into the dataset cache in the background,
+    and /api/datasets requests for it wait for that. Uploading the same
+    content again is served from the cache. 503 when the pool is full; if
+    it fills up between the preview and the background parse, the preview
+    is returned with dataset_id null and the file is not cached. A miss's
+    preview types come from the preview rows alone, so a column that only
+    turns out to be text further down reads as numbers here and as strings
+    once cached; otherwise a miss and a hit return the same rows.
     """
     try:
         # Validate file type
         if not file.filename.endswith('.csv'):
             raise HTTPException(status_code=400, detail="File must be a CSV")
         
-        # Read file content
-        contents = await file.read()
-        
-        # Convert to in-memory file
-        in_memory_file = io.StringIO(contents.decode('utf-8'))
-        
-        # Process CSV using pandas
-        df = pd.read_csv(in_memory_file, skiprows=skip_rows, delimiter=delimiter)
-        
-        # Convert to records (list of dictionaries)
-        records = df.to_dict('records')
+        async with pool.upload(file.file) as upload:
+            dataset = await run_in_threadpool(cache.get, dataset_id(upload.sha256, skip_rows, delimiter))
+            if dataset is not None:
+                records = await run_in_threadpool(dataset.records, 0, PREVIEW_ROWS)
+                uploaded_id, columns, total_rows = dataset.id, dataset.columns, dataset.rows
+            else:
+                # Parse the preview and count rows in a worker process, then
+                # fill the cache from the same spooled file
+                df, total_rows = await pool.run(preview_file, upload.path, PREVIEW_ROWS, skip_rows, delimiter)
+                try:
+                    uploaded_id = ingest_upload(upload, skip_rows, delimiter)
+                except WorkerPoolFull:
+                    # No place for the parse; the preview still answers
+                    logger.warning(f"CSV worker pool full, not caching {file.filename}")
+                    uploaded_id = None
+                df = df.astype(object)
+                records, columns = df.where(df.notna(), None).to_dict("records"), [str(name) for name in df.columns]
         
         # Basic stats about the data
         stats = {
-            "total_rows": len(records),
-            "columns": list(df.columns),
+            "total_rows": total_rows,
+            "columns": columns,
             "processed_at": datetime.now().isoformat()
         }
         
         return {
             "success": True,
             "filename": file.filename,
+            "dataset_id": uploaded_id,
             "stats": stats,
-            "data": records[:100],  # Return first 100 rows to avoid large payloads
-            "has_more_data": len(records) > 100
+            "data": records,
+            "has_more_data": total_rows > PREVIEW_ROWS
         }
         
+    except (HTTPException, WorkerPoolFull):
+        raise
     except Exception as e:
         logger.error(f"Error processing CSV: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error processing CSV: {str(e)}")
@@ -73,58 +97,63 @@ async def upload_csv(
 @router.post("/analyze-csv")
 async def analyze_csv(
     file: UploadFile = File(...),
-    delimiter: str = Query(",", description="CSV delimiter character")
+    delimiter: str = Query(",", description="CSV delimiter character"),
+    mode: str = Query("exact", regex="^(exact|sample)$", description="exact profiles every row; sample estimates from a random sample"),
+    sample_rows: int = Query(SAMPLE_ROWS, ge=1, description="Rows kept in sample mode"),
+    confidence: float = Query(SAMPLE_CONFIDENCE, gt=0, lt=1, description="Confidence level of the sample mode intervals")
 ):
     """
     Analyze a CSV file and return statistics about each column.
+
+    The file is profiled in one pass over chunks of rows with mergeable
+    accumulators, so memory does not grow with the file size. Distinct
+    counts (HyperLogLog) and the median (quantile sketch, averaging the
+    middle two values of an even count) are estimates within about 1%;
+    memory_usage is the size of one parsed chunk. The profile is kept with
+    the parsed rows in the dataset cache, so analysing a file uploaded
+    before costs no parse.
+
+    With mode=sample the file is only split into records while a uniform
+    reservoir sample of sample_rows rows is kept, and just the sample is
+    parsed. Statistics are estimated from it, with null_percentage_ci,
+    mean_ci and unique_values_ci intervals; memory_usage is the size of the
+    parsed sample.
+
+    Both modes run in the CSV worker pool; 503 when it is full.
     """
     try:
         # Validate file type
         if not file.filename.endswith('.csv'):
             raise HTTPException(status_code=400, detail="File must be a CSV")
         
-        # Read file content
-        contents = await file.read()
-        
-        # Convert to in-memory file
-        in_memory_file = io.StringIO(contents.decode('utf-8'))
-        
-        # Process CSV using pandas
-        df = pd.read_csv(in_memory_file, delimiter=delimiter)
-        
-        # Generate statistics for each column
-        column_stats = {}
-        for column in df.columns:
-            column_type = str(df[column].dtype)
-            
-            stats = {
-                "dtype": column_type,
-                "count": int(df[column].count()),
-                "null_count": int(df[column].isna().sum()),
-                "null_percentage": float(df[column].isna().mean() * 100),
-                "unique_values": int(df[column].nunique())
-            }
-            
-            # Add numeric stats if applicable
-            if pd.api.types.is_numeric_dtype(df[column]):
-                stats.update({
-                    "min": float(df[column].min()) if not pd.isna(df[column].min()) else None,
-                    "max": float(df[column].max()) if not pd.isna(df[column].max()) else None,
-                    "mean": float(df[column].mean()) if not pd.isna(df[column].mean()) else None,
-                    "median": float(df[column].median()) if not pd.isna(df[column].median()) else None,
-                    "std": float(df[column].std()) if not pd.isna(df[column].std()) else None
-                })
-            
-            column_stats[column] = stats
+        # Profile in a worker process, unless the content is cached
+        dataset_id = None
+        async with pool.upload(file.file) as upload:
+            if mode == "sample":
+                column_stats, total_rows, total_columns, memory_usage = await pool.run(
+                    sample_file, upload.path, sample_rows, delimiter, confidence
+                )
+            else:
+                dataset = await load_dataset(upload, 0, delimiter)
+                profile = dataset.manifest["profile"]
+                column_stats, memory_usage = profile["column_stats"], profile["memory_usage"]
+                total_rows, total_columns, dataset_id = dataset.rows, len(dataset.columns), dataset.id
+        file_size = upload.size
         
         # File level statistics
         file_stats = {
-            "total_rows": len(df),
-            "total_columns": len(df.columns),
-            "memory_usage": df.memory_usage(deep=True).sum(),
-            "file_size": len(contents),
+            "total_rows": total_rows,
+            "total_columns": total_columns,
+            "memory_usage": memory_usage,
+            "file_size": file_size,
+            "mode": mode,
             "analyzed_at": datetime.now().isoformat()
         }
+        if dataset_id is not None:
+            file_stats["dataset_id"] = dataset_id
+        if mode == "sample":
+            file_stats["sample_rows"] = min(sample_rows, total_rows)
+            file_stats["confidence"] = confidence
         
         return {
             "success": True,
@@ -133,6 +162,8 @@ async def analyze_csv(
             "column_stats": column_stats
         }
         
+    except (HTTPException, WorkerPoolFull):
+        raise
     except Exception as e:
         logger.error(f"Error analyzing CSV: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error analyzing CSV: {str(e)}")
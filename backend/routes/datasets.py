@@ -0,0 +1,124 @@
+import asyncio
+import logging
+from typing import Dict, List, Optional
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+
+from csv_workers import SpooledUpload, pool
+from dataset_cache import DATASET_PAGE_MAX_ROWS, Dataset, cache, dataset_id, ingest_csv
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix="/api/datasets",
+    tags=["datasets"],
+    responses={404: {"description": "Not found"}},
+)
+
+
+# Uploads being parsed into the cache, by dataset ID
+_ingests: Dict[str, "asyncio.Future"] = {}
+
+
+async def _ingest(job: "asyncio.Future") -> str:
+    manifest = await job
+    await run_in_threadpool(cache.evict, manifest["id"])
+    return manifest["id"]
+
+
+def _ingest_done(dataset: str, task: "asyncio.Future"):
+    _ingests.pop(dataset, None)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"Error parsing dataset {dataset}: {task.exception()}")
+
+
+def ingest_upload(upload: SpooledUpload, skip_rows: int = 0, delimiter: str = ",") -> str:
+    """
+    Start parsing a spooled upload into the cache in a worker, unless it is
+    already being parsed; returns the dataset ID. The parse goes on after
+    the upload's request has answered. Raises WorkerPoolFull when the pool
+    has no place for it.
+    """
+    dataset = dataset_id(upload.sha256, skip_rows, delimiter)
+    if dataset not in _ingests:
+        job = pool.run_detached(upload, ingest_csv, cache.root, dataset, skip_rows, delimiter)
+        task = _ingests[dataset] = asyncio.ensure_future(_ingest(job))
+        task.add_done_callback(lambda task: _ingest_done(dataset, task))
+    return dataset
+
+
+async def load_dataset(upload: SpooledUpload, skip_rows: int = 0, delimiter: str = ",") -> Dataset:
+    """The cached dataset for a spooled upload, parsing it in a worker on a miss."""
+    dataset = await run_in_threadpool(cache.get, dataset_id(upload.sha256, skip_rows, delimiter))
+    if dataset is not None:
+        return dataset
+    # Shielded: other requests may be waiting for the same parse
+    await asyncio.shield(_ingests[ingest_upload(upload, skip_rows, delimiter)])
+    dataset = await run_in_threadpool(cache.get, dataset_id(upload.sha256, skip_rows, delimiter))
+    if dataset is None:
+        raise HTTPException(status_code=500, detail="Dataset was evicted while it was being stored")
+    return dataset
+
+
+async def _get_dataset(dataset_id: str) -> Dataset:
+    # An upload still being parsed is waited for
+    ingest = _ingests.get(dataset_id)
+    if ingest is not None:
+        try:
+            await asyncio.shield(ingest)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error parsing CSV: {str(e)}")
+    dataset = await run_in_threadpool(cache.get, dataset_id)
+    if dataset is None:
+        raise HTTPException(status_code=404, detail="Dataset not found (it may have been evicted; upload the file again)")
+    return dataset
+
+
+@router.get("")
+async def get_datasets() -> Dict:
+    """Cache usage: dataset count, bytes on disk, budget and evictions."""
+    return await run_in_threadpool(cache.stats)
+
+
+@router.get("/{dataset_id}")
+async def get_dataset(dataset_id: str) -> Dict:
+    dataset = await _get_dataset(dataset_id)
+    return dataset.summary()
+
+
+@router.get("/{dataset_id}/rows")
+async def get_dataset_rows(
+    dataset_id: str,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=DATASET_PAGE_MAX_ROWS),
+    columns: Optional[List[str]] = Query(None, description="Columns to return (all by default)")
+) -> Dict:
+    """A page of rows, reading only the requested columns."""
+    dataset = await _get_dataset(dataset_id)
+    try:
+        rows = await run_in_threadpool(dataset.records, skip, limit, columns)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Dataset not found (it may have been evicted; upload the file again)")
+    return {
+        "dataset_id": dataset.id,
+        "total_rows": dataset.rows,
+        "skip": skip,
+        "limit": limit,
+        "columns": columns or dataset.columns,
+        "rows": rows,
+        "has_more": skip + len(rows) < dataset.rows,
+    }
+
+
+@router.get("/{dataset_id}/profile")
+async def get_dataset_profile(dataset_id: str) -> Dict:
+    """Column statistics computed when the dataset was parsed."""
+    dataset = await _get_dataset(dataset_id)
+    return {
+        "dataset_id": dataset.id,
+        "total_rows": dataset.rows,
+        "total_columns": len(dataset.columns),
+        "column_stats": dataset.manifest["profile"]["column_stats"],
+    }
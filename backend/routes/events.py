@@ -0,0 +1,58 @@
+import json
+from typing import List
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+
+from events import broker
+
+router = APIRouter(
+    prefix="/api/events",
+    tags=["events"],
+    responses={404: {"description": "Not found"}},
+)
+
+TOPICS = {"metrics", "alerts"}
+
+# Seconds between keep-alive comments on an idle stream
+HEARTBEAT_INTERVAL = 15
+
+def _format_event(event: str, payload) -> str:
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+@router.get("/")
+async def stream_events(
+    request: Request,
+    topics: List[str] = Query(["metrics", "alerts"], description="Any of: metrics, alerts"),
+    buffer_size: int = Query(1000, ge=1, le=100000, description="Events buffered before the oldest are dropped")
+):
+    """
+    Server-Sent Events stream of created metrics and created/updated alerts.
+
+    A client that cannot keep up loses its oldest buffered events and is
+    told how many through a `dropped` event.
+    """
+    unknown = set(topics) - TOPICS
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown topics: {', '.join(sorted(unknown))}")
+    subscriber = broker.subscribe(topics, buffer_size=buffer_size)
+
+    async def stream():
+        try:
+            yield ": connected\n\n"
+            while not await request.is_disconnected():
+                batch = await subscriber.next_batch(timeout=HEARTBEAT_INTERVAL)
+                dropped = subscriber.take_dropped()
+                if dropped:
+                    yield _format_event("dropped", {"count": dropped})
+                if not batch:
+                    yield ": heartbeat\n\n"
+                    continue
+                yield "".join(_format_event(event, payload) for event, payload in batch)
+        finally:
+            broker.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,7 +1,10 @@
+from datetime import datetime
+import json
 from typing import Dict, List, Optional
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Request, Response
 
 import data
+from storage import backend
 
 router = APIRouter(
     prefix="/api/metrics",
@@ -9,35 +12,231 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+def _label_filters(label: Optional[List[str]]) -> Optional[Dict[str, str]]:
+    """Parse repeated key=value query params into a label matcher."""
+    if not label:
+        return None
+    labels = {}
+    for matcher in label:
+        key, sep, value = matcher.partition("=")
+        if not sep or not key:
+            raise HTTPException(status_code=400, detail=f"Invalid label filter '{matcher}', expected key=value")
+        labels[key] = value
+    return labels
+
+LABEL_QUERY = Query(None, description="Label filter as key=value; repeat to require several")
+
 @router.get("/")
 def read_metrics(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
-    name: str = None
+    name: str = None,
+    start: Optional[datetime] = Query(None, description="Inclusive lower bound on timestamp"),
+    end: Optional[datetime] = Query(None, description="Exclusive upper bound on timestamp"),
+    resolution: Optional[str] = Query(
+        None,
+        regex="^(raw|auto|1m|5m|1h)$",
+        description="Return raw samples or 1m/5m/1h rollups; 'auto' picks one that fits max_points"
+    ),
+    max_points: int = Query(300, ge=1, le=10000),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    label: Optional[List[str]] = LABEL_QUERY
 ):
     """
-    Retrieve metrics with optional filtering by name.
+    Retrieve metrics with optional filtering by name, labels and time range.
     """
-    if name:
-        metrics = data.get_metrics_by_name(name=name)
+    labels = _label_filters(label)
+    if resolution and resolution != "raw":
+        backend.require_in_memory("Rollups")
+    if resolution == "auto":
+        resolution = data.choose_resolution(
+            start=start, end=end, name=name, max_points=max_points, labels=labels
+        )
+    if resolution and resolution != "raw":
+        buckets = data.get_metric_rollups(
+            resolution, start=start, end=end, name=name, skip=skip, limit=limit, labels=labels
+        )
+        return {"metrics": buckets, "resolution": resolution}
+
+    if name and start is None and end is None and cursor is None:
+        response = {"metrics": backend.get_metrics_by_name(name=name, labels=labels)}
     else:
-        metrics = data.get_metrics(skip=skip, limit=limit)
+        try:
+            metrics, next_cursor = backend.get_metrics_page(
+                cursor=cursor, skip=skip, limit=limit, start=start, end=end, name=name, labels=labels
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        response = {"metrics": metrics, "next_cursor": next_cursor}
     
-    return {"metrics": metrics}
+    if resolution:
+        response["resolution"] = resolution
+    return response
+
+@router.get("/series")
+def read_series(name: Optional[str] = None, label: Optional[List[str]] = LABEL_QUERY):
+    """
+    List series (name + label set) matching a name and/or label filters.
+    """
+    backend.require_in_memory("Series listing")
+    return {"series": data.get_series(name=name, labels=_label_filters(label))}
+
+@router.get("/percentiles")
+def read_metric_percentiles(
+    name: str,
+    q: List[float] = Query([0.5, 0.95, 0.99], description="Quantiles between 0 and 1"),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    resolution: Optional[str] = Query(None, regex="^(raw|auto|1m|5m|1h)$"),
+    label: Optional[List[str]] = LABEL_QUERY
+):
+    """
+    Percentiles for a metric, answered from streaming quantile sketches.
+    """
+    backend.require_in_memory("Percentiles")
+    if any(not 0 <= quantile <= 1 for quantile in q):
+        raise HTTPException(status_code=400, detail="Quantiles must be between 0 and 1")
+    result = data.get_metric_percentiles(
+        name, q, start=start, end=end, resolution=resolution, labels=_label_filters(label)
+    )
+    if result is None:
+        raise HTTPException(status_code=404, detail="Metric not found")
+    return result
+
+# Largest heatmap the API will build in one request
+MAX_HEATMAP_BUCKETS = 2000
+
+@router.get("/anomalies")
+def read_metric_anomalies(
+    start: Optional[datetime] = Query(None, description="Defaults to 24 hours before end"),
+    end: Optional[datetime] = Query(None, description="Defaults to now"),
+    resolution: str = Query("1h", regex="^(1m|5m|1h)$"),
+    name: Optional[List[str]] = Query(None, description="Metric names (default: all)"),
+    label: Optional[List[str]] = LABEL_QUERY
+):
+    """
+    Anomaly score heatmap: one row per series, one column per time bucket.
+    """
+    backend.require_in_memory("Anomaly scores")
+    labels = _label_filters(label)
+    try:
+        return data.get_anomaly_heatmap(
+            start=start, end=end, resolution=resolution, names=name,
+            max_buckets=MAX_HEATMAP_BUCKETS, labels=labels
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# Samples handed to the store at a time while streaming NDJSON
+NDJSON_CHUNK_SIZE = 1000
+# Longest NDJSON line buffered before the request is refused with 413
+NDJSON_MAX_LINE_BYTES = 1 << 20
+MAX_REPORTED_ERRORS = 10
+
+def _line_too_long():
+    return HTTPException(
+        status_code=413, detail=f"NDJSON line longer than {NDJSON_MAX_LINE_BYTES} bytes"
+    )
+
+async def _ndjson_lines(request: Request):
+    """
+    Lines of the body as it streams in. Only a partial line is buffered,
+    and each byte is copied into it once.
+    """
+    partial = bytearray()
+    async for body_chunk in request.stream():
+        start = 0
+        while True:
+            end = body_chunk.find(b"\n", start)
+            if end < 0:
+                break
+            if len(partial) + end - start > NDJSON_MAX_LINE_BYTES:
+                raise _line_too_long()
+            if partial:
+                partial += body_chunk[start:end]
+                yield bytes(partial)
+                partial.clear()
+            else:
+                yield body_chunk[start:end]
+            start = end + 1
+        partial += memoryview(body_chunk)[start:]
+        if len(partial) > NDJSON_MAX_LINE_BYTES:
+            raise _line_too_long()
+    yield bytes(partial)
+
+@router.post("/batch")
+async def create_metrics_batch(request: Request):
+    """
+    Ingest many metrics at once.
+
+    Accepts a JSON array, or an NDJSON body (application/x-ndjson) that is
+    parsed as it streams in. Returns accepted/rejected counts; 413 for an
+    NDJSON line over NDJSON_MAX_LINE_BYTES (samples before it are kept).
+    """
+    if "ndjson" not in request.headers.get("content-type", ""):
+        try:
+            samples = json.loads(await request.body())
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid JSON: {str(e)}")
+        if not isinstance(samples, list):
+            raise HTTPException(status_code=400, detail="Body must be a JSON array of metrics")
+        return await backend.create_metrics_batch_async(samples, max_errors=MAX_REPORTED_ERRORS)
+
+    totals = {"accepted": 0, "rejected": 0, "errors": []}
+    chunk, first_index, index = [], 0, 0
+
+    async def flush():
+        result = await backend.create_metrics_batch_async(
+            chunk, first_index=first_index, max_errors=MAX_REPORTED_ERRORS
+        )
+        totals["accepted"] += result["accepted"]
+        totals["rejected"] += result["rejected"]
+        totals["errors"].extend(result["errors"][:MAX_REPORTED_ERRORS - len(totals["errors"])])
+        chunk.clear()
+
+    async for line in _ndjson_lines(request):
+        if not line.strip():
+            continue
+        try:
+            sample = json.loads(line)
+        except ValueError as e:
+            totals["rejected"] += 1
+            if len(totals["errors"]) < MAX_REPORTED_ERRORS:
+                totals["errors"].append({"index": index, "error": f"Invalid JSON: {str(e)}"})
+            # Flush so the samples before this line keep their own indexes
+            await flush()
+            first_index = index + 1
+        else:
+            chunk.append(sample)
+            if len(chunk) >= NDJSON_CHUNK_SIZE:
+                await flush()
+                first_index = index + 1
+        index += 1
+    await flush()
+    return totals
 
 @router.get("/{metric_id}")
 def read_metric(metric_id: str):
     """
     Retrieve a specific metric by ID.
     """
-    metric = data.get_metric_by_id(metric_id=metric_id)
+    metric = backend.get_metric_by_id(metric_id=metric_id)
     if metric is None:
         raise HTTPException(status_code=404, detail="Metric not found")
     return metric
 
 @router.post("/", status_code=201)
-def create_metric(metric: Dict):
+def create_metric(metric: Dict, response: Response, wait: bool = True):
     """
-    Create a new metric.
+    Create a new metric, optionally with a "labels" object.
+
+    With wait=false the SQL backend answers 202 once the sample is queued,
+    before it is committed and without an id.
     """
-    return data.create_metric(metric) 
\ No newline at end of file
+    try:
+        record = backend.create_metric(metric, wait=wait)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if record["id"] is None:
+        response.status_code = 202
+    return record 
\ No newline at end of file
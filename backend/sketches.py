@@ -0,0 +1,223 @@
+"""
+Mergeable sketches for metric values and CSV columns.
+
+Quantile sketches (DDSketch) count values in logarithmic bins, so any
+quantile is returned within RELATIVE_ACCURACY of the true value, and two
+sketches merge by adding their bin counts. Memory depends on the spread of
+values, not on how many samples were seen.
+
+HyperLogLog estimates distinct counts from 64-bit hashes in a fixed
+2**precision bytes; two merge by taking the larger register. Small counts
+(up to HLL_EXACT_LIMIT) are kept exactly alongside.
+"""
+from array import array
+import math
+import sys
+from typing import Dict, Iterator, Optional, Set, Tuple, Union
+
+import numpy as np
+
+RELATIVE_ACCURACY = 0.01
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+_LN_GAMMA = math.log(GAMMA)
+
+# Magnitudes below this are counted as zero
+MIN_MAGNITUDE = 1e-9
+
+
+def bin_key(value: float) -> Optional[int]:
+    """
+    Bin for a value: positive magnitudes map to even keys, negative to odd.
+
+    Returns None for values counted as zero.
+    """
+    magnitude = abs(value)
+    if magnitude < MIN_MAGNITUDE:
+        return None
+    index = math.ceil(math.log(magnitude) / _LN_GAMMA)
+    return index * 2 + (value < 0)
+
+
+def _bin_value(key: int) -> float:
+    index, negative = divmod(key, 2)
+    value = 2 * GAMMA ** index / (GAMMA + 1)
+    return -value if negative else value
+
+
+class _Sketch:
+    __slots__ = ("zeros", "count", "min", "max")
+
+    def _items(self) -> Iterator[Tuple[int, int]]:
+        raise NotImplementedError
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        The q-quantile, interpolated between the two nearest ranks like
+        numpy and pandas (so an even count's median averages the middle
+        two values), each within RELATIVE_ACCURACY.
+        """
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        lower = math.floor(rank)
+        entries = [(_bin_value(key), count) for key, count in self._items()]
+        if self.zeros:
+            entries.append((0.0, self.zeros))
+        entries.sort()
+        values = []
+        seen = 0
+        for value, count in entries:
+            seen += count
+            # The values at ranks lower and lower + 1, which may share a bin
+            while len(values) < 2 and seen > lower + len(values):
+                values.append(min(max(value, self.min), self.max))
+            if len(values) == 2:
+                break
+        if len(values) < 2:
+            values.append(self.max)
+        low, high = values
+        return low + (high - low) * (rank - lower)
+
+
+class QuantileSketch(_Sketch):
+    """Sketch that is still receiving samples."""
+
+    __slots__ = ("bins",)
+
+    def __init__(self):
+        self.bins: Dict[int, int] = {}
+        self.zeros = 0
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float, key: Optional[int] = None):
+        """Add a value; pass key when bin_key(value) is already known."""
+        if key is None:
+            key = bin_key(value)
+        if key is None:
+            self.zeros += 1
+        else:
+            self.bins[key] = self.bins.get(key, 0) + 1
+        self.count += 1
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def add_array(self, values: np.ndarray):
+        """Add a float64 array of values (no NaNs) at once."""
+        if not len(values):
+            return
+        magnitudes = np.abs(values)
+        nonzero = magnitudes >= MIN_MAGNITUDE
+        self.zeros += int(len(values) - np.count_nonzero(nonzero))
+        keys = np.ceil(np.log(magnitudes[nonzero]) / _LN_GAMMA).astype(np.int64) * 2 + (values[nonzero] < 0)
+        if len(keys):
+            low = int(keys.min())
+            counts = np.bincount(keys - low)
+            bins = self.bins
+            for offset in np.flatnonzero(counts).tolist():
+                key = low + offset
+                bins[key] = bins.get(key, 0) + int(counts[offset])
+        self.count += len(values)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+    def merge(self, other: "Sketch"):
+        bins = self.bins
+        for key, count in other._items():
+            bins[key] = bins.get(key, 0) + count
+        self.zeros += other.zeros
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def seal(self) -> "SealedSketch":
+        return SealedSketch(self)
+
+    def _items(self) -> Iterator[Tuple[int, int]]:
+        return iter(self.bins.items())
+
+    def nbytes(self) -> int:
+        return sys.getsizeof(self.bins)
+
+
+class SealedSketch(_Sketch):
+    """Read-only sketch packed into two arrays once its bucket is closed."""
+
+    __slots__ = ("keys", "counts")
+
+    def __init__(self, sketch: QuantileSketch):
+        self.keys = array("q", sketch.bins.keys())
+        self.counts = array("q", sketch.bins.values())
+        self.zeros = sketch.zeros
+        self.count = sketch.count
+        self.min = sketch.min
+        self.max = sketch.max
+
+    def _items(self) -> Iterator[Tuple[int, int]]:
+        return zip(self.keys, self.counts)
+
+    def nbytes(self) -> int:
+        return sys.getsizeof(self.keys) + sys.getsizeof(self.counts)
+
+
+Sketch = Union[QuantileSketch, SealedSketch]
+
+
+HLL_PRECISION = 14
+# Distinct hashes counted exactly before relying on the registers alone
+HLL_EXACT_LIMIT = 4096
+
+
+class HyperLogLog:
+    """Distinct-count estimate, about 1.04 / sqrt(2**precision) relative error."""
+
+    __slots__ = ("precision", "registers", "exact")
+
+    def __init__(self, precision: int = HLL_PRECISION):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+        self.exact: Optional[Set[int]] = set()
+
+    def _add_exact(self, hashes):
+        self.exact.update(hashes)
+        if len(self.exact) > HLL_EXACT_LIMIT:
+            self.exact = None
+
+    def add_hashes(self, hashes: np.ndarray):
+        """Add uniformly distributed uint64 hashes."""
+        if not len(hashes):
+            return
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        if self.exact is not None:
+            self._add_exact(np.unique(hashes).tolist())
+        width = 64 - self.precision
+        index = (hashes >> np.uint64(width)).astype(np.intp)
+        rest = hashes & np.uint64((1 << width) - 1)
+        # Rank is the position of the first 1 bit after the index bits; rest
+        # fits in a double exactly, so frexp's exponent is its bit length
+        rank = (width + 1 - np.frexp(rest.astype(np.float64))[1]).astype(np.uint8)
+        # Only hashes that raise their register matter (few, once warmed up)
+        higher = rank > self.registers[index]
+        np.maximum.at(self.registers, index[higher], rank[higher])
+
+    def merge(self, other: "HyperLogLog"):
+        np.maximum(self.registers, other.registers, out=self.registers)
+        if self.exact is not None:
+            if other.exact is None:
+                self.exact = None
+            else:
+                self._add_exact(other.exact)
+
+    def estimate(self) -> float:
+        if self.exact is not None:
+            return float(len(self.exact))
+        m = len(self.registers)
+        raw = 0.7213 / (1 + 1.079 / m) * m * m / np.ldexp(1.0, -self.registers.astype(np.int64)).sum()
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            # Linear counting is more accurate while many registers are empty
+            return m * math.log(m / zeros)
+        return float(raw)
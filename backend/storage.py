@@ -0,0 +1,571 @@
+"""
+Storage backends behind the metrics and alerts routes.
+
+STORAGE_BACKEND picks one at startup:
+
+- "memory" (default): the in-process store in data.py, which also keeps
+  rollups, sketches, anomaly scores, alert rules, dedup and search;
+- "sql": rows in the SQLAlchemy database at DATABASE_URL, through crud.py.
+
+Both return the same record dicts (IDs are strings in either case). SQL
+alerts are not deduplicated by fingerprint, so each has a count of 1 and a
+last_seen_at equal to its created_at. The in-memory extras have no SQL
+implementation; asking the SQL backend for them
+raises UnsupportedOperation, which the API answers with 501.
+"""
+from abc import ABC, abstractmethod
+from datetime import date, datetime, timedelta
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from dotenv import load_dotenv
+from sqlalchemy.orm import Session, sessionmaker
+
+import crud
+import data
+import database
+from events import broker
+import models
+from timeseries import parse_sample, to_datetime
+from write_buffer import GroupCommitWriter
+
+load_dotenv()
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "memory")
+
+# Rows per executemany when bulk-inserting a batch
+SQL_INSERT_CHUNK_SIZE = 1000
+# "daily" stores metrics in one table per day (metrics_YYYYMMDD)
+SQL_METRICS_PARTITIONING = os.getenv("SQL_METRICS_PARTITIONING", "none")
+# Minimum time between passes removing metrics older than METRICS_MAX_AGE_SECONDS
+SQL_RETENTION_INTERVAL_SECONDS = float(os.getenv("SQL_RETENTION_INTERVAL_SECONDS", 3600))
+
+
+class UnsupportedOperation(Exception):
+    """The configured backend does not implement this operation."""
+
+
+class Storage(ABC):
+    """
+    Operations every backend implements. Subclasses must define every
+    abstract method, or creating them raises TypeError.
+    """
+
+    name = ""
+
+    def require_in_memory(self, feature: str):
+        """Raise UnsupportedOperation unless this is the in-memory backend."""
+        raise UnsupportedOperation(
+            f"{feature}: not supported by the '{self.name}' storage backend (set STORAGE_BACKEND=memory)"
+        )
+
+    def close(self):
+        """Flush pending writes; called on shutdown."""
+
+    # Metrics
+    @abstractmethod
+    def create_metric(self, metric_data: Dict, wait: bool = True) -> Dict:
+        """
+        Store one sample. Without wait a backend may return before the write
+        is durable, in which case the record's id is None.
+        """
+
+    @abstractmethod
+    def create_metrics_batch(self, samples: Iterable[Dict], first_index: int = 0, max_errors: int = 10) -> Dict:
+        ...
+
+    @abstractmethod
+    def get_metrics(self, skip: int = 0, limit: int = 100) -> List[Dict]:
+        ...
+
+    @abstractmethod
+    def get_recent_metrics(self, limit: int = 5) -> List[Dict]:
+        """The most recently stored samples, newest first."""
+
+    @abstractmethod
+    def get_metrics_page(
+        self,
+        cursor: Optional[str] = None,
+        skip: int = 0,
+        limit: int = 100,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        name: Optional[str] = None,
+        labels: Optional[Dict[str, str]] = None
+    ) -> Tuple[List[Dict], Optional[str]]:
+        ...
+
+    @abstractmethod
+    def get_metric_by_id(self, metric_id: str) -> Optional[Dict]:
+        ...
+
+    @abstractmethod
+    def get_metrics_by_name(self, name: str, labels: Optional[Dict[str, str]] = None) -> List[Dict]:
+        ...
+
+    @abstractmethod
+    def metric_count(self) -> int:
+        ...
+
+    # Alerts
+    @abstractmethod
+    def create_alert(self, alert_data: Dict) -> Dict:
+        ...
+
+    @abstractmethod
+    def get_alerts(self, skip: int = 0, limit: int = 100, active_only: bool = False) -> List[Dict]:
+        ...
+
+    @abstractmethod
+    def get_alerts_page(
+        self,
+        cursor: Optional[str] = None,
+        skip: int = 0,
+        limit: int = 100,
+        active_only: bool = False
+    ) -> Tuple[List[Dict], Optional[str]]:
+        ...
+
+    @abstractmethod
+    def get_alert_by_id(self, alert_id: str) -> Optional[Dict]:
+        ...
+
+    @abstractmethod
+    def update_alert(self, alert_id: str, update_data: Dict) -> Optional[Dict]:
+        ...
+
+    @abstractmethod
+    def alert_counts(self) -> Dict[str, int]:
+        ...
+
+    # Async routes await these, so a database backend can serve them without
+    # blocking the event loop; by default they run the synchronous methods
+    async def create_metrics_batch_async(
+        self, samples: Iterable[Dict], first_index: int = 0, max_errors: int = 10
+    ) -> Dict:
+        return self.create_metrics_batch(samples, first_index=first_index, max_errors=max_errors)
+
+    async def dashboard_summary(self, recent: int = 5) -> Dict:
+        return _dashboard_summary(
+            self.get_recent_metrics(limit=recent),
+            self.get_alerts(limit=recent, active_only=True),
+            self.alert_counts(),
+            self.metric_count(),
+        )
+
+
+def _dashboard_summary(recent_metrics: List[Dict], active_alerts: List[Dict], alert_counts: Dict, metric_count: int) -> Dict:
+    return {
+        "metrics_count": metric_count,
+        "alerts_count": alert_counts["total"],
+        "active_alerts_count": alert_counts["active"],
+        "recent_metrics": recent_metrics,
+        "active_alerts": active_alerts,
+    }
+
+
+class MemoryStorage(Storage):
+    """The data.py store."""
+
+    name = "memory"
+
+    def require_in_memory(self, feature: str):
+        pass
+
+    def create_metric(self, metric_data: Dict, wait: bool = True) -> Dict:
+        return data.create_metric(metric_data)
+
+    def create_metrics_batch(self, samples: Iterable[Dict], first_index: int = 0, max_errors: int = 10) -> Dict:
+        return data.create_metrics_batch(samples, first_index=first_index, max_errors=max_errors)
+
+    def get_metrics(self, skip: int = 0, limit: int = 100) -> List[Dict]:
+        return data.get_metrics(skip=skip, limit=limit)
+
+    def get_recent_metrics(self, limit: int = 5) -> List[Dict]:
+        return data.get_recent_metrics(limit=limit)
+
+    def get_metrics_page(self, cursor=None, skip=0, limit=100, start=None, end=None, name=None, labels=None):
+        return data.get_metrics_page(
+            cursor=cursor, skip=skip, limit=limit, start=start, end=end, name=name, labels=labels
+        )
+
+    def get_metric_by_id(self, metric_id: str) -> Optional[Dict]:
+        return data.get_metric_by_id(metric_id)
+
+    def get_metrics_by_name(self, name: str, labels: Optional[Dict[str, str]] = None) -> List[Dict]:
+        return data.get_metrics_by_name(name, labels=labels)
+
+    def metric_count(self) -> int:
+        return len(data.metrics)
+
+    def create_alert(self, alert_data: Dict) -> Dict:
+        return data.create_alert(alert_data)
+
+    def get_alerts(self, skip: int = 0, limit: int = 100, active_only: bool = False) -> List[Dict]:
+        return data.get_alerts(skip=skip, limit=limit, active_only=active_only)
+
+    def get_alerts_page(self, cursor=None, skip=0, limit=100, active_only=False):
+        return data.get_alerts_page(cursor=cursor, skip=skip, limit=limit, active_only=active_only)
+
+    def get_alert_by_id(self, alert_id: str) -> Optional[Dict]:
+        return data.get_alert_by_id(alert_id)
+
+    def update_alert(self, alert_id: str, update_data: Dict) -> Optional[Dict]:
+        return data.update_alert(alert_id, update_data)
+
+    def alert_counts(self) -> Dict[str, int]:
+        return data.alert_counts()
+
+
+def _metric_record(row, partitioned: bool = False) -> Dict:
+    record_id = None
+    if row.id is not None:
+        # A partition's row ids are only unique within its day
+        record_id = f"{row.timestamp:%Y%m%d}-{row.id}" if partitioned else str(row.id)
+    return {
+        "id": record_id,
+        "name": row.name,
+        "value": row.value,
+        "unit": row.unit,
+        "labels": row.labels or {},
+        "timestamp": row.timestamp.isoformat(),
+    }
+
+
+def _alert_record(row) -> Dict:
+    # The fields of a memory alert; SQL alerts are not deduplicated, so each
+    # has fired once, when it was created
+    created_at = row.created_at.isoformat()
+    return {
+        "id": str(row.id),
+        "title": row.title,
+        "message": row.message,
+        "severity": row.severity,
+        "source": row.source,
+        "fingerprint": data.alert_fingerprint(row.title, row.severity, row.source),
+        "count": 1,
+        "is_active": row.is_active,
+        "created_at": created_at,
+        "last_seen_at": created_at,
+        "resolved_at": row.resolved_at.isoformat() if row.resolved_at else None,
+    }
+
+
+def _row_id(record_id: str) -> Optional[int]:
+    return int(record_id) if record_id.isdigit() else None
+
+
+def _partitioned_row_id(record_id: str) -> Tuple[Optional[date], Optional[int]]:
+    day, _, row_id = record_id.partition("-")
+    if len(day) != 8 or not day.isdigit() or not row_id.isdigit():
+        return None, None
+    try:
+        return datetime.strptime(day, "%Y%m%d").date(), int(row_id)
+    except ValueError:
+        return None, None
+
+
+class SQLStorage(Storage):
+    """
+    Rows in a SQLAlchemy database via crud.py.
+
+    Single writes go through a GroupCommitWriter, so concurrent requests
+    share transactions; batches go out as executemany in chunks of
+    SQL_INSERT_CHUNK_SIZE inside one transaction. Rows written without an
+    id (batches, and single writes that do not wait) are not published to
+    live subscribers.
+
+    With partitioning="daily" metrics go to one table per day and their IDs
+    become "<YYYYMMDD>-<row id>"; reads only touch the days they can match,
+    and retention drops whole days instead of deleting rows.
+
+    The async methods run the same crud functions on an AsyncSession
+    (database.get_async_engine unless async_engine is given).
+    """
+
+    name = "sql"
+
+    def __init__(self, engine=None, async_engine=None, partitioning: str = SQL_METRICS_PARTITIONING):
+        if partitioning not in ("none", "daily"):
+            raise ValueError(f"Unknown SQL_METRICS_PARTITIONING '{partitioning}'; expected 'none' or 'daily'")
+        self.engine = engine if engine is not None else database.engine
+        self.async_engine = async_engine
+        self.partitioned = partitioning == "daily"
+        self._async_sessions = None
+        # Records are built after commit; expiring would reload every row
+        self._session = sessionmaker(
+            bind=self.engine, autocommit=False, autoflush=False, expire_on_commit=False
+        )
+        database.Base.metadata.create_all(bind=self.engine)
+        self.writer = GroupCommitWriter(self.engine)
+        # Days whose partition is known to exist
+        self._partitions: Set[date] = set()
+        self._retention_lock = threading.Lock()
+        self._last_retention: Optional[float] = None
+        self.metrics_expired = 0
+
+    def close(self):
+        self.writer.close()
+
+    def _async_session(self):
+        if self.async_engine is None:
+            return database.async_session()
+        if self._async_sessions is None:
+            from sqlalchemy.ext.asyncio import AsyncSession
+
+            self._async_sessions = sessionmaker(
+                bind=self.async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+            )
+        return self._async_sessions()
+
+    @staticmethod
+    def _metric_row(metric_data: Dict) -> Dict:
+        name, value, unit, ts, labels = parse_sample(metric_data)
+        return {
+            "name": name,
+            "value": float(value),
+            "unit": unit,
+            "labels": labels or None,
+            "timestamp": to_datetime(ts) if ts is not None else datetime.now(),
+        }
+
+    def _metric_record(self, row) -> Dict:
+        return _metric_record(row, partitioned=self.partitioned)
+
+    # Retention
+    def _expire(self, db: Session) -> int:
+        cutoff = datetime.now() - timedelta(seconds=data.METRICS_MAX_AGE_SECONDS)
+        if self.partitioned:
+            # Whole days only: the cutoff's own day stays until all of it has expired
+            removed = crud.drop_metric_partitions_before(db, cutoff.date())
+            self._partitions.clear()
+        else:
+            removed = crud.delete_metrics_before(db, cutoff)
+        self.metrics_expired += removed
+        return removed
+
+    def enforce_retention(self) -> int:
+        """Remove metrics older than METRICS_MAX_AGE_SECONDS; returns the rows removed."""
+        with self._session() as db:
+            removed = self._expire(db)
+            db.commit()
+        return removed
+
+    def _retention_due(self) -> bool:
+        """Claim the next retention pass if SQL_RETENTION_INTERVAL_SECONDS have passed."""
+        if not data.METRICS_MAX_AGE_SECONDS:
+            return False
+        with self._retention_lock:
+            if self._last_retention is not None and time.monotonic() - self._last_retention < SQL_RETENTION_INTERVAL_SECONDS:
+                return False
+            self._last_retention = time.monotonic()
+            return True
+
+    # Metrics
+    def _metric_table(self, row: Dict):
+        if not self.partitioned:
+            return models.Metric.__table__
+        day = row["timestamp"].date()
+        if day not in self._partitions:
+            with self._session() as db:
+                crud.create_metric_partition(db, day)
+                db.commit()
+            self._partitions.add(day)
+        return models.metric_partition(day)
+
+    def create_metric(self, metric_data: Dict, wait: bool = True) -> Dict:
+        row = self._metric_row(metric_data)
+        if self._retention_due():
+            self.enforce_retention()
+        row_id = self.writer.submit(self._metric_table(row), row, wait=wait)
+        metric = self._metric_record(models.Metric(id=row_id, **row))
+        if row_id is not None:
+            broker.publish("metrics", "metric.created", metric)
+        return metric
+
+    def _metric_row_chunks(self, samples: Iterable[Dict], first_index: int, max_errors: int, result: Dict):
+        """Yield valid rows SQL_INSERT_CHUNK_SIZE at a time, tallying rejects into result."""
+        rows = []
+        for index, sample in enumerate(samples, first_index):
+            try:
+                rows.append(self._metric_row(sample))
+            except (TypeError, ValueError) as e:
+                result["rejected"] += 1
+                if len(result["errors"]) < max_errors:
+                    result["errors"].append({"index": index, "error": str(e)})
+                continue
+            if len(rows) >= SQL_INSERT_CHUNK_SIZE:
+                yield rows
+                rows = []
+        if rows:
+            yield rows
+
+    def _insert_metrics(self, db: Session, rows: List[Dict]) -> int:
+        if self.partitioned:
+            return crud.insert_partitioned_metrics(db, rows)
+        return crud.insert_metrics(db, rows)
+
+    def create_metrics_batch(self, samples: Iterable[Dict], first_index: int = 0, max_errors: int = 10) -> Dict:
+        if self._retention_due():
+            self.enforce_retention()
+        result = {"accepted": 0, "rejected": 0, "errors": []}
+        with self._session() as db:
+            for rows in self._metric_row_chunks(samples, first_index, max_errors, result):
+                result["accepted"] += self._insert_metrics(db, rows)
+            db.commit()
+        return result
+
+    async def create_metrics_batch_async(
+        self, samples: Iterable[Dict], first_index: int = 0, max_errors: int = 10
+    ) -> Dict:
+        result = {"accepted": 0, "rejected": 0, "errors": []}
+        async with self._async_session() as db:
+            if self._retention_due():
+                await db.run_sync(self._expire)
+                await db.commit()
+            for rows in self._metric_row_chunks(samples, first_index, max_errors, result):
+                result["accepted"] += await db.run_sync(self._insert_metrics, rows)
+            await db.commit()
+        return result
+
+    def _get_metrics(self, db: Session, skip: int = 0, limit: int = 100) -> List[Dict]:
+        if self.partitioned:
+            rows = crud.get_partitioned_metrics_page(db, skip=skip, limit=limit)[0]
+        else:
+            rows = crud.get_metrics(db, skip=skip, limit=limit)
+        return [self._metric_record(row) for row in rows]
+
+    def get_metrics(self, skip: int = 0, limit: int = 100) -> List[Dict]:
+        with self._session() as db:
+            return self._get_metrics(db, skip=skip, limit=limit)
+
+    def _get_recent_metrics(self, db: Session, limit: int = 5) -> List[Dict]:
+        get_rows = crud.get_partitioned_recent_metrics if self.partitioned else crud.get_recent_metrics
+        return [self._metric_record(row) for row in get_rows(db, limit)]
+
+    def get_recent_metrics(self, limit: int = 5) -> List[Dict]:
+        with self._session() as db:
+            return self._get_recent_metrics(db, limit)
+
+    def get_metrics_page(self, cursor=None, skip=0, limit=100, start=None, end=None, name=None, labels=None):
+        if labels:
+            self.require_in_memory("Label filters")
+        get_page = crud.get_partitioned_metrics_page if self.partitioned else crud.get_metrics_page
+        with self._session() as db:
+            rows, next_cursor = get_page(
+                db, cursor=cursor, limit=limit, skip=skip, start=start, end=end, name=name
+            )
+            return [self._metric_record(row) for row in rows], next_cursor
+
+    def get_metric_by_id(self, metric_id: str) -> Optional[Dict]:
+        if self.partitioned:
+            day, row_id = _partitioned_row_id(metric_id)
+        else:
+            row_id = _row_id(metric_id)
+        if row_id is None:
+            return None
+        with self._session() as db:
+            if self.partitioned:
+                row = crud.get_partitioned_metric(db, day, row_id)
+            else:
+                row = crud.get_metric_by_id(db, row_id)
+            return self._metric_record(row) if row is not None else None
+
+    def get_metrics_by_name(self, name: str, labels: Optional[Dict[str, str]] = None) -> List[Dict]:
+        if labels:
+            self.require_in_memory("Label filters")
+        get_rows = crud.get_partitioned_metrics_by_name if self.partitioned else crud.get_metrics_by_name
+        with self._session() as db:
+            return [self._metric_record(row) for row in get_rows(db, name)]
+
+    def _metric_count(self, db: Session) -> int:
+        return crud.count_partitioned_metrics(db) if self.partitioned else crud.count_metrics(db)
+
+    def metric_count(self) -> int:
+        with self._session() as db:
+            return self._metric_count(db)
+
+    # Alerts
+    def create_alert(self, alert_data: Dict) -> Dict:
+        row = {
+            "title": alert_data["title"],
+            "message": alert_data["message"],
+            "severity": alert_data["severity"],
+            "source": alert_data.get("source"),
+            "is_active": True,
+            "created_at": datetime.now(),
+            "resolved_at": None,
+        }
+        row_id = self.writer.submit(models.Alert.__table__, row)
+        alert = _alert_record(models.Alert(id=row_id, **row))
+        broker.publish("alerts", "alert.created", alert)
+        return alert
+
+    def get_alerts(self, skip: int = 0, limit: int = 100, active_only: bool = False) -> List[Dict]:
+        with self._session() as db:
+            return [_alert_record(row) for row in crud.get_alerts(db, skip=skip, limit=limit, active_only=active_only)]
+
+    def get_alerts_page(self, cursor=None, skip=0, limit=100, active_only=False):
+        with self._session() as db:
+            rows, next_cursor = crud.get_alerts_page(
+                db, cursor=cursor, limit=limit, active_only=active_only, skip=skip
+            )
+            return [_alert_record(row) for row in rows], next_cursor
+
+    def get_alert_by_id(self, alert_id: str) -> Optional[Dict]:
+        row_id = _row_id(alert_id)
+        if row_id is None:
+            return None
+        with self._session() as db:
+            row = crud.get_alert_by_id(db, row_id)
+            return _alert_record(row) if row is not None else None
+
+    def update_alert(self, alert_id: str, update_data: Dict) -> Optional[Dict]:
+        row_id = _row_id(alert_id)
+        if row_id is None:
+            return None
+        with self._session() as db:
+            row = crud.update_alert_fields(db, row_id, update_data)
+            if row is None:
+                return None
+            db.commit()
+            alert = _alert_record(row)
+        broker.publish("alerts", "alert.updated", alert)
+        return alert
+
+    def alert_counts(self) -> Dict[str, int]:
+        with self._session() as db:
+            return self._alert_counts(db)
+
+    @staticmethod
+    def _alert_counts(db: Session) -> Dict[str, int]:
+        return {
+            "total": crud.count_alerts(db),
+            "active": crud.count_alerts(db, active_only=True),
+        }
+
+    def _dashboard_summary(self, db: Session, recent: int) -> Dict:
+        return _dashboard_summary(
+            self._get_recent_metrics(db, limit=recent),
+            [_alert_record(row) for row in crud.get_alerts(db, limit=recent, active_only=True)],
+            self._alert_counts(db),
+            self._metric_count(db),
+        )
+
+    async def dashboard_summary(self, recent: int = 5) -> Dict:
+        async with self._async_session() as db:
+            return await db.run_sync(self._dashboard_summary, recent)
+
+
+BACKENDS = {"memory": MemoryStorage, "sql": SQLStorage}
+
+
+def create_storage(kind: str = STORAGE_BACKEND, **kwargs) -> Storage:
+    if kind not in BACKENDS:
+        raise ValueError(f"Unknown STORAGE_BACKEND '{kind}'; expected one of: {', '.join(BACKENDS)}")
+    return BACKENDS[kind](**kwargs)
+
+
+backend = create_storage()
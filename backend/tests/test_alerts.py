@@ -0,0 +1,201 @@
+import pytest
+
+from alert_rules import RuleEngine
+import data
+
+
+def test_update_rejects_id_change(monkeypatch):
+    alert = data.create_alert({"title": "id change", "message": "m", "severity": "info"})
+    with pytest.raises(ValueError):
+        data.update_alert(alert["id"], {"id": "renamed", "is_active": False})
+    assert data.get_alert_by_id(alert["id"]) is alert
+    assert data.get_alert_by_id("renamed") is None
+    assert alert["is_active"]
+
+    # Resolving (with the unchanged id echoed back) still compacts cleanly
+    data.update_alert(alert["id"], {"id": alert["id"], "is_active": False})
+    monkeypatch.setattr(data, "ALERTS_RESOLVED_TTL_SECONDS", -1)
+    data.compact_alerts()
+    assert data.get_alert_by_id(alert["id"]) is None
+
+
+def _active_pages(limit):
+    pages, cursor = [], None
+    while True:
+        page, cursor = data.get_alerts_page(cursor=cursor, limit=limit, active_only=True)
+        pages.append([alert["id"] for alert in page])
+        if cursor is None:
+            return pages
+
+
+def test_active_pages_follow_creation_order_after_reactivation():
+    a, b, c = (data.create_alert({"title": f"paging {name}", "message": "m", "severity": "info"})
+               for name in "abc")
+    data.update_alert(b["id"], {"is_active": False})
+    data.update_alert(b["id"], {"is_active": True})
+
+    expected = [alert["id"] for alert in sorted(data.active_alerts.values(),
+                                                 key=lambda alert: (alert["created_at"], alert["id"]))]
+    assert [alert_id for page in _active_pages(2) for alert_id in page] == expected
+    assert expected.index(a["id"]) < expected.index(b["id"]) < expected.index(c["id"])
+    assert [alert["id"] for alert in data.get_alerts(limit=len(expected), active_only=True)] == expected
+
+
+def test_update_rejects_created_at_change():
+    alert = data.create_alert({"title": "created_at change", "message": "m", "severity": "info"})
+    with pytest.raises(ValueError):
+        data.update_alert(alert["id"], {"created_at": "2000-01-01T00:00:00"})
+
+
+def test_retitled_alert_moves_to_its_new_group():
+    a = {"title": "regroup A", "message": "m", "severity": "warning"}
+    b = {"title": "regroup B", "message": "m", "severity": "warning"}
+    alert = data.create_alert(a)
+    old_fingerprint = alert["fingerprint"]
+    data.update_alert(alert["id"], {"title": b["title"]})
+
+    # Firing B dedups into the retitled alert instead of failing
+    assert data.create_alert(b) is alert
+    assert alert["count"] == 2
+    group = data.alert_groups[alert["fingerprint"]]
+    assert (group["alerts"], group["firings"], group["active_alert_id"]) == (1, 2, alert["id"])
+    assert old_fingerprint not in data.alert_groups
+
+    # Firing A again opens a new alert in a fresh A group
+    reopened = data.create_alert(a)
+    assert reopened is not alert
+    assert data.alert_groups[old_fingerprint]["active_alert_id"] == reopened["id"]
+
+
+def test_compaction_drops_alerts_from_their_groups(monkeypatch):
+    kept = {"title": "compact kept", "message": "m", "severity": "warning"}
+    gone = {"title": "compact gone", "message": "m", "severity": "warning"}
+    first = data.create_alert(kept)
+    data.update_alert(first["id"], {"is_active": False})
+    data.update_alert(data.create_alert(gone)["id"], {"is_active": False})
+    monkeypatch.setattr(data, "ALERTS_RESOLVED_TTL_SECONDS", -1)
+    data.compact_alerts()
+
+    second = data.create_alert(kept)
+    data.create_alert(kept)
+    assert data.compact_alerts() == 0
+    group = data.alert_groups[second["fingerprint"]]
+    assert (group["alerts"], group["firings"], group["active_alert_id"]) == (1, 2, second["id"])
+    assert group["first_seen_at"] == second["created_at"]
+    assert data.alert_fingerprint(gone["title"], gone["severity"], None) not in data.alert_groups
+    assert [g["fingerprint"] for g in data.get_alert_groups(limit=10_000)].count(second["fingerprint"]) == 1
+
+
+SECOND = 1_000_000
+
+
+class _Alerts:
+    """fire/resolve callbacks that record what a RuleEngine did."""
+
+    def __init__(self):
+        self.fired, self.resolved = [], []
+
+    def fire(self, alert):
+        self.fired.append(alert)
+        return {"id": f"alert-{len(self.fired)}"}
+
+    def resolve(self, alert_id):
+        self.resolved.append(alert_id)
+
+
+def _engine(**rule):
+    recorded = _Alerts()
+    engine = RuleEngine(recorded.fire, recorded.resolve)
+    engine.add({"id": "cpu-high", "name": "CPU high", "metric": "cpu", "op": ">", "threshold": 80, **rule})
+    return engine, recorded
+
+
+def test_rule_fires_after_for_seconds_resolves_and_refires():
+    engine, recorded = _engine(for_seconds=60)
+    for ts, value in [(0, 90), (30, 95), (59, 90)]:
+        engine.evaluate(0, "cpu", ts * SECOND, value, "%")
+    assert recorded.fired == []
+    engine.evaluate(0, "cpu", 60 * SECOND, 91, "%")
+    assert [alert["title"] for alert in recorded.fired] == ["CPU high"]
+    assert recorded.fired[0]["source"] == "rule:cpu-high"
+    # Still firing: no duplicate alert
+    engine.evaluate(0, "cpu", 90 * SECOND, 99, "%")
+    assert len(recorded.fired) == 1
+
+    engine.evaluate(0, "cpu", 120 * SECOND, 50, "%")
+    assert recorded.resolved == ["alert-1"]
+    engine.evaluate(0, "cpu", 150 * SECOND, 40, "%")
+    assert recorded.resolved == ["alert-1"]
+
+    # The hold period starts over before it fires again
+    engine.evaluate(0, "cpu", 180 * SECOND, 85, "%")
+    assert len(recorded.fired) == 1
+    engine.evaluate(0, "cpu", 240 * SECOND, 85, "%")
+    assert len(recorded.fired) == 2
+
+
+def test_rule_series_alert_separately():
+    engine, recorded = _engine()
+    engine.evaluate(0, "cpu", 0, 90, "%", {"host": "a"})
+    engine.evaluate(1, "cpu", 0, 90, "%", {"host": "b"})
+    engine.evaluate(0, "cpu", SECOND, 10, "%", {"host": "a"})
+    assert [alert["source"] for alert in recorded.fired] == ["rule:cpu-high{host=a}", "rule:cpu-high{host=b}"]
+    assert recorded.resolved == ["alert-1"]
+
+
+def test_rate_rule():
+    engine, recorded = _engine(type="rate", threshold=10)
+    engine.evaluate(0, "cpu", 0, 0, "%")
+    engine.evaluate(0, "cpu", 10 * SECOND, 50, "%")
+    assert recorded.fired == []
+    engine.evaluate(0, "cpu", 11 * SECOND, 100, "%")
+    assert len(recorded.fired) == 1
+
+
+@pytest.mark.parametrize("change", ["delete", "replace"])
+def test_removing_a_rule_resolves_its_open_alerts(change):
+    engine, recorded = _engine()
+    engine.evaluate(0, "cpu", 0, 90, "%", {"host": "a"})
+    engine.evaluate(1, "cpu", 0, 90, "%", {"host": "b"})
+    engine.evaluate(1, "cpu", SECOND, 10, "%", {"host": "b"})
+    assert recorded.resolved == ["alert-2"]
+    if change == "delete":
+        assert engine.remove("cpu-high")
+        assert engine.get("cpu-high") is None
+    else:
+        engine.add({"id": "cpu-high", "name": "CPU high", "metric": "cpu", "op": ">", "threshold": 95})
+    assert recorded.resolved == ["alert-2", "alert-1"]
+
+
+def test_deleted_rule_alert_is_resolved_in_the_store():
+    rule = data.create_alert_rule({"name": "rule delete", "metric": "rule_delete_metric", "op": ">", "threshold": 1})
+    data.create_metric({"name": "rule_delete_metric", "value": 5, "unit": "ms"})
+    alert = next(alert for alert in data.alerts if alert["source"] == f"rule:{rule['id']}")
+    assert alert["is_active"]
+    assert data.delete_alert_rule(rule["id"])
+    assert not alert["is_active"] and alert["resolved_at"] is not None
+
+
+def test_search_follows_alert_changes(monkeypatch):
+    alert = data.create_alert({"title": "zqsearch disk", "message": "volume nearly full", "severity": "warning"})
+    other = data.create_alert({"title": "zqsearch network", "message": "packet loss", "severity": "critical"})
+    assert data.search_alerts("zqsearch") == [other, alert]
+    assert data.search_alerts("zqsearch", severity="warning") == [alert]
+
+    # New words are found and the replaced ones no longer match
+    data.update_alert(alert["id"], {"message": "inode table exhausted"})
+    assert data.search_alerts("zqsearch inode") == [alert]
+    assert data.search_alerts("zqsearch volume") == []
+    data.update_alert(alert["id"], {"title": "zqsearch storage"})
+    assert data.search_alerts("zqsearch disk") == []
+    assert data.search_alerts("storage exhausted zqsearch") == [alert]
+
+    # A message change from a repeat firing is indexed too
+    data.create_alert({"title": "zqsearch network", "message": "link flapping", "severity": "critical"})
+    assert data.search_alerts("zqsearch flapping") == [other]
+
+    data.update_alert(other["id"], {"is_active": False})
+    assert data.search_alerts("zqsearch", active_only=True) == [alert]
+    monkeypatch.setattr(data, "ALERTS_RESOLVED_TTL_SECONDS", -1)
+    data.compact_alerts()
+    assert data.search_alerts("zqsearch") == [alert]
@@ -0,0 +1,219 @@
+import io
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from csv_profile import profile_chunks, profile_csv, sample_column_stats
+from csv_stream import RecordCounter, iter_chunks, read_sample
+from sketches import HLL_EXACT_LIMIT, HLL_PRECISION, RELATIVE_ACCURACY, HyperLogLog, QuantileSketch
+
+# Three standard errors of a HyperLogLog estimate
+HLL_BOUND = 3 * 1.04 / math.sqrt(1 << HLL_PRECISION)
+
+
+def frame(rows: int = 5000, seed: int = 3) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    values = rng.lognormal(3, 1, rows)
+    values[rng.random(rows) < 0.05] = np.nan
+    return pd.DataFrame({
+        "value": values,
+        "delta": rng.normal(0, 50, rows),
+        "count": rng.integers(-100, 100, rows),
+        "host": rng.choice([f"host-{i}" for i in range(40)] + [None], rows),
+    })
+
+
+def hashes(values) -> np.ndarray:
+    return pd.util.hash_array(np.asarray(values, dtype=np.int64))
+
+
+def split(df: pd.DataFrame, *sizes: int):
+    start = 0
+    for size in sizes:
+        yield df.iloc[start:start + size]
+        start += size
+    yield df.iloc[start:]
+
+
+def test_quantile_sketch_merge_matches_single_sketch():
+    rng = np.random.default_rng(1)
+    values = rng.normal(10, 40, 20_000)
+    whole, left, right = QuantileSketch(), QuantileSketch(), QuantileSketch()
+    whole.add_array(values)
+    left.add_array(values[:7000])
+    right.add_array(values[7000:])
+    left.merge(right)
+    assert left.count == whole.count == len(values)
+    for q in (0.01, 0.25, 0.5, 0.75, 0.99):
+        assert left.quantile(q) == whole.quantile(q)
+        expected = np.quantile(values, q)
+        assert left.quantile(q) == pytest.approx(expected, rel=RELATIVE_ACCURACY, abs=0.05)
+
+
+def test_quantile_sketch_merge_into_empty():
+    values = np.arange(1, 1001, dtype=np.float64)
+    empty, full = QuantileSketch(), QuantileSketch()
+    full.add_array(values)
+    empty.merge(full)
+    assert empty.count == 1000
+    assert empty.quantile(0.5) == pytest.approx(np.median(values), rel=RELATIVE_ACCURACY)
+
+
+@pytest.mark.parametrize("values", [[1, 2, 3, 4], [1, 2, 3], [-3, 0, 0, 7, 100]])
+def test_quantile_sketch_interpolates_like_pandas(values):
+    sketch = QuantileSketch()
+    sketch.add_array(np.asarray(values, dtype=float))
+    for q in (0.25, 0.5, 0.9):
+        assert sketch.quantile(q) == pytest.approx(pd.Series(values).quantile(q), rel=RELATIVE_ACCURACY)
+
+
+def test_hyperloglog_exact_below_limit_across_merge():
+    left, right = HyperLogLog(), HyperLogLog()
+    left.add_hashes(hashes(range(0, 1500)))
+    right.add_hashes(hashes(range(1000, 2500)))
+    left.merge(right)
+    assert left.estimate() == 2500
+
+
+def test_hyperloglog_merge_within_bound():
+    distinct = 20 * HLL_EXACT_LIMIT
+    parts = [HyperLogLog() for _ in range(4)]
+    for i, sketch in enumerate(parts):
+        # Overlapping ranges, so the merge has to drop duplicates
+        sketch.add_hashes(hashes(range(i * distinct // 5, (i + 2) * distinct // 5)))
+    merged = HyperLogLog()
+    for sketch in parts:
+        merged.merge(sketch)
+    assert merged.estimate() == pytest.approx(distinct, rel=HLL_BOUND)
+
+    whole = HyperLogLog()
+    whole.add_hashes(hashes(range(distinct)))
+    assert merged.estimate() == whole.estimate()
+
+
+@pytest.mark.parametrize("sizes", [(), (1,), (1000, 1), (1200, 1200, 1200)])
+def test_profile_chunks_matches_pandas(sizes):
+    df = frame()
+    profile = profile_chunks(split(df, *sizes))
+    stats = profile.column_stats()
+    assert profile.rows == len(df)
+    for name in ("value", "delta", "count"):
+        column = df[name]
+        assert stats[name]["count"] == column.count()
+        assert stats[name]["null_count"] == column.isna().sum()
+        assert stats[name]["min"] == column.min()
+        assert stats[name]["max"] == column.max()
+        assert stats[name]["mean"] == pytest.approx(column.mean(), rel=1e-9)
+        assert stats[name]["std"] == pytest.approx(column.std(), rel=1e-9)
+        assert stats[name]["median"] == pytest.approx(column.median(), rel=RELATIVE_ACCURACY, abs=0.05)
+        assert stats[name]["unique_values"] == column.nunique()
+    assert stats["host"]["count"] == df["host"].count()
+    assert stats["host"]["null_count"] == df["host"].isna().sum()
+    assert stats["host"]["unique_values"] == df["host"].nunique()
+    assert "median" not in stats["host"]
+
+
+def test_profile_merge_matches_single_pass():
+    df = frame()
+    whole = profile_chunks([df])
+    left = profile_chunks(split(df, 500))
+    right = profile_chunks([df.iloc[:0]])
+    left.merge(right)
+    assert left.rows == whole.rows
+    for name, stats in whole.column_stats().items():
+        merged = left.column_stats()[name]
+        assert merged.keys() == stats.keys()
+        for key, value in stats.items():
+            if isinstance(value, float):
+                assert merged[key] == pytest.approx(value, rel=1e-9)
+            else:
+                assert merged[key] == value
+
+
+def test_profile_distinct_past_exact_limit():
+    rng = np.random.default_rng(5)
+    df = pd.DataFrame({"id": rng.integers(0, 10 ** 9, 50_000), "name": [f"n{i % 30_000}" for i in range(50_000)]})
+    stats = profile_chunks(split(df, 10_000, 10_000, 10_000)).column_stats()
+    assert stats["id"]["unique_values"] == pytest.approx(df["id"].nunique(), rel=HLL_BOUND)
+    assert stats["name"]["unique_values"] == pytest.approx(30_000, rel=HLL_BOUND)
+
+
+def test_profile_csv_widens_dtype_across_chunks():
+    text = "a,b\n" + "".join(f"{i},{i}\n" for i in range(10)) + "1.5,x\n"
+    stats = profile_csv(io.BytesIO(text.encode()), chunk_rows=4).column_stats()
+    expected = pd.read_csv(io.StringIO(text))
+    assert stats["a"]["dtype"] == str(expected["a"].dtype)
+    assert stats["a"]["max"] == 9
+    assert stats["a"]["mean"] == pytest.approx(expected["a"].mean())
+    assert stats["b"]["dtype"] == "object"
+    assert "median" not in stats["b"]
+    assert stats["b"]["count"] == 11
+
+
+@pytest.mark.parametrize("text, records", [
+    (b'a,b\n1,"x\ny"\n2,z\n', 3),
+    (b'"say ""hi\n"" twice",b\n"""",c\n', 2),
+    (b'a,b\r\n1,"x\r\ny"\r\n\r\n3,4\r\n', 3),
+    (b'a\n\n\n1\n\n', 2),
+    (b'a,b\n1,"x\ny"', 2),
+    (b'a,b\r\n1,2\r', 2),
+])
+def test_record_counter_matches_for_every_chunk_split(text, records):
+    for size in range(1, len(text) + 1):
+        counter = RecordCounter()
+        ends = []
+        for start in range(0, len(text), size):
+            ends.extend(start + counter.feed(text[start:start + size]))
+        assert counter.finish() == records, size
+        # Every end is a newline outside quotes, closing a non-blank record
+        assert all(text[end:end + 1] == b"\n" and text[:end].count(b'"') % 2 == 0 for end in ends)
+        assert len(ends) == records - (not text.endswith(b"\n"))
+
+
+def csv_bytes(df: pd.DataFrame) -> bytes:
+    return df.to_csv(index=False).encode()
+
+
+def test_read_sample_size_and_seed():
+    contents = csv_bytes(frame(1000))
+    sample, total = read_sample(iter_chunks(io.BytesIO(contents), 4096), rows=100, seed=7)
+    assert (len(sample), total) == (100, 1000)
+    again, _ = read_sample(iter_chunks(io.BytesIO(contents), 4096), rows=100, seed=7)
+    pd.testing.assert_frame_equal(sample, again)
+    everything, total = read_sample(iter_chunks(io.BytesIO(contents), 4096), rows=5000, seed=7)
+    assert (len(everything), total) == (1000, 1000)
+
+
+def test_read_sample_is_uniform():
+    rows, kept, runs = 20, 5, 1000
+    contents = csv_bytes(pd.DataFrame({"row": range(rows)}))
+    picks = np.zeros(rows)
+    for seed in range(runs):
+        sample, _ = read_sample(iter_chunks(io.BytesIO(contents), 7), rows=kept, seed=seed)
+        picks[sample["row"].to_numpy()] += 1
+    # Each row is kept with probability kept / rows; 0.06 is over four standard errors
+    assert np.abs(picks / runs - kept / rows).max() < 0.06
+
+
+def test_sample_intervals_contain_the_full_file_values():
+    df = frame(5000)
+    sample, total = read_sample(iter_chunks(io.BytesIO(csv_bytes(df)), 1 << 16), rows=1000, seed=11)
+    stats = sample_column_stats(sample, total)
+    for name in ("value", "delta", "count"):
+        low, high = stats[name]["mean_ci"]
+        assert low <= df[name].mean() <= high
+    low, high = stats["value"]["null_percentage_ci"]
+    assert low <= df["value"].isna().mean() * 100 <= high
+    low, high = stats["host"]["unique_values_ci"]
+    assert low <= df["host"].nunique() <= high
+
+
+def test_sample_of_every_row_is_exact():
+    df = frame(500)
+    sample, total = read_sample(iter_chunks(io.BytesIO(csv_bytes(df))), rows=500)
+    stats = sample_column_stats(sample, total)["value"]
+    assert stats["null_count"] == df["value"].isna().sum()
+    assert stats["mean"] == pytest.approx(df["value"].mean())
+    assert stats["mean_ci"] == pytest.approx([df["value"].mean()] * 2)
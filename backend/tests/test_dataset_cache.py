@@ -0,0 +1,115 @@
+import json
+import os
+
+from fastapi.testclient import TestClient
+import numpy as np
+import pandas as pd
+import pytest
+
+from csv_workers import CSV_RETRY_AFTER, SpooledUpload, WorkerPoolFull, pool
+from dataset_cache import MANIFEST, DatasetCache, cache as app_cache, ingest_csv
+import main
+
+DATASET = "0" * 32
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return DatasetCache(str(tmp_path / "cache"))
+
+
+def ingest(tmp_path, cache, text: str, chunk_rows: int = 2):
+    path = tmp_path / "upload.csv"
+    path.write_text(text)
+    ingest_csv(str(path), cache.root, DATASET, chunk_rows=chunk_rows)
+    return cache.get(DATASET), pd.read_csv(path)
+
+
+def records(df: pd.DataFrame):
+    df = df.astype(object)
+    return df.where(df.notna(), None).to_dict("records")
+
+
+def test_one_schema_across_row_groups(tmp_path, cache):
+    text = "a,b,c,d\n1,1,007,1\n2,2,008,2.5\n3,x,x,\n4,,010,4\n5,5,011,5\n"
+    dataset, expected = ingest(tmp_path, cache, text)
+    assert dataset.dtypes == ["int64", "string", "string", "float64"]
+    # b and c parsed as numbers in the first row group, but read back as
+    # the text pandas gives for the whole file
+    assert dataset.records(0, 10) == records(expected)
+    assert dataset.records(3, 2, ["c", "b"]) == [{"c": "010", "b": None}, {"c": "011", "b": "5"}]
+    for group in dataset.manifest["row_groups"]:
+        assert group["encodings"] == ["fixed", "string", "string", "fixed"]
+
+
+def test_nothing_pickled(tmp_path, cache):
+    text = "id,flag,name\n" + "".join(f"{i},{i % 2 == 0},{'n' if i else 'é'}{i}\n" for i in range(7))
+    dataset, expected = ingest(tmp_path, cache, text, chunk_rows=3)
+    assert dataset.records(0, 10) == records(expected)
+    for name in os.listdir(dataset.directory):
+        if name.endswith(".npy"):
+            assert np.load(os.path.join(dataset.directory, name), allow_pickle=False).dtype != object
+
+
+def test_pages_span_row_groups(tmp_path, cache):
+    text = "x,y\n" + "".join(f"{i},{i / 4}\n" for i in range(25))
+    dataset, expected = ingest(tmp_path, cache, text, chunk_rows=4)
+    assert dataset.rows == 25
+    assert dataset.records(3, 10) == records(expected.iloc[3:13])
+    assert dataset.records(24, 10) == records(expected.iloc[24:])
+    assert dataset.records(30, 10) == []
+    with pytest.raises(ValueError):
+        dataset.read(0, 10, ["z"])
+
+
+def test_old_format_is_dropped(tmp_path, cache):
+    dataset, _ = ingest(tmp_path, cache, "a\n1\n")
+    path = os.path.join(dataset.directory, MANIFEST)
+    with open(path) as f:
+        manifest = json.load(f)
+    del manifest["format"]
+    with open(path, "w") as f:
+        json.dump(manifest, f)
+    assert cache.get(DATASET) is None
+    assert not os.path.exists(dataset.directory)
+
+
+@pytest.mark.parametrize("route", ["/api/upload-csv", "/api/analyze-csv"])
+def test_full_worker_pool_answers_503(route, monkeypatch):
+    monkeypatch.setattr(pool, "pending", pool.max_pending)
+    monkeypatch.setattr(pool, "rejected", 0)
+    response = TestClient(main.app).post(route, files={"file": ("full.csv", b"a\n1\n", "text/csv")})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(CSV_RETRY_AFTER)
+    assert "busy" in response.json()["detail"]
+    assert pool.stats()["rejected"] == 1
+    assert pool.pending == pool.max_pending
+
+
+def test_detached_job_needs_a_place_in_the_pool(tmp_path, monkeypatch):
+    path = tmp_path / "upload.csv"
+    path.write_text("a\n1\n")
+    monkeypatch.setattr(pool, "pending", pool.max_pending)
+    with pytest.raises(WorkerPoolFull):
+        pool.run_detached(SpooledUpload(str(path), 4, DATASET), ingest_csv, str(tmp_path), DATASET)
+    assert pool.pending == pool.max_pending
+    assert os.listdir(tmp_path) == ["upload.csv"]
+
+
+def test_upload_preview_is_the_same_on_a_miss_and_a_hit(tmp_path, monkeypatch):
+    monkeypatch.setattr(app_cache, "root", str(tmp_path / "cache"))
+    text = "id,ratio,name,sparse,flag,note\n" + "".join(
+        f'{i},{i / 8},host-{i},{"" if i % 3 else i},{"true" if i % 2 else "false"},"{"" if i % 4 else "a, b"}"\n'
+        for i in range(150)
+    )
+    files = {"file": ("same.csv", text.encode(), "text/csv")}
+    with TestClient(main.app) as client:
+        miss = client.post("/api/upload-csv", files=files).json()
+        # Waits for the background parse into the cache
+        assert client.get(f"/api/datasets/{miss['dataset_id']}").status_code == 200
+        hit = client.post("/api/upload-csv", files=files).json()
+    assert hit["dataset_id"] == miss["dataset_id"]
+    assert hit["stats"]["columns"] == miss["stats"]["columns"]
+    assert hit["stats"]["total_rows"] == miss["stats"]["total_rows"] == 150
+    assert hit["data"] == miss["data"]
+    assert miss["data"][1] == {"id": 1, "ratio": 0.125, "name": "host-1", "sparse": None, "flag": True, "note": None}
@@ -0,0 +1,59 @@
+from array import array
+import math
+import random
+
+import pytest
+
+import gorilla
+from timeseries import MAX_TIMESTAMP_US
+
+
+def roundtrip(timestamps, values):
+    ts, vs = array("q", timestamps), array("d", values)
+    decoded_ts, decoded_vs = gorilla.decode(gorilla.encode(ts, vs), len(ts))
+    assert decoded_ts == ts
+    # Compare bit patterns, so NaN payloads and -0.0 must survive too
+    assert decoded_vs.tobytes() == vs.tobytes()
+
+
+def test_empty_chunk():
+    assert gorilla.encode(array("q"), array("d")) == b""
+    assert gorilla.decode(b"", 0) == (array("q"), array("d"))
+
+
+def test_single_sample():
+    roundtrip([1_700_000_000_000_000], [42.5])
+
+
+def test_regular_gauge_compresses():
+    timestamps = [1_700_000_000_000_000 + i * 10_000_000 for i in range(1024)]
+    roundtrip(timestamps, [3.0] * 1024)
+    assert len(gorilla.encode(array("q", timestamps), array("d", [3.0] * 1024))) < 1024 // 2
+
+
+def test_random_values_and_jitter():
+    rng = random.Random(7)
+    timestamps, ts = [], 1_700_000_000_000_000
+    for _ in range(1024):
+        ts += rng.choice([1000, 1000, 1001, 5_000_000, 1 << 40])
+        timestamps.append(ts)
+    roundtrip(timestamps, [rng.uniform(-1e9, 1e9) for _ in timestamps])
+
+
+def test_negative_deltas_and_timestamps():
+    roundtrip([10, 5, -3, -3, -(1 << 58), 1 << 58, 0], [1.0, 2.0, 1.0, 1.0, 0.5, 0.25, 1.0])
+
+
+def test_store_timestamp_range():
+    # Any two timestamps the store accepts fit the widest delta-of-delta class
+    roundtrip([0, MAX_TIMESTAMP_US - 1, 0, MAX_TIMESTAMP_US - 1], [0.0, 1.0, 2.0, 3.0])
+
+
+def test_unencodable_delta_is_rejected():
+    with pytest.raises(ValueError):
+        gorilla.encode(array("q", [-(1 << 62), 1 << 62, -(1 << 62)]), array("d", [0.0, 0.0, 0.0]))
+
+
+@pytest.mark.parametrize("special", [math.nan, math.inf, -math.inf, -0.0, 5e-324, 1.7976931348623157e308])
+def test_special_values(special):
+    roundtrip([0, 1, 2, 3], [1.0, special, special, 1.0])
@@ -0,0 +1,279 @@
+from array import array
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import random
+import sys
+
+from fastapi import HTTPException
+import pytest
+
+import data
+from events import EventBroker
+from routes import metrics as metrics_routes
+from rollups import Rollup
+from timeseries import (
+    CHUNK_SIZE, COMPACT_MIN, Chunk, DecodeCache, MetricStore, RetentionPolicy, decode_cache, parse_sample
+)
+
+
+@pytest.fixture
+def fast_switching():
+    # Switch threads far more often than the default 5ms to surface races
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+def test_concurrent_create_metric(fast_switching):
+    threads, per_thread = 8, 3 * CHUNK_SIZE
+    before = len(data.metrics)
+
+    def ingest(_):
+        return [data.create_metric({"name": "concurrent_ingest", "value": i, "unit": "ms"})["id"]
+                for i in range(per_thread)]
+
+    def read(_):
+        for _ in range(200):
+            page, _ = data.get_metrics_page(name="concurrent_ingest", limit=50)
+            timestamps = [metric["timestamp"] for metric in page]
+            assert timestamps == sorted(timestamps)
+
+    with ThreadPoolExecutor(threads + 1) as pool:
+        reader = pool.submit(read, None)
+        ids = [metric_id for batch in pool.map(ingest, range(threads)) for metric_id in batch]
+        reader.result()
+
+    assert len(set(ids)) == threads * per_thread
+    assert len(data.metrics) - before == threads * per_thread
+    series = data.metrics.series("concurrent_ingest")
+    samples = list(series.scan(series.window()))
+    assert len(samples) == len(series) == threads * per_thread
+    timestamps = [ts for _, ts, _, _ in samples]
+    assert timestamps == sorted(timestamps)
+    assert all(data.get_metric_by_id(metric_id) is not None for metric_id in ids[::97])
+
+
+@pytest.mark.parametrize("value", [float("nan"), float("inf"), float("-inf"), 10 ** 400, "1", True])
+def test_parse_sample_rejects_bad_values(value):
+    with pytest.raises(ValueError):
+        parse_sample({"name": "m", "value": value, "unit": "ms"})
+
+
+@pytest.mark.parametrize("timestamp", [{}, [1], 1e20, 1e303, -1, float("nan"), "yesterday", True])
+def test_parse_sample_rejects_bad_timestamps(timestamp):
+    with pytest.raises(ValueError):
+        parse_sample({"name": "m", "value": 1, "unit": "ms", "timestamp": timestamp})
+
+
+def test_batch_rejects_bad_samples_and_keeps_the_rest():
+    result = data.create_metrics_batch([
+        {"name": "batch_validation", "value": 1, "unit": "ms"},
+        {"name": "batch_validation", "value": float("nan"), "unit": "ms"},
+        {"name": "batch_validation", "value": 2, "unit": "ms", "timestamp": {}},
+        {"name": "batch_validation", "value": 3, "unit": "ms"},
+    ])
+    assert (result["accepted"], result["rejected"]) == (2, 2)
+    assert [metric["value"] for metric in data.get_metrics_by_name("batch_validation")] == [1, 3]
+    data.get_metrics_page(limit=1000)
+
+
+def _derived_state(name):
+    """Rollup buckets, total sketch and anomaly baseline of a series."""
+    sid = data.metrics.series(name).sid
+    rollup = data.metric_rollups.get(sid, "1m")
+    detector = data.anomaly_detectors._detectors[sid]
+    return (
+        [rollup.bucket(pos) for pos in rollup.window()],
+        data.metric_rollups.total_sketch(sid).count,
+        (detector.count, detector.mean, detector.var, detector.slot_counts.tolist(), detector.slot_means.tolist()),
+    )
+
+
+@pytest.mark.parametrize("target", ["bin_key", "score"])
+def test_failed_derived_update_rolls_back_the_sample(monkeypatch, target):
+    name = f"derived_failure_{target}"
+    data.create_metrics_batch([{"name": name, "value": value, "unit": "ms"} for value in range(12)])
+    before_state = _derived_state(name)
+
+    if target == "bin_key":
+        original = data.bin_key
+
+        def fail_on_13(value):
+            if value == 13:
+                raise OverflowError("math range error")
+            return original(value)
+
+        monkeypatch.setattr(data, "bin_key", fail_on_13)
+    else:
+        original = data.anomaly_detectors.score
+
+        def fail_on_13(sid, ts, value):
+            if value == 13:
+                raise OverflowError("math range error")
+            return original(sid, ts, value)
+
+        monkeypatch.setattr(data.anomaly_detectors, "score", fail_on_13)
+
+    before = len(data.metrics)
+    result = data.create_metrics_batch([{"name": name, "value": 13, "unit": "ms"}], first_index=5)
+    assert (result["accepted"], result["rejected"]) == (0, 1)
+    assert result["errors"][0]["index"] == 5
+    with pytest.raises(ValueError):
+        data.create_metric({"name": name, "value": 13, "unit": "ms"})
+    assert len(data.metrics) == before
+    assert len(data.metrics.series(name)) == 12
+    # Neither the rollups nor the anomaly baseline saw the rejected value
+    assert _derived_state(name) == before_state
+
+    data.create_metric({"name": name, "value": 14, "unit": "ms"})
+    assert [metric["value"] for metric in data.get_metrics_by_name(name)] == list(range(12)) + [14]
+    assert _derived_state(name) != before_state
+
+
+def test_iter_positions_matches_a_full_sort():
+    rng = random.Random(3)
+    store = MetricStore(RetentionPolicy(max_samples=1500))
+    # Enough samples per series to seal chunks and evict whole ones
+    clock = [1_000_000] * 10
+    for _ in range(25_000):
+        sid = rng.randrange(10)
+        clock[sid] += rng.choice([0, 1, 7, 1000])
+        store.append(f"m{sid}", rng.random(), "ms", clock[sid], {"shard": str(sid % 3)})
+
+    everything = sorted(
+        (ts, series.sid, pos)
+        for series in store.all_series()
+        for pos, ts, _, _ in series.scan(series.window())
+    )
+    assert list(store.iter_positions()) == everything
+    middle = everything[len(everything) // 2]
+    start, end = everything[100][0], everything[-100][0]
+    assert list(store.iter_positions(after=middle)) == everything[everything.index(middle) + 1:]
+    assert list(store.iter_positions(start, end)) == [key for key in everything if start <= key[0] < end]
+    selected = store.select(labels={"shard": "1"})
+    sids = {series.sid for series in selected}
+    assert list(store.iter_positions(series=selected, after=middle)) == [
+        key for key in everything[everything.index(middle) + 1:] if key[1] in sids
+    ]
+
+
+MINUTE = 60 * 1_000_000
+
+
+def test_rollup_ring_keeps_the_newest_buckets():
+    rollup = Rollup(MINUTE, max_buckets=3)
+    for minute in range(5):
+        for second in (0, 30):
+            rollup.add(minute * MINUTE + second * 1_000_000, float(minute * 10 + second))
+    assert len(rollup) == 3
+    window = rollup.window()
+    assert [rollup.starts[pos] for pos in window] == [2 * MINUTE, 3 * MINUTE, 4 * MINUTE]
+    assert rollup.bucket(window[0]) == {
+        "count": 2, "min": 20.0, "max": 50.0, "sum": 70.0, "avg": 35.0, "last": 50.0, "anomaly_score": 0.0
+    }
+    # Evicted buckets are outside every window, and the tail sketch stays mutable
+    assert len(rollup.window(0, 2 * MINUTE)) == 0
+    assert rollup.sketches[window[-1]].quantile(1.0) == rollup.maxs[window[-1]]
+
+
+def test_rollup_ring_compacts_without_losing_buckets():
+    rollup = Rollup(MINUTE, max_buckets=10)
+    buckets = 3 * COMPACT_MIN
+    for minute in range(buckets):
+        rollup.add(minute * MINUTE, float(minute))
+    # The dead prefix is trimmed once it outgrows the live buckets
+    assert len(rollup.starts) < 2 * COMPACT_MIN
+    assert len(rollup) == 10
+    window = rollup.window()
+    assert [rollup.lasts[pos] for pos in window] == [float(minute) for minute in range(buckets - 10, buckets)]
+    assert len(rollup.sketches) == len(rollup.starts)
+    assert [rollup.seq(pos) for pos in window] == list(range(buckets - 10, buckets))
+
+
+class _StreamedBody:
+    def __init__(self, *chunks: bytes):
+        self.chunks = chunks
+
+    async def stream(self):
+        for chunk in self.chunks:
+            yield chunk
+
+
+def _lines(*chunks: bytes):
+    async def collect():
+        return [line async for line in metrics_routes._ndjson_lines(_StreamedBody(*chunks))]
+    return asyncio.run(collect())
+
+
+def test_ndjson_lines_across_chunks():
+    assert _lines(b'{"a": 1}\n{"b"', b": 2}\n", b"", b'{"c": 3}') == [b'{"a": 1}', b'{"b": 2}', b'{"c": 3}']
+    assert _lines(b"x\n\ny\n") == [b"x", b"", b"y", b""]
+    assert _lines(*[b"z"] * 5 + [b"\n"]) == [b"zzzzz", b""]
+
+
+def test_ndjson_line_over_the_limit_is_refused(monkeypatch):
+    monkeypatch.setattr(metrics_routes, "NDJSON_MAX_LINE_BYTES", 8)
+    assert _lines(b"12345678\n1234", b"5678") == [b"12345678", b"12345678"]
+    for chunks in ([b"123456789\n"], [b"12345", b"6789"], [b"1234\n12345", b"6789\n"]):
+        with pytest.raises(HTTPException) as raised:
+            _lines(*chunks)
+        assert raised.value.status_code == 413
+
+
+def test_slow_subscriber_drops_its_oldest_events():
+    async def run():
+        broker = EventBroker()
+        slow = broker.subscribe(["metrics"], buffer_size=3)
+        other = broker.subscribe(["alerts"], buffer_size=3)
+        for value in range(5):
+            broker.publish("metrics", "metric.created", {"value": value})
+        batch = await slow.next_batch(timeout=0)
+        assert [payload["value"] for _, payload in batch] == [2, 3, 4]
+        assert slow.take_dropped() == 2
+        assert slow.take_dropped() == 0
+        assert await other.next_batch(timeout=0) == []
+
+        # A waiting subscriber is woken by a publish from another thread
+        waiting = asyncio.ensure_future(slow.next_batch(timeout=5))
+        await asyncio.sleep(0)
+        await asyncio.get_running_loop().run_in_executor(
+            None, broker.publish, "metrics", "metric.created", {"value": 5}
+        )
+        assert await waiting == [("metric.created", {"value": 5})]
+        broker.unsubscribe(slow)
+        assert broker.stats()["subscribers"] == 1
+
+    asyncio.run(run())
+
+
+def test_retention_frees_decoded_chunks():
+    store = MetricStore(RetentionPolicy(max_samples=2 * CHUNK_SIZE))
+    for i in range(3 * CHUNK_SIZE):
+        store.append("decode_cache", float(i), "ms", 1_000_000 + i)
+    series = store.series("decode_cache")
+    chunks = list(series.chunks)
+    for pos in (chunk.start for chunk in chunks):
+        series.sample(max(pos, series.head))
+    assert all(chunk in decode_cache for chunk in chunks)
+    cached_bytes = decode_cache.nbytes
+
+    # Retention drops the oldest chunk, and its decoded arrays with it
+    for i in range(3 * CHUNK_SIZE, 4 * CHUNK_SIZE + 1):
+        store.append("decode_cache", float(i), "ms", 1_000_000 + i)
+    assert chunks[0] not in series.chunks and chunks[0] not in decode_cache
+    assert decode_cache.nbytes < cached_bytes
+    assert store.chunk_stats()["decode_cache_bytes"] == decode_cache.nbytes
+
+
+def test_decode_cache_evicts_least_recently_used():
+    cache = DecodeCache(max_chunks=2)
+    chunks = [Chunk(i * 4, array("q", [i, i + 1, i + 2, i + 3]), array("d", [0.5] * 4), array("H", [0] * 4))
+              for i in range(3)]
+    assert cache.get(chunks[0])[0].tolist() == [0, 1, 2, 3]
+    cache.get(chunks[1])
+    cache.get(chunks[0])
+    cache.get(chunks[2])
+    assert chunks[0] in cache and chunks[1] not in cache and chunks[2] in cache
+    cache.discard(chunks)
+    assert len(cache) == 0 and cache.nbytes == 0
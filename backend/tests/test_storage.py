@@ -0,0 +1,152 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import Column, Integer, MetaData, String, Table, create_engine, select
+from sqlalchemy.exc import IntegrityError
+
+import crud
+import data
+from storage import MemoryStorage, SQLStorage, Storage
+from write_buffer import GroupCommitWriter
+
+
+@pytest.fixture(params=["memory", "sql", "sql-daily"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        yield MemoryStorage()
+        return
+    engine = create_engine(f"sqlite:///{tmp_path / 'metrics.db'}")
+    backend = SQLStorage(engine=engine, partitioning="daily" if request.param == "sql-daily" else "none")
+    yield backend
+    backend.close()
+    engine.dispose()
+
+
+@pytest.fixture(params=["none", "daily"])
+def sql_backend(request, tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'metrics.db'}")
+    backend = SQLStorage(engine=engine, partitioning=request.param)
+    yield backend
+    backend.close()
+    engine.dispose()
+
+
+def _days_ago(days: int, hour: int = 12) -> datetime:
+    return datetime.combine(date.today() - timedelta(days=days), datetime.min.time()).replace(hour=hour)
+
+
+def test_recent_metrics_are_newest_first(backend):
+    for value in range(3):
+        backend.create_metric({"name": "recent_metrics", "value": value, "unit": "ms"})
+    recent = backend.get_recent_metrics(limit=2)
+    assert [(metric["name"], metric["value"]) for metric in recent] == [("recent_metrics", 2), ("recent_metrics", 1)]
+
+
+def test_reactivating_an_alert_clears_resolved_at(backend):
+    alert = backend.create_alert({"title": "resolved_at", "message": "m", "severity": "info"})
+    assert backend.update_alert(alert["id"], {"is_active": False})["resolved_at"] is not None
+    reopened = backend.update_alert(alert["id"], {"is_active": True})
+    assert reopened["is_active"] and reopened["resolved_at"] is None
+    assert backend.update_alert(alert["id"], {"is_active": False})["resolved_at"] is not None
+
+
+def test_alert_records_have_the_same_fields(backend):
+    alert = backend.create_alert({"title": "shape", "message": "m", "severity": "warning", "source": "test"})
+    memory = data.create_alert({"title": "shape", "message": "m", "severity": "warning", "source": "test"})
+    assert alert.keys() == memory.keys()
+    assert alert["fingerprint"] == memory["fingerprint"]
+    assert alert["count"] >= 1 and alert["last_seen_at"] >= alert["created_at"]
+    for record in (
+        backend.get_alert_by_id(alert["id"]),
+        backend.update_alert(alert["id"], {"is_active": False}),
+        backend.get_alerts_page(limit=1000)[0][-1],
+    ):
+        assert record.keys() == memory.keys()
+
+
+def test_metric_records_have_the_same_fields(backend):
+    metric = backend.create_metric({"name": "shape", "value": 1, "unit": "ms"})
+    memory = data.create_metric({"name": "shape", "value": 1, "unit": "ms"})
+    assert metric.keys() == memory.keys()
+    assert backend.get_metric_by_id(metric["id"]).keys() == memory.keys()
+
+
+def test_backend_missing_a_method_fails_when_created():
+    class Partial(Storage):
+        name = "partial"
+
+        def create_metric(self, metric_data, wait=True):
+            return {}
+
+    with pytest.raises(TypeError, match="abstract"):
+        Partial()
+
+
+def test_group_commit_failure_only_fails_the_bad_row(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'writes.db'}")
+    table = Table("writes", MetaData(), Column("id", Integer, primary_key=True), Column("name", String, unique=True))
+    table.metadata.create_all(engine)
+    writer = GroupCommitWriter(engine, max_delay_ms=200)
+    names = ["a", "b", "a", "c"]
+    with ThreadPoolExecutor(len(names)) as pool:
+        futures = [pool.submit(writer.submit, table, {"name": name}) for name in names]
+        writer.submit(table, {"name": "d"}, wait=False)
+    outcomes = [future.exception() or future.result() for future in futures]
+    writer.close()
+    assert sum(isinstance(outcome, IntegrityError) for outcome in outcomes) == 1
+    assert all(isinstance(outcome, int) for outcome in outcomes if not isinstance(outcome, IntegrityError))
+    with engine.connect() as conn:
+        assert sorted(conn.execute(select(table.c.name)).scalars()) == ["a", "b", "c", "d"]
+    assert writer.stats()["failed_rows"] == 1
+    engine.dispose()
+
+
+def test_partition_pruning_keeps_days_inside_the_range():
+    days = [date(2024, 1, day) for day in (1, 2, 3, 5)]
+    tables = crud._pruned_partitions(days, datetime(2024, 1, 2, 18), datetime(2024, 1, 5))
+    assert [table.name for table in tables] == ["metrics_20240102", "metrics_20240103"]
+    assert len(list(crud._pruned_partitions(days, None, None))) == len(days)
+
+
+def test_metrics_page_filters_by_name_and_time_across_days(sql_backend):
+    for days in (3, 2, 1, 0):
+        for name in ("cpu", "mem"):
+            sql_backend.create_metric(
+                {"name": name, "value": days, "unit": "%", "timestamp": _days_ago(days, hour=1).isoformat()}
+            )
+    start, end = _days_ago(2, hour=0), _days_ago(0, hour=0)
+    pages, cursor = [], None
+    while True:
+        page, cursor = sql_backend.get_metrics_page(cursor=cursor, limit=1, start=start, end=end, name="cpu")
+        pages.extend(page)
+        if cursor is None:
+            break
+    assert [(metric["name"], metric["value"]) for metric in pages] == [("cpu", 2), ("cpu", 1)]
+    assert sql_backend.get_metrics_page(limit=10, name="cpu", skip=3)[0][0]["value"] == 0
+
+
+def test_name_page_seeks_the_name_timestamp_index(sql_backend):
+    sql_backend.create_metric({"name": "cpu", "value": 1, "unit": "%"})
+    with sql_backend._session() as db:
+        get_page = crud.get_partitioned_metrics_page if sql_backend.partitioned else crud.get_metrics_page
+        statements = []
+        db.connection().connection.set_trace_callback(statements.append)
+        get_page(db, name="cpu", start=_days_ago(1))
+        query = next(statement for statement in statements if "WHERE" in statement and "sqlite_master" not in statement)
+        plan = " ".join(row[-1] for row in db.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {query}"))
+    assert "name_timestamp_id" in plan
+
+
+def test_daily_retention_drops_whole_expired_partitions(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'metrics.db'}")
+    backend = SQLStorage(engine=engine, partitioning="daily")
+    for days in (5, 4, 1, 0):
+        backend.create_metric({"name": "cpu", "value": days, "unit": "%", "timestamp": _days_ago(days).isoformat()})
+    monkeypatch.setattr(data, "METRICS_MAX_AGE_SECONDS", 2 * 24 * 3600)
+    assert backend.enforce_retention() == 2
+    with backend._session() as db:
+        assert crud.metric_partition_days(db) == [date.today() - timedelta(days=1), date.today()]
+    assert sorted(metric["value"] for metric in backend.get_metrics_page(limit=10)[0]) == [0, 1]
+    backend.close()
+    engine.dispose()
@@ -0,0 +1,802 @@
+"""
+Columnar time-series storage for the in-memory metrics store.
+
+Every metric name owns a Series: recent samples sit in parallel typed arrays
+(int64 epoch microsecond timestamps, float64 values and uint16 codes into an
+interned unit table), older ones in Gorilla-compressed chunks. Samples are
+only turned back into dicts when a route asks for them.
+"""
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from collections import OrderedDict
+from datetime import datetime
+import heapq
+import math
+import os
+import re
+import sys
+import threading
+import time
+from itertools import count, islice
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from dotenv import load_dotenv
+
+import gorilla
+
+load_dotenv()
+
+
+def now_us() -> int:
+    """Current wall-clock time as epoch microseconds."""
+    return time.time_ns() // 1000
+
+
+# Sample timestamps must lie in [0, MAX_TIMESTAMP_US): to_iso cannot render
+# anything past the end of year 9999
+MAX_TIMESTAMP_US = 253402214400 * 1_000_000
+
+
+def to_epoch_us(value) -> int:
+    """
+    Convert a datetime, ISO string or epoch seconds into epoch microseconds.
+    Raises ValueError for anything else, including non-finite numbers.
+    """
+    if isinstance(value, bool) or not isinstance(value, (int, float, str, datetime)):
+        raise ValueError("timestamp must be an ISO 8601 string or epoch seconds")
+    if isinstance(value, (int, float)):
+        try:
+            return int(value * 1_000_000)
+        except (OverflowError, ValueError):
+            raise ValueError(f"timestamp out of range: {value!r}")
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    try:
+        seconds = int(value.replace(microsecond=0).timestamp())
+    except (OverflowError, OSError):
+        raise ValueError(f"timestamp out of range: {value.isoformat()}")
+    return seconds * 1_000_000 + value.microsecond
+
+
+def to_datetime(ts_us: int) -> datetime:
+    """Epoch microseconds as a naive local datetime."""
+    seconds, micros = divmod(ts_us, 1_000_000)
+    return datetime.fromtimestamp(seconds).replace(microsecond=micros)
+
+
+def to_iso(ts_us: int) -> str:
+    """Render epoch microseconds the way the API always has (naive local ISO)."""
+    return to_datetime(ts_us).isoformat()
+
+
+# Dead prefix length before Columns.advance() physically trims the arrays
+COMPACT_MIN = 1024
+
+
+class Columns:
+    """
+    Parallel arrays with ring-buffer style eviction from the front.
+
+    Live rows are the physical positions [head, len). Evicting advances head;
+    the dead prefix is only cut off once it outgrows the live rows, so
+    eviction is amortised O(1). base counts rows trimmed so far, which keeps
+    sequence numbers (base + position) stable across compaction.
+    """
+
+    __slots__ = ("head", "base")
+    COLUMNS: Tuple[str, ...] = ()
+
+    def __init__(self):
+        self.head = 0
+        self.base = 0
+
+    def _arrays(self) -> List[array]:
+        return [getattr(self, column) for column in self.COLUMNS]
+
+    def __len__(self) -> int:
+        return len(getattr(self, self.COLUMNS[0])) - self.head
+
+    def seq(self, pos: int) -> int:
+        return self.base + pos
+
+    def position(self, seq: int) -> Optional[int]:
+        pos = seq - self.base
+        if self.head <= pos < len(getattr(self, self.COLUMNS[0])):
+            return pos
+        return None
+
+    def advance(self, count: int):
+        """Evict the oldest count rows."""
+        self.head += count
+        if self.head >= COMPACT_MIN and self.head * 2 >= len(getattr(self, self.COLUMNS[0])):
+            for column in self._arrays():
+                del column[:self.head]
+            self.base += self.head
+            self.head = 0
+
+    def nbytes(self) -> int:
+        return sum(sys.getsizeof(column) for column in self._arrays())
+
+
+class RetentionPolicy:
+    """Maximum age and sample count for a series; None means unbounded."""
+
+    __slots__ = ("max_age", "max_samples")
+
+    def __init__(self, max_age_seconds: Optional[float] = None, max_samples: Optional[int] = None):
+        self.max_age = int(max_age_seconds * 1_000_000) if max_age_seconds else None
+        self.max_samples = max_samples or None
+
+
+# Samples per sealed, compressed chunk
+CHUNK_SIZE = 1024
+# Decoded chunks kept for reads across all series (about 16 KB each). Point
+# lookups on a chunk outside the cache pay for decoding all of it (~1.7 ms)
+DECODE_CACHE_CHUNKS = int(os.getenv("METRICS_DECODE_CACHE_CHUNKS", 2048))
+
+
+class Chunk:
+    """
+    A sealed run of consecutive samples, Gorilla encoded.
+
+    first_ts/last_ts let reads and eviction skip a chunk without decoding it.
+    Units are kept as a single code when the whole run shares one.
+    """
+
+    __slots__ = ("id", "start", "count", "first_ts", "last_ts", "data", "units")
+
+    def __init__(self, start: int, timestamps: array, values: array, units: array):
+        # Key in the decode cache, which must not keep dropped chunks alive
+        self.id = next(_chunk_ids)
+        self.start = start
+        self.count = len(timestamps)
+        self.first_ts = timestamps[0]
+        self.last_ts = timestamps[-1]
+        self.data = gorilla.encode(timestamps, values)
+        self.units = units[0] if units.count(units[0]) == len(units) else units
+
+    @property
+    def stop(self) -> int:
+        return self.start + self.count
+
+    def decode(self) -> Tuple[array, array]:
+        """(timestamps, values) of the chunk, from the shared decode cache."""
+        return decode_cache.get(self)
+
+    def unit_code(self, offset: int) -> int:
+        return self.units if isinstance(self.units, int) else self.units[offset]
+
+    def nbytes(self) -> int:
+        units = 0 if isinstance(self.units, int) else sys.getsizeof(self.units)
+        return sys.getsizeof(self) + sys.getsizeof(self.data) + units
+
+
+_chunk_ids = count()
+
+
+class DecodeCache:
+    """
+    The most recently read decoded chunks across all series, keyed by chunk
+    id. Entries hold only the decoded arrays, and Series.advance discards
+    the chunks retention drops, so their memory is freed with them.
+    """
+
+    def __init__(self, max_chunks: int = DECODE_CACHE_CHUNKS):
+        self.max_chunks = max_chunks
+        self.nbytes = 0
+        self._decoded: "OrderedDict[int, Tuple[array, array]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._decoded)
+
+    def __contains__(self, chunk: Chunk) -> bool:
+        return chunk.id in self._decoded
+
+    @staticmethod
+    def _size(decoded: Tuple[array, array]) -> int:
+        return sys.getsizeof(decoded[0]) + sys.getsizeof(decoded[1])
+
+    def get(self, chunk: Chunk) -> Tuple[array, array]:
+        with self._lock:
+            decoded = self._decoded.get(chunk.id)
+            if decoded is not None:
+                self._decoded.move_to_end(chunk.id)
+                return decoded
+            decoded = self._decoded[chunk.id] = gorilla.decode(chunk.data, chunk.count)
+            self.nbytes += self._size(decoded)
+            while len(self._decoded) > self.max_chunks:
+                self.nbytes -= self._size(self._decoded.popitem(last=False)[1])
+            return decoded
+
+    def discard(self, chunks: List[Chunk]):
+        with self._lock:
+            for chunk in chunks:
+                decoded = self._decoded.pop(chunk.id, None)
+                if decoded is not None:
+                    self.nbytes -= self._size(decoded)
+
+
+decode_cache = DecodeCache()
+
+
+class Series:
+    """
+    Samples of a single metric name.
+
+    New samples go to raw "hot" arrays; once CHUNK_SIZE have accumulated they
+    are sealed into a compressed Chunk. A position is the sample's sequence
+    number within the series, so it stays valid while samples move into
+    chunks or older ones are evicted. Live samples are [head, stop); chunks
+    that fall entirely before head are dropped.
+
+    Writers replace the chunk list and hot arrays instead of mutating them in
+    place, so a reader that captured them keeps a consistent view.
+
+    Timestamps are kept sorted; MetricStore rejects samples older than the tail.
+    """
+
+    __slots__ = (
+        "sid", "name", "labels", "head", "chunks", "chunk_starts", "chunk_first_ts",
+        "hot_start", "timestamps", "values", "units", "evicted", "_head_timestamps"
+    )
+
+    def __init__(self, sid: int, name: str, labels: Optional[Dict[str, str]] = None):
+        self.sid = sid
+        self.name = name
+        # Shared by every sample of the series; treat as read-only
+        self.labels: Dict[str, str] = labels or {}
+        self.head = 0
+        self.chunks: List[Chunk] = []
+        self.chunk_starts = array("q")
+        self.chunk_first_ts = array("q")
+        self.hot_start = 0
+        self.timestamps = array("q")
+        self.values = array("d")
+        self.units = array("H")
+        self.evicted = 0
+        # Decoded timestamps of the chunk holding head, for age eviction
+        self._head_timestamps: Optional[Tuple[Chunk, array]] = None
+
+    def __len__(self) -> int:
+        return self.stop - self.head
+
+    @property
+    def stop(self) -> int:
+        return self.hot_start + len(self.timestamps)
+
+    @property
+    def last_ts(self) -> Optional[int]:
+        if self.timestamps:
+            return self.timestamps[-1]
+        return self.chunks[-1].last_ts if self.chunks else None
+
+    @property
+    def floor_ts(self) -> Optional[int]:
+        """A lower bound on the oldest live timestamp, found without decoding."""
+        if not len(self):
+            return None
+        if self.chunks:
+            return self.chunks[0].first_ts
+        return self.timestamps[max(self.head - self.hot_start, 0)]
+
+    def seq(self, pos: int) -> int:
+        return pos
+
+    def position(self, seq: int) -> Optional[int]:
+        return seq if self.head <= seq < self.stop else None
+
+    # Writes
+    def append(self, ts: int, value: float, unit_code: int) -> int:
+        if len(self.timestamps) >= CHUNK_SIZE:
+            self.seal()
+        self.timestamps.append(ts)
+        self.values.append(value)
+        self.units.append(unit_code)
+        return self.stop - 1
+
+    def discard(self, pos: int):
+        """Remove the sample just appended at pos."""
+        if pos != self.stop - 1 or not self.timestamps:
+            raise ValueError("Only the last appended sample can be discarded")
+        self.timestamps.pop()
+        self.values.pop()
+        self.units.pop()
+
+    def seal(self):
+        """Compress the live part of the hot arrays into a chunk."""
+        start = max(self.head, self.hot_start)
+        offset = start - self.hot_start
+        if offset < len(self.timestamps):
+            chunk = Chunk(start, self.timestamps[offset:], self.values[offset:], self.units[offset:])
+            self.chunks = self.chunks + [chunk]
+            self.chunk_starts.append(chunk.start)
+            self.chunk_first_ts.append(chunk.first_ts)
+        self.hot_start = self.stop
+        self.timestamps = array("q")
+        self.values = array("d")
+        self.units = array("H")
+
+    def advance(self, count: int):
+        """Evict the oldest count samples."""
+        self.head += count
+        dead = 0
+        while dead < len(self.chunks) and self.chunks[dead].stop <= self.head:
+            dead += 1
+        if dead:
+            decode_cache.discard(self.chunks[:dead])
+            self.chunks = self.chunks[dead:]
+            del self.chunk_starts[:dead]
+            del self.chunk_first_ts[:dead]
+            self._head_timestamps = None
+
+    def _first_at_or_after(self, cutoff: int) -> int:
+        """Position of the first live sample with timestamp >= cutoff."""
+        chunks = self.chunks
+        for chunk in chunks:
+            if chunk.last_ts >= cutoff:
+                break
+        else:
+            lo = max(self.head - self.hot_start, 0)
+            return self.hot_start + bisect_left(self.timestamps, cutoff, lo)
+        if chunk.first_ts >= cutoff:
+            return max(self.head, chunk.start)
+        cached = self._head_timestamps
+        if cached is None or cached[0] is not chunk:
+            # Kept per series: the shared cache would thrash with many series ingesting
+            cached = self._head_timestamps = (chunk, gorilla.decode(chunk.data, chunk.count)[0])
+        lo = max(self.head - chunk.start, 0)
+        return chunk.start + bisect_left(cached[1], cutoff, lo)
+
+    def make_room(self, ts: int, policy: RetentionPolicy) -> Tuple[int, int]:
+        """
+        Evict what the policy no longer allows once a sample at ts lands.
+
+        Returns (evicted by age, evicted by count).
+        """
+        by_age = by_count = 0
+        if policy.max_age is not None and len(self):
+            by_age = self._first_at_or_after(ts - policy.max_age) - self.head
+            if by_age:
+                self.advance(by_age)
+        if policy.max_samples is not None and len(self) >= policy.max_samples:
+            by_count = len(self) - policy.max_samples + 1
+            self.advance(by_count)
+        self.evicted += by_age + by_count
+        return by_age, by_count
+
+    # Reads
+    def sample(self, pos: int) -> Tuple[int, float, int]:
+        """(timestamp, value, unit code) at a position."""
+        offset = pos - self.hot_start
+        if offset >= 0:
+            return self.timestamps[offset], self.values[offset], self.units[offset]
+        chunk = self.chunks[bisect_right(self.chunk_starts, pos) - 1]
+        offset = pos - chunk.start
+        timestamps, values = chunk.decode()
+        return timestamps[offset], values[offset], chunk.unit_code(offset)
+
+    def timestamp(self, pos: int) -> int:
+        return self.sample(pos)[0]
+
+    def scan(self, positions: range) -> Iterator[Tuple[int, int, float, int]]:
+        """
+        Yield (position, timestamp, value, unit code) for a range of
+        positions, decoding one chunk at a time.
+        """
+        lo, hi = positions.start, positions.stop
+        chunks, chunk_starts, hot_start = self.chunks, self.chunk_starts, self.hot_start
+        timestamps, values, units = self.timestamps, self.values, self.units
+        if lo < hot_start and chunks:
+            for chunk in chunks[max(bisect_right(chunk_starts, lo) - 1, 0):]:
+                if chunk.start >= hi:
+                    break
+                chunk_ts, chunk_values = chunk.decode()
+                start = chunk.start
+                for offset in range(max(lo - start, 0), min(hi - start, chunk.count)):
+                    yield start + offset, chunk_ts[offset], chunk_values[offset], chunk.unit_code(offset)
+        for pos in range(max(lo, hot_start), min(hi, hot_start + len(timestamps))):
+            offset = pos - hot_start
+            yield pos, timestamps[offset], values[offset], units[offset]
+
+    def _bisect(self, ts: int, find) -> int:
+        timestamps = self.timestamps
+        index = find(timestamps, ts)
+        if index or not self.chunks:
+            return max(self.head, self.hot_start + index)
+        # The answer is in a sealed chunk; only the one straddling ts is decoded
+        k = find(self.chunk_first_ts, ts) - 1
+        if k < 0:
+            return max(self.head, self.chunks[0].start)
+        chunk = self.chunks[k]
+        return max(self.head, chunk.start + find(chunk.decode()[0], ts))
+
+    def bisect_left(self, ts: int) -> int:
+        """First live position with timestamp >= ts."""
+        return self._bisect(ts, bisect_left)
+
+    def bisect_right(self, ts: int) -> int:
+        """First live position with timestamp > ts."""
+        return self._bisect(ts, bisect_right)
+
+    def window(self, start: Optional[int] = None, end: Optional[int] = None) -> range:
+        """
+        Positions with start <= timestamp < end, found by binary search.
+
+        Returns a range of positions rather than a copy of the samples.
+        """
+        lo = self.head if start is None else self.bisect_left(start)
+        hi = self.stop if end is None else self.bisect_left(end)
+        return range(lo, max(lo, hi))
+
+    def nbytes(self) -> int:
+        return (
+            sum(chunk.nbytes() for chunk in self.chunks)
+            + sum(sys.getsizeof(column) for column in (
+                self.chunks, self.chunk_starts, self.chunk_first_ts, self.timestamps, self.values, self.units
+            ))
+        )
+
+    def chunk_stats(self) -> Tuple[int, int, int]:
+        """(sealed chunks, samples in them, encoded bytes)."""
+        chunks = self.chunks
+        return len(chunks), sum(chunk.count for chunk in chunks), sum(len(chunk.data) for chunk in chunks)
+
+
+# Label names follow the Prometheus convention; "__" prefixes are reserved
+_LABEL_NAME = re.compile(r"[a-zA-Z_][a-zA-Z0-9_]*")
+NAME_LABEL = "__name__"
+
+SeriesKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+def parse_labels(labels) -> Dict[str, str]:
+    """Validate a label set. Raises ValueError describing the problem."""
+    if labels is None:
+        return {}
+    if not isinstance(labels, dict):
+        raise ValueError("'labels' must be an object")
+    for key, value in labels.items():
+        if not isinstance(key, str) or not _LABEL_NAME.fullmatch(key) or key.startswith("__"):
+            raise ValueError(f"Invalid label name: {key!r}")
+        if not isinstance(value, str):
+            raise ValueError(f"Label '{key}' must be a string")
+    return labels
+
+
+def parse_sample(sample) -> Tuple[str, float, str, Optional[int], Dict[str, str]]:
+    """
+    Validate an incoming metric dict into (name, value, unit, epoch us or
+    None, labels). Raises ValueError describing the problem.
+    """
+    if not isinstance(sample, dict):
+        raise ValueError("Sample must be an object")
+    name, value, unit = sample.get("name"), sample.get("value"), sample.get("unit")
+    if not isinstance(name, str) or not name:
+        raise ValueError("'name' must be a non-empty string")
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError("'value' must be a number")
+    try:
+        finite = math.isfinite(value)
+    except OverflowError:
+        finite = False
+    if not finite:
+        raise ValueError("'value' must be a finite number")
+    if not isinstance(unit, str):
+        raise ValueError("'unit' must be a string")
+    timestamp = sample.get("timestamp")
+    ts = None
+    if timestamp is not None:
+        ts = to_epoch_us(timestamp)
+        if not 0 <= ts < MAX_TIMESTAMP_US:
+            raise ValueError("'timestamp' must be between 1970 and 9999")
+    labels = parse_labels(sample.get("labels"))
+    return name, value, unit, ts, labels
+
+
+class MetricStore:
+    """
+    Collection of Series keyed by metric name and label set.
+
+    Metric IDs are "<series id>-<sequence>", so a lookup by ID goes straight
+    to the owning column instead of scanning every sample. Each append first
+    evicts whatever the series' retention policy no longer allows.
+
+    Every label pair (and the name, as __name__) maps to the set of series
+    ids carrying it, so selecting series intersects those sets instead of
+    checking every series. max_series caps how many series may exist, so a
+    label with unbounded values cannot exhaust memory.
+
+    Routes run in FastAPI's threadpool, so appends (including sealing) and
+    reads hold lock. It is re-entrant, so callers can also hold it across an
+    append and the updates derived from it.
+    """
+
+    def __init__(self, retention: Optional[RetentionPolicy] = None, max_series: Optional[int] = None):
+        self._series: Dict[SeriesKey, Series] = {}
+        self._postings: Dict[Tuple[str, str], Set[int]] = {}
+        self._by_sid: List[Series] = []
+        self._units: List[str] = []
+        self._unit_codes: Dict[str, int] = {}
+        self._count = 0
+        self.default_retention = retention or RetentionPolicy()
+        self.retention: Dict[str, RetentionPolicy] = {}
+        self.evicted_by_age = 0
+        self.evicted_by_count = 0
+        self.max_series = max_series or None
+        self.rejected_series = 0
+        self.lock = threading.RLock()
+        # (floor_ts, sid) of every series in sorted order, and the floor each
+        # series is filed under. A floor only has to be a lower bound, so it
+        # is refreshed after evictions rather than tracked exactly.
+        self._floors: List[Tuple[int, int]] = []
+        self._floor_of: List[int] = []
+
+    def __len__(self) -> int:
+        return self._count
+
+    # Interned units
+    def unit_code(self, unit: str) -> int:
+        code = self._unit_codes.get(unit)
+        if code is None:
+            code = len(self._units)
+            unit = sys.intern(unit)
+            self._units.append(unit)
+            self._unit_codes[unit] = code
+        return code
+
+    # Series access
+    @staticmethod
+    def _key(name: str, labels: Optional[Dict[str, str]]) -> SeriesKey:
+        return name, tuple(sorted(labels.items())) if labels else ()
+
+    def series(self, name: str, labels: Optional[Dict[str, str]] = None) -> Optional[Series]:
+        """The series with exactly this name and label set."""
+        return self._series.get(self._key(name, labels))
+
+    def all_series(self) -> List[Series]:
+        return self._by_sid
+
+    def select(self, name: Optional[str] = None, labels: Optional[Dict[str, str]] = None) -> List[Series]:
+        """Series with the given name (if any) carrying every given label, by sid."""
+        matchers = list(labels.items()) if labels else []
+        if name is not None:
+            matchers.append((NAME_LABEL, name))
+        if not matchers:
+            return self._by_sid
+        postings = []
+        for matcher in matchers:
+            matcher_postings = self._postings.get(matcher)
+            if matcher_postings is None:
+                return []
+            postings.append(matcher_postings)
+        # Intersecting smallest-first keeps every step bounded by the rarest label
+        postings.sort(key=len)
+        return [self._by_sid[sid] for sid in sorted(postings[0].intersection(*postings[1:]))]
+
+    def _get_or_create(self, name: str, labels: Optional[Dict[str, str]]) -> Series:
+        key = self._key(name, labels)
+        series = self._series.get(key)
+        if series is None:
+            if self.max_series is not None and len(self._by_sid) >= self.max_series:
+                self.rejected_series += 1
+                raise ValueError(f"Series limit ({self.max_series}) reached; not creating a new series for '{name}'")
+            labels = {sys.intern(k): sys.intern(v) for k, v in key[1]}
+            series = Series(len(self._by_sid), sys.intern(name), labels)
+            self._series[key] = series
+            self._by_sid.append(series)
+            for pair in [(NAME_LABEL, series.name), *labels.items()]:
+                self._postings.setdefault(pair, set()).add(series.sid)
+        return series
+
+    # Writes
+    def append(self, name: str, value: float, unit: str, ts: Optional[int] = None,
+               labels: Optional[Dict[str, str]] = None) -> Tuple[Series, int]:
+        with self.lock:
+            series = self._get_or_create(name, labels)
+            if ts is None:
+                ts = now_us()
+                # Never let clock skew push a fresh sample behind the tail
+                if len(series) and ts < series.last_ts:
+                    ts = series.last_ts
+            elif len(series) and ts < series.last_ts:
+                raise ValueError(f"Out-of-order sample for metric '{series.name}'")
+
+            by_age, by_count = series.make_room(ts, self.retention.get(series.name, self.default_retention))
+            self.evicted_by_age += by_age
+            self.evicted_by_count += by_count
+            self._count -= by_age + by_count
+
+            pos = series.append(ts, float(value), self.unit_code(unit))
+            self._count += 1
+            if by_age or by_count or series.sid == len(self._floor_of):
+                self._refile(series)
+            return series, pos
+
+    def _refile(self, series: Series):
+        """File a new series under its floor, or move it after evictions."""
+        floor, sid = series.floor_ts, series.sid
+        if sid == len(self._floor_of):
+            self._floor_of.append(floor)
+        elif floor is None or floor == self._floor_of[sid]:
+            return
+        else:
+            del self._floors[bisect_left(self._floors, (self._floor_of[sid], sid))]
+            self._floor_of[sid] = floor
+        insort(self._floors, (floor, sid))
+
+    def discard(self, series: Series, pos: int):
+        """Undo the append that returned (series, pos); samples it evicted stay evicted."""
+        with self.lock:
+            series.discard(pos)
+            self._count -= 1
+
+    # Reads
+    def unit(self, series: Series, pos: int) -> str:
+        with self.lock:
+            return self._units[series.sample(pos)[2]]
+
+    def record(self, series: Series, pos: int) -> Dict:
+        with self.lock:
+            ts, value, unit_code = series.sample(pos)
+        return {
+            "id": f"{series.sid}-{series.seq(pos)}",
+            "name": series.name,
+            "value": value,
+            "unit": self._units[unit_code],
+            "labels": series.labels.copy(),
+            "timestamp": to_iso(ts),
+        }
+
+    def records(self, series: Series, positions: range) -> List[Dict]:
+        """Records for a range of positions, decoding each chunk once."""
+        sid, name, labels, units = series.sid, series.name, series.labels, self._units
+        with self.lock:
+            samples = list(series.scan(positions))
+        return [
+            {
+                "id": f"{sid}-{pos}",
+                "name": name,
+                "value": value,
+                "unit": units[code],
+                "labels": labels.copy(),
+                "timestamp": to_iso(ts),
+            }
+            for pos, ts, value, code in samples
+        ]
+
+    @staticmethod
+    def parse_id(metric_id: str) -> Optional[Tuple[int, int]]:
+        """Split a metric ID into (series id, sequence)."""
+        try:
+            sid, seq = (int(part) for part in metric_id.split("-", 1))
+        except ValueError:
+            return None
+        return sid, seq
+
+    def locate(self, metric_id: str) -> Optional[Tuple[Series, int]]:
+        parsed = self.parse_id(metric_id)
+        if parsed is None or not 0 <= parsed[0] < len(self._by_sid):
+            return None
+        series = self._by_sid[parsed[0]]
+        with self.lock:
+            pos = series.position(parsed[1])
+        if pos is None:
+            return None
+        return series, pos
+
+    @staticmethod
+    def _window(series: Series, start: Optional[int], end: Optional[int],
+                after: Optional[Tuple[int, int, int]]) -> range:
+        """
+        Series window, narrowed to positions sorting after the key
+        (timestamp, sid, sequence) when one is given.
+        """
+        window = series.window(start, end)
+        if after is None:
+            return window
+        ts, sid, seq = after
+        if series.sid < sid:
+            lo = series.bisect_right(ts)
+        elif series.sid > sid:
+            lo = series.bisect_left(ts)
+        else:
+            lo = max(series.bisect_left(ts), seq + 1)
+        return range(max(lo, window.start), window.stop)
+
+    def iter_positions(self, start: Optional[int] = None, end: Optional[int] = None,
+                       series: Optional[List[Series]] = None,
+                       after: Optional[Tuple[int, int, int]] = None) -> Iterator[Tuple[int, int, int]]:
+        """
+        Yield (timestamp, sid, position) across series in time order.
+
+        Series join the merge in order of a lower bound on their first
+        timestamp and are only read once the merge reaches it, so a page
+        reads the series it returns rather than every series. From the start
+        of the store the bounds come presorted, so the first page does not
+        even visit the other series; with a selection, a range start or a
+        cursor they are computed per series (Series.floor_ts). Callers hold
+        lock while consuming the iterator.
+        """
+        def walk(series: Series) -> Iterator[Tuple[int, int]]:
+            for pos, ts, _, _ in series.scan(self._window(series, start, end, after)):
+                yield ts, pos
+
+        floor = start
+        if after is not None and (floor is None or after[0] > floor):
+            floor = after[0]
+        if series is None and floor is None:
+            pending = iter(self._floors)
+        else:
+            bounds = []
+            for s in self._by_sid if series is None else series:
+                bound = s.floor_ts
+                if bound is None or (floor is not None and s.last_ts < floor):
+                    continue
+                bounds.append((bound if floor is None else max(bound, floor), s.sid))
+            heapq.heapify(bounds)
+            pending = (heapq.heappop(bounds) for _ in range(len(bounds)))
+
+        # (timestamp, sid, position, walk) of each opened series' next sample
+        heap = []
+        upcoming = next(pending, None)
+        while True:
+            if upcoming is not None and (not heap or upcoming < heap[0][:2]):
+                if end is not None and upcoming[0] >= end:
+                    upcoming = None
+                    continue
+                sid = upcoming[1]
+                samples = walk(self._by_sid[sid])
+                first = next(samples, None)
+                if first is not None:
+                    heapq.heappush(heap, (first[0], sid, first[1], samples))
+                upcoming = next(pending, None)
+                continue
+            if not heap:
+                return
+            ts, sid, pos, samples = heap[0]
+            yield ts, sid, pos
+            following = next(samples, None)
+            if following is None:
+                heapq.heappop(heap)
+            else:
+                heapq.heapreplace(heap, (following[0], sid, following[1], samples))
+
+    def page_positions(self, skip: int, limit: int, start: Optional[int] = None,
+                       end: Optional[int] = None, series: Optional[List[Series]] = None,
+                       after: Optional[Tuple[int, int, int]] = None) -> List[Tuple[Series, int]]:
+        with self.lock:
+            if series is not None and len(series) == 1:
+                # A single series can jump straight to the requested slice
+                only = series[0]
+                return [(only, pos) for pos in self._window(only, start, end, after)[skip:skip + limit]]
+
+            return [
+                (self._by_sid[sid], pos)
+                for _, sid, pos in islice(self.iter_positions(start, end, series, after), skip, skip + limit)
+            ]
+
+    def page(self, skip: int, limit: int, start: Optional[int] = None,
+             end: Optional[int] = None, name: Optional[str] = None) -> List[Dict]:
+        selected = self.select(name) if name is not None else None
+        with self.lock:
+            return [self.record(series, pos) for series, pos in self.page_positions(skip, limit, start, end, selected)]
+
+    def nbytes(self) -> int:
+        with self.lock:
+            return sum(series.nbytes() for series in self._by_sid)
+
+    def chunk_stats(self) -> Dict:
+        chunks = samples = encoded = 0
+        with self.lock:
+            for series in self._by_sid:
+                stats = series.chunk_stats()
+                chunks, samples, encoded = chunks + stats[0], samples + stats[1], encoded + stats[2]
+        return {
+            "chunks": chunks,
+            "compressed_samples": samples,
+            "compressed_bytes": encoded,
+            "bits_per_sample": round(encoded * 8 / samples, 2) if samples else None,
+            "decode_cache_chunks": len(decode_cache),
+            "decode_cache_bytes": decode_cache.nbytes,
+        }
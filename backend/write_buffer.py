@@ -0,0 +1,184 @@
+"""
+Group commit for SQL inserts.
+
+A single background thread owns the write path. Request threads queue rows
+and the writer collects everything that arrives within SQL_WRITE_MAX_DELAY_MS
+of the first row (or until SQL_WRITE_BATCH_SIZE rows) and commits it as one
+transaction, so concurrent requests share one commit and one fsync.
+
+Callers choose per row:
+
+- wait=True blocks until the transaction has committed and returns the new
+  row's primary key (or raises the error that rolled it back);
+- wait=False returns as soon as the row is queued; a failed row is logged
+  and counted, not reported.
+
+Each table's rows go out as one executemany. Rows that must return a key
+use executemany with RETURNING where the dialect reports keys that way
+(psycopg2 in its "values" executemany modes) and one statement each
+otherwise, still inside the shared transaction.
+
+If the batch transaction fails, it is replayed one row per transaction, so
+a row that breaks a constraint fails only its own caller.
+"""
+from concurrent.futures import Future
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+SQL_WRITE_BATCH_SIZE = int(os.getenv("SQL_WRITE_BATCH_SIZE", 500))
+SQL_WRITE_MAX_DELAY_MS = float(os.getenv("SQL_WRITE_MAX_DELAY_MS", 2))
+# Rows queued before submit() blocks the caller
+SQL_WRITE_QUEUE_SIZE = int(os.getenv("SQL_WRITE_QUEUE_SIZE", 10000))
+
+_STOP = object()
+
+
+class _Write:
+    __slots__ = ("table", "row", "future")
+
+    def __init__(self, table, row: Dict, future: Optional[Future]):
+        self.table = table
+        self.row = row
+        self.future = future
+
+
+class GroupCommitWriter:
+    """Batches inserts from many threads into shared transactions."""
+
+    def __init__(
+        self,
+        engine,
+        max_batch: int = SQL_WRITE_BATCH_SIZE,
+        max_delay_ms: float = SQL_WRITE_MAX_DELAY_MS,
+        queue_size: int = SQL_WRITE_QUEUE_SIZE
+    ):
+        self.engine = engine
+        self.max_batch = max(max_batch, 1)
+        self.max_delay = max(max_delay_ms, 0) / 1000
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.transactions = 0
+        self.rows = 0
+        self.failed_rows = 0
+        self.largest_batch = 0
+
+    def submit(self, table, row: Dict, wait: bool = True) -> Optional[int]:
+        """
+        Queue a row for insertion into table. With wait, block until it is
+        committed and return its primary key; otherwise return None at once.
+        """
+        self._start()
+        future = Future() if wait else None
+        self._queue.put(_Write(table, row, future))
+        return future.result() if future is not None else None
+
+    def close(self):
+        """Commit everything queued and stop the writer thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join()
+
+    def stats(self) -> Dict:
+        return {
+            "transactions": self.transactions,
+            "rows": self.rows,
+            "failed_rows": self.failed_rows,
+            "largest_batch": self.largest_batch,
+            "queued": self._queue.qsize(),
+        }
+
+    def _start(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="sql-group-commit", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            write = self._queue.get()
+            if write is _STOP:
+                return
+            batch = [write]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                try:
+                    # Whatever is already queued joins without waiting
+                    write = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if write is _STOP:
+                    stopping = True
+                    break
+                batch.append(write)
+            self._commit(batch)
+
+    def _commit(self, batch: List[_Write]):
+        try:
+            with self.engine.begin() as conn:
+                keys = self._insert(conn, batch)
+        except Exception:
+            # One bad row must not fail everyone it was batched with: replay
+            # the batch a row per transaction so only its own caller sees it
+            self._commit_each(batch)
+            return
+        self.transactions += 1
+        self.rows += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+        for write in batch:
+            if write.future is not None:
+                write.future.set_result(keys[id(write)])
+
+    def _insert(self, conn, batch: List[_Write]) -> Dict[int, int]:
+        """Insert batch with one executemany per table; map keyed writes to their keys."""
+        keys = {}
+        tables: Dict = {}
+        for write in batch:
+            keyed, unkeyed = tables.setdefault(write.table, ([], []))
+            (keyed if write.future is not None else unkeyed).append(write)
+        returning = getattr(conn.dialect, "insert_executemany_returning", False)
+        for table, (keyed, unkeyed) in tables.items():
+            if unkeyed:
+                conn.execute(table.insert(), [write.row for write in unkeyed])
+            if not keyed:
+                continue
+            if returning:
+                pk = table.primary_key.columns.values()[0]
+                result = conn.execute(table.insert().returning(pk), [write.row for write in keyed])
+                for write, (key,) in zip(keyed, result.fetchall()):
+                    keys[id(write)] = key
+            else:
+                for write in keyed:
+                    keys[id(write)] = conn.execute(table.insert(), write.row).inserted_primary_key[0]
+        return keys
+
+    def _commit_each(self, batch: List[_Write]):
+        for write in batch:
+            try:
+                with self.engine.begin() as conn:
+                    key = self._insert(conn, [write]).get(id(write))
+            except Exception as e:
+                self.failed_rows += 1
+                if write.future is None:
+                    logger.exception("Group commit row for %s failed", write.table.name)
+                else:
+                    write.future.set_exception(e)
+                continue
+            self.transactions += 1
+            self.rows += 1
+            if write.future is not None:
+                write.future.set_result(key)